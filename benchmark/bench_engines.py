@@ -0,0 +1,108 @@
+import os
+import sys
+import time
+import shutil
+import argparse
+import tempfile
+import statistics
+import numpy as np
+import pandas as pd
+
+base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, base_dir)
+
+from parser.sql_parser import parse_query
+from semantic.validator import validate_logical_plan
+from executor.executor import execute_plan
+from catalog import clear_catalog
+from session import session
+
+# Benchmark comparing the pandas and arrow execution engines on the same queries.
+# Generate data first, e.g. python tests/setup_test_data.py --n_emp 1000000 --n_dept 100000
+# The intermediate result cache is disabled, so every run scans and filters the tables.
+
+QUERIES = [
+    "SELECT name, age FROM emp WHERE age > 55",
+    "SELECT id FROM emp WHERE name = 'alice'",
+    "SELECT id, name FROM emp WHERE age >= 30 and age < 40 ORDER BY name",
+    "SELECT emp.id, name, mgr FROM emp, dept WHERE emp.id = dept.id and sal > 150000",
+]
+
+# Join keys with nulls, on tables written by write_null_key_tables: null keys never match in either engine
+NULL_KEY_QUERIES = [
+    "SELECT emp.id, dept.id FROM emp, dept WHERE emp.dept_id = dept.id",
+    "SELECT emp.id, dept.id FROM emp, dept WHERE emp.dept_id = dept.id and dept.sal > 3000",
+]
+NULL_KEY_SETTINGS = [{}, {"PARALLEL_LEVEL": 4}, {"MEMORY_LIMIT": 1}] # pandas engine paths compared with arrow
+
+def write_null_key_tables(data_dir, rows=20000):
+    rng = np.random.default_rng(0)
+    dept_id = rng.integers(0, rows // 10, rows).astype(float)
+    dept_id[rng.random(rows) < 0.1] = np.nan
+    pd.DataFrame({"id": np.arange(rows), "dept_id": dept_id}).to_parquet(os.path.join(data_dir, "emp.parquet"), index=False)
+    dept_ids = np.arange(rows // 10).astype(float)
+    dept_ids[rng.random(rows // 10) < 0.1] = np.nan
+    pd.DataFrame({"id": dept_ids, "sal": rng.integers(1000, 5000, rows // 10)}).to_parquet(
+        os.path.join(data_dir, "dept.parquet"), index=False)
+
+def check_null_keys():
+    data_dir = tempfile.mkdtemp(prefix="null-keys-")
+    try:
+        write_null_key_tables(data_dir)
+        for query in NULL_KEY_QUERIES:
+            _, expected = run_query(query, data_dir, "ARROW")
+            for settings in NULL_KEY_SETTINGS:
+                defaults = {name: getattr(session, name) for name in settings}
+                for name, value in settings.items():
+                    setattr(session, name, value)
+                _, df = run_query(query, data_dir, "PANDAS")
+                for name, value in defaults.items():
+                    setattr(session, name, value)
+                print(f"{query:<80} {str(settings):>25} {len(df):>8} rows  {same_results(df, expected)}")
+    finally:
+        clear_catalog()
+        shutil.rmtree(data_dir, ignore_errors=True)
+
+def run_query(query, data_dir, engine):
+    session.ENGINE = engine
+    plan = validate_logical_plan(parse_query(query), data_dir)
+    start = time.perf_counter()
+    df = execute_plan(plan, data_dir)
+    return time.perf_counter() - start, df
+
+def same_results(df1, df2):
+    if list(df1.columns) != list(df2.columns) or len(df1) != len(df2):
+        return False
+    cols = list(df1.columns)
+    df1 = df1.sort_values(cols).reset_index(drop=True).astype(str)
+    df2 = df2.sort_values(cols).reset_index(drop=True).astype(str)
+    return df1.equals(df2)
+
+def bench_engines(data_dir, repeat):
+    intermediate_cache_size, session.INTERMEDIATE_CACHE_SIZE = session.INTERMEDIATE_CACHE_SIZE, 0
+    print(f"{'query':<80} {'pandas (s)':>12} {'arrow (s)':>12} {'speedup':>8}  same")
+    for query in QUERIES:
+        timings = {}
+        results = {}
+        for engine in ("PANDAS", "ARROW"):
+            runs = []
+            for _ in range(repeat):
+                elapsed, df = run_query(query, data_dir, engine)
+                runs.append(elapsed)
+            timings[engine] = statistics.median(runs)
+            results[engine] = df
+        same = same_results(results["PANDAS"], results["ARROW"])
+        speedup = timings["PANDAS"] / timings["ARROW"] if timings["ARROW"] else float("inf")
+        print(f"{query:<80} {timings['PANDAS']:>12.4f} {timings['ARROW']:>12.4f} {speedup:>7.2f}x  {same}")
+    print(f"{'null join keys':<80} {'pandas settings':>25} {'pandas':>8}       same as arrow")
+    check_null_keys()
+    session.ENGINE = "PANDAS"
+    session.INTERMEDIATE_CACHE_SIZE = intermediate_cache_size
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare pandas and arrow execution engines")
+    parser.add_argument("--data_dir", type=str, default=os.path.join(base_dir, "data"), help="Directory with parquet tables")
+    parser.add_argument("--repeat", type=int, default=5, help="Runs per query and engine (median is reported)")
+    args = parser.parse_args()
+
+    bench_engines(args.data_dir, args.repeat)
@@ -0,0 +1,78 @@
+import os
+import sys
+import time
+import argparse
+
+base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, base_dir)
+
+from parser.sql_parser import parse_query
+from semantic.validator import validate_logical_plan
+from planner.optimizer import optimize_plan
+from executor.executor import execute_plan_batches
+from cache.intermediate_cache import clear_intermediate_cache, intermediate_stats
+from cache.buffer_pool import clear_pool
+from catalog import clear_catalog
+from session import session
+
+# Benchmark of the intermediate result cache on a drill-down session: every query narrows the
+# predicates of an earlier one, so with the cache on only the first query of each table scans it
+# and the others filter its cached rows again (see cache/intermediate_cache.py).
+# The buffer pool is off, so the cache off column is a scan of the parquet files every time.
+# Generate data first, e.g. python tests/setup_test_data.py --n_emp 1000000 --n_dept 100000
+
+SESSION = [
+    "SELECT id, name FROM emp WHERE age > 30",
+    "SELECT id, name FROM emp WHERE age > 40",
+    "SELECT id, name FROM emp WHERE age > 50 and name = 'alice'",
+    "SELECT name, COUNT(*) FROM emp WHERE age >= 45 GROUP BY name",
+    "SELECT emp.id, mgr, sal FROM emp, dept WHERE emp.id = dept.id and sal > 100000 and age > 30",
+    "SELECT emp.id, mgr, sal FROM emp, dept WHERE emp.id = dept.id and sal > 150000 and age > 50",
+    "SELECT emp.id, name, mgr FROM emp, dept WHERE emp.id = dept.id and sal > 190000 and age = 55",
+]
+
+def run_query(query, data_dir):
+    plan = optimize_plan(validate_logical_plan(parse_query(query), data_dir), data_dir)
+    return sum(batch.num_rows for batch in execute_plan_batches(plan, data_dir, session.FETCH_SIZE))
+
+def run_session(data_dir, cache_size):
+    session.INTERMEDIATE_CACHE_SIZE = cache_size
+    clear_intermediate_cache()
+    clear_catalog()
+    timings = []
+    for query in SESSION:
+        start = time.perf_counter()
+        rows = run_query(query, data_dir)
+        timings.append((time.perf_counter() - start, rows))
+    return timings
+
+def bench_intermediate_cache(data_dir, cache_size, repeat):
+    session.BUFFER_POOL_SIZE = 0
+    clear_pool()
+    runs = {"off": [], "on": []}
+    for _ in range(repeat):
+        runs["off"].append(run_session(data_dir, 0))
+        runs["on"].append(run_session(data_dir, cache_size))
+    stats = intermediate_stats()
+
+    print(f"{'query':<95} {'rows':>8} {'off (ms)':>9} {'on (ms)':>9} {'speedup':>8}")
+    total = {"off": 0.0, "on": 0.0}
+    for i, query in enumerate(SESSION):
+        best = {mode: min(run[i][0] for run in runs[mode]) for mode in runs}
+        for mode in total:
+            total[mode] += best[mode]
+        speedup = best["off"] / best["on"] if best["on"] else float("inf")
+        print(f"{query:<95} {runs['on'][0][i][1]:>8} {best['off'] * 1000:>9.2f} {best['on'] * 1000:>9.2f} {speedup:>7.2f}x")
+    print(f"{'session':<95} {'':>8} {total['off'] * 1000:>9.2f} {total['on'] * 1000:>9.2f} "
+          f"{total['off'] / total['on']:>7.2f}x")
+    print(f"cache (last run): {stats['hits']} hits, {stats['subsumed']} subsumed hits, {stats['misses']} misses, "
+          f"{stats['entries']} entries, {stats['bytes']} bytes")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare a drill-down query session with and without the intermediate result cache")
+    parser.add_argument("--data_dir", type=str, default=os.path.join(base_dir, "data"), help="Directory with parquet tables")
+    parser.add_argument("--cache_size", type=int, default=256, help="Intermediate cache size (MB) of the cache on runs")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs of the session per mode (fastest is reported)")
+    args = parser.parse_args()
+
+    bench_intermediate_cache(args.data_dir, args.cache_size, args.repeat)
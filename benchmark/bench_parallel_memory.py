@@ -0,0 +1,123 @@
+import os
+import sys
+import time
+import json
+import argparse
+import resource
+import tempfile
+import subprocess
+import numpy as np
+import pandas as pd
+from concurrent.futures import ThreadPoolExecutor
+
+base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, base_dir)
+
+from parser.sql_parser import parse_query
+from semantic.validator import validate_logical_plan
+from executor.executor_parallel import parallel_execute_single_table, process_chunk, merge_results
+from executor.scan import scan_table
+from session import session
+
+# Benchmark of the peak memory of the parallel single-table scan:
+# chunks copied with df.loc[idx].copy() (previous implementation) vs zero-copy iloc slices.
+# Each variant runs in its own process; the peak RSS is measured from the end of the table scan,
+# so it only counts the chunking, filtering, and merging.
+
+def generate_table(data_dir, rows):
+    rng = np.random.default_rng(42)
+    df = pd.DataFrame({
+        "id": np.arange(rows),
+        "name": rng.choice(["alice", "bob", "carol", "dave", "eve", "frank", "grace", "heidi"], rows),
+        "age": rng.integers(20, 61, rows),
+        "score": rng.random(rows),
+    })
+    df.to_parquet(os.path.join(data_dir, "big.parquet"), engine="pyarrow", index=False, row_group_size=100_000)
+
+def copy_execute_single_table(plan, df):
+    # previous implementation: every chunk copied before the workers start
+    n = len(df)
+    target_chunks = session.PARALLEL_LEVEL * session.NUM_CHUNKS_PER_WORKER
+    chunk_size = min(max(-(-n // target_chunks), session.MIN_CHUNK_SIZE), session.MAX_CHUNK_SIZE)
+    index_chunks = [df.index[i:i+chunk_size] for i in range(0, n, chunk_size)]
+    chunks = [df.loc[idx].copy() for idx in index_chunks]
+    with ThreadPoolExecutor(max_workers=session.PARALLEL_LEVEL) as executor:
+        results = [f.result() for f in [executor.submit(process_chunk, chunk, plan) for chunk in chunks]]
+    return merge_results(plan, results, df.columns)
+
+def reset_peak_rss():
+    # Linux: reset the process' high-water mark, so the peak excludes the scan
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+        return True
+    except OSError:
+        return False
+
+def peak_rss_kb(reset):
+    if reset:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1])
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+def current_rss_kb():
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+def run_variant(variant, data_dir, query, parallel):
+    session.PARALLEL_LEVEL = parallel
+    plan = validate_logical_plan(parse_query(query), data_dir)
+    table = plan.source_tables[0]
+    df = scan_table(plan, table, data_dir)
+    df.columns = df.columns.str.lower()
+
+    scanned = current_rss_kb()
+    reset = reset_peak_rss()
+    start = time.perf_counter()
+    if variant == "copy":
+        result = copy_execute_single_table(plan, df)
+    else:
+        result = parallel_execute_single_table(plan, df)
+    elapsed = time.perf_counter() - start
+    peak = peak_rss_kb(reset)
+    print(json.dumps({"variant": variant, "rows": len(result), "elapsed": elapsed,
+                      "scanned_kb": scanned, "peak_kb": peak, "table_bytes": int(df.memory_usage(deep=True).sum())}))
+
+def bench_parallel_memory(data_dir, rows, query, parallel):
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        if data_dir is None:
+            data_dir = tmp_dir
+            generate_table(data_dir, rows)
+            print(f"Generated big.parquet with {rows} rows ({rows // session.MAX_CHUNK_SIZE}x MAX_CHUNK_SIZE)")
+
+        print(f"{'variant':<8} {'time (s)':>10} {'table (MB)':>11} {'RSS after scan (MB)':>20} {'peak RSS (MB)':>14} {'peak - scan (MB)':>17}")
+        for variant in ("copy", "view"):
+            # fresh process per variant, so the peaks do not influence each other
+            out = subprocess.run([sys.executable, os.path.abspath(__file__), "--variant", variant,
+                                  "--data_dir", data_dir, "--query", query, "--parallel", str(parallel)],
+                                 capture_output=True, text=True, check=True)
+            r = json.loads(out.stdout.strip().splitlines()[-1])
+            print(f"{variant:<8} {r['elapsed']:>10.3f} {r['table_bytes'] / 2**20:>11.1f} {r['scanned_kb'] / 1024:>20.1f} "
+                  f"{r['peak_kb'] / 1024:>14.1f} {(r['peak_kb'] - r['scanned_kb']) / 1024:>17.1f}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Peak memory of copied vs zero-copy chunks in the parallel scan")
+    parser.add_argument("--data_dir", type=str, default=None, help="Directory with the parquet table (generated if omitted)")
+    parser.add_argument("--rows", type=int, default=2_000_000, help="Rows of the generated table")
+    parser.add_argument("--query", type=str, default="SELECT id, name FROM big WHERE age > 55", help="Single-table query")
+    parser.add_argument("--parallel", type=int, default=4, help="PARALLEL_LEVEL of the scan")
+    parser.add_argument("--variant", type=str, default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.variant:
+        run_variant(args.variant, args.data_dir, args.query, args.parallel)
+    else:
+        bench_parallel_memory(args.data_dir, args.rows, args.query, args.parallel)
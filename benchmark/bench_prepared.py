@@ -0,0 +1,77 @@
+import os
+import sys
+import time
+import random
+import argparse
+
+base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, base_dir)
+
+from parser.sql_parser import parse_query
+from semantic.validator import validate_logical_plan
+from planner.optimizer import optimize_plan
+from executor.executor import execute_plan_batches
+from cache.plan_cache import lookup_plan, store_plan, clear_plan_cache
+from catalog import get_table
+from session.prepared import prepare
+from session import session
+
+# Benchmark of prepared statements: the same query shape run with a different literal per call.
+#   planned:    every call is parsed, validated, and optimized (a new plan cache key per literal)
+#   plan cache: every call looks up its plan first; the cache is warmed with all literals beforehand
+#   prepared:   parsed and validated once, every call binds its value (see session/prepared.py)
+# The results cache and intermediate result cache are not used, so the times are planning plus execution.
+
+def run_planned(query, data_dir):
+    plan = optimize_plan(validate_logical_plan(parse_query(query), data_dir), data_dir)
+    return sum(batch.num_rows for batch in execute_plan_batches(plan, data_dir, session.FETCH_SIZE))
+
+def run_plan_cache(query, data_dir):
+    plan = lookup_plan(query, data_dir)
+    if plan is None:
+        plan = parse_query(query)
+        tables = list(plan.source_tables)
+        plan = optimize_plan(validate_logical_plan(plan, data_dir), data_dir)
+        store_plan(query, plan, tables, data_dir)
+    return sum(batch.num_rows for batch in execute_plan_batches(plan, data_dir, session.FETCH_SIZE))
+
+def time_calls(fn, values):
+    start = time.perf_counter()
+    rows = sum(fn(value) for value in values)
+    return (time.perf_counter() - start) / len(values), rows
+
+def bench_prepared(data_dir, table, column, calls, seed):
+    session.INTERMEDIATE_CACHE_SIZE = 0
+    entry = get_table(data_dir, table)
+    lo, hi, _ = entry.column_stats(column)
+    values = random.Random(seed).choices(range(lo, hi + 1), k=calls)
+    sql = f"SELECT * FROM {table} WHERE {column} = ?"
+    literal = sql.replace("?", "{}")
+    print(f"{sql}, {calls} calls over {entry.num_rows} rows in {entry.num_row_groups} row groups")
+    print(f"{'mode':<12} {'per call (ms)':>14} {'rows':>8}")
+
+    per_call, rows = time_calls(lambda v: run_planned(literal.format(v), data_dir), values)
+    print(f"{'planned':<12} {per_call * 1000:>14.3f} {rows:>8}")
+
+    session.PLAN_CACHE_SIZE = max(session.PLAN_CACHE_SIZE, calls)
+    clear_plan_cache()
+    for value in set(values):
+        run_plan_cache(literal.format(value), data_dir)
+    per_call, rows = time_calls(lambda v: run_plan_cache(literal.format(v), data_dir), values)
+    print(f"{'plan cache':<12} {per_call * 1000:>14.3f} {rows:>8}")
+    clear_plan_cache()
+
+    statement = prepare(sql, data_dir)
+    per_call, rows = time_calls(lambda v: sum(b.num_rows for b in statement.execute_batches(v)), values)
+    print(f"{'prepared':<12} {per_call * 1000:>14.3f} {rows:>8}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare prepared statements with planning every query")
+    parser.add_argument("--data_dir", type=str, default=os.path.join(base_dir, "data"), help="Directory with parquet tables")
+    parser.add_argument("--table", type=str, default="emp", help="Table of the point lookup")
+    parser.add_argument("--column", type=str, default="id", help="Integer column of the point lookup")
+    parser.add_argument("--calls", type=int, default=1000, help="Calls per mode, each with a random value")
+    parser.add_argument("--seed", type=int, default=42, help="Random seed of the values")
+    args = parser.parse_args()
+
+    bench_prepared(args.data_dir, args.table, args.column, args.calls, args.seed)
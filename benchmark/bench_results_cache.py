@@ -0,0 +1,59 @@
+import os
+import sys
+import time
+import pickle
+import argparse
+import statistics
+import pyarrow as pa
+
+base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, base_dir)
+
+from parser.sql_parser import parse_query
+from semantic.validator import validate_logical_plan
+from executor.executor import execute_plan
+from cache.results_cache import serialize_result, split_chunks
+from session import session
+
+# Benchmark of the results cache encoding: pickle (previous format) vs compressed Arrow IPC.
+# Measures encode/decode time and bytes stored in Redis, without needing a Redis server.
+
+def time_median(fn, repeat):
+    runs = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        out = fn()
+        runs.append(time.perf_counter() - start)
+    return statistics.median(runs), out
+
+def decode_ipc(chunks):
+    with pa.ipc.open_stream(b"".join(chunks)) as reader:
+        return reader.read_all().to_pandas()
+
+def bench_results_cache(data_dir, query, repeat):
+    plan = validate_logical_plan(parse_query(query), data_dir)
+    df = execute_plan(plan, data_dir)
+    print(f"Result: {len(df)} rows x {len(df.columns)} columns, "
+          f"{df.memory_usage(deep=True).sum()} bytes in memory")
+    print(f"{'format':<12} {'encode (s)':>12} {'decode (s)':>12} {'bytes stored':>14} {'keys':>6}")
+
+    encode_time, blob = time_median(lambda: pickle.dumps(df), repeat)
+    decode_time, _ = time_median(lambda: pickle.loads(blob), repeat)
+    print(f"{'pickle':<12} {encode_time:>12.4f} {decode_time:>12.4f} {len(blob):>14} {1:>6}")
+
+    for codec in ("lz4", "zstd"):
+        session.CACHE_COMPRESSION = codec
+        encode_time, data = time_median(lambda: split_chunks(serialize_result(df)), repeat)
+        decode_time, decoded = time_median(lambda: decode_ipc(data), repeat)
+        stored = sum(len(chunk) for chunk in data)
+        assert len(decoded) == len(df)
+        print(f"{'ipc+' + codec:<12} {encode_time:>12.4f} {decode_time:>12.4f} {stored:>14} {len(data) + 1:>6}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare pickle and Arrow IPC encodings of cached results")
+    parser.add_argument("--data_dir", type=str, default=os.path.join(base_dir, "data"), help="Directory with parquet tables")
+    parser.add_argument("--query", type=str, default="SELECT * FROM emp", help="Query whose result is encoded")
+    parser.add_argument("--repeat", type=int, default=5, help="Runs per measurement (median is reported)")
+    args = parser.parse_args()
+
+    bench_results_cache(args.data_dir, args.query, args.repeat)
@@ -0,0 +1,180 @@
+import os
+import sys
+import time
+import json
+import platform
+import argparse
+import statistics
+import subprocess
+
+base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, base_dir)
+
+import pandas as pd
+import pyarrow as pa
+from parser.sql_parser import parse_query
+from semantic.validator import validate_logical_plan
+from planner.optimizer import optimize_plan
+from executor.executor import execute_plan_batches
+from cache.results_cache import iter_cached_batches, cache_batches, clear_all_cache
+from cache.plan_cache import lookup_plan, store_plan, clear_plan_cache
+from cache.buffer_pool import clear_pool, resize_pool
+from cache.intermediate_cache import clear_intermediate_cache, resize_intermediate_cache
+from catalog import clear_catalog
+from session import session
+from benchmark.datagen import generate_dataset, load_dataset
+
+# Benchmark suite: a fixed query mix over a synthetic dataset (see datagen.py),
+# run for every PARALLEL_LEVEL with the caches off and on, written as JSON so runs can be compared.
+#   cache off: no results cache, plan cache, buffer pool, or intermediate result cache; every run is cold
+#   cache on:  all caches enabled (results cache only if Redis is reachable, intermediate result cache with
+#              INTERMEDIATE_CACHE_MB unless the session enables it); the caches are
+#              cleared before the first run of a query, so "cold" is the first run and "warm" the others
+# e.g. python benchmark/bench_suite.py --data_dir /tmp/bench --rows 10000000 --skew 1.1 --output run.json
+#      python benchmark/bench_suite.py --data_dir /tmp/bench --output new.json --compare run.json
+
+INTERMEDIATE_CACHE_MB = 256 # budget of the intermediate result cache in cache on runs, it is off by default
+
+def query_mix(dataset):
+    mix = {
+        "point_lookup": f"SELECT id, name, score FROM emp WHERE id = {dataset['mid_id']}",
+        "range_scan": "SELECT id, age FROM emp WHERE age >= 30 and age < 33",
+        "string_filter": f"SELECT id, age FROM emp WHERE name = '{dataset['hot_name']}'",
+        "order_by": "SELECT id, score FROM emp WHERE age > 55 ORDER BY score DESC",
+        "join": "SELECT emp.id, mgr, sal FROM emp, dept WHERE emp.dept_id = dept.id and sal > 190000",
+    }
+    if dataset.get("partitions"):
+        # one day of a partitioned emp
+        mix["partition_day"] = f"SELECT id, score FROM emp WHERE dt = '{dataset['mid_day']}' and age > 50"
+    return mix
+
+def redis_available():
+    try:
+        iter_cached_batches("SELECT 1 FROM benchmark_probe")
+        return True
+    except Exception:
+        return False
+
+def clear_caches(has_redis):
+    clear_catalog()
+    clear_plan_cache()
+    clear_pool()
+    clear_intermediate_cache()
+    if has_redis:
+        clear_all_cache()
+
+def run_query(query, data_dir, results_cache):
+    # same path as the REPL: results cache, plan cache, streamed execution (rows are counted, not printed)
+    if results_cache:
+        reader = iter_cached_batches(query)
+        if reader is not None:
+            return sum(batch.num_rows for batch in reader)
+    plan = lookup_plan(query, data_dir)
+    if plan is None:
+        plan = parse_query(query)
+        tables = list(plan.source_tables)
+        plan = optimize_plan(validate_logical_plan(plan, data_dir), data_dir)
+        store_plan(query, plan, tables, data_dir)
+    batches = execute_plan_batches(plan, data_dir, session.FETCH_SIZE)
+    if results_cache:
+        batches = cache_batches(query, batches)
+    return sum(batch.num_rows for batch in batches)
+
+def set_cache_mode(mode, defaults):
+    if mode == "on":
+        session.BUFFER_POOL_SIZE, session.PLAN_CACHE_SIZE, session.INTERMEDIATE_CACHE_SIZE = defaults
+    else:
+        session.BUFFER_POOL_SIZE, session.PLAN_CACHE_SIZE, session.INTERMEDIATE_CACHE_SIZE = 0, 0, 0
+    resize_pool()
+    resize_intermediate_cache()
+
+def bench_suite(data_dir, levels, cache_modes, repeat, queries):
+    dataset = load_dataset(data_dir)
+    mix = {name: sql for name, sql in query_mix(dataset).items() if not queries or name in queries}
+    has_redis = redis_available()
+    defaults = (session.BUFFER_POOL_SIZE, session.PLAN_CACHE_SIZE, session.INTERMEDIATE_CACHE_SIZE or INTERMEDIATE_CACHE_MB)
+
+    results = []
+    print(f"{'query':<14} {'parallel':>8} {'cache':>6} {'rows':>10} {'cold (s)':>10} {'median (s)':>11} {'min (s)':>10}")
+    for name, sql in mix.items():
+        for level in levels:
+            for mode in cache_modes:
+                session.PARALLEL_LEVEL = level
+                set_cache_mode(mode, defaults)
+                results_cache = mode == "on" and has_redis
+                clear_caches(has_redis)
+                runs, rows = [], None
+                for _ in range(repeat):
+                    if mode == "off":
+                        clear_catalog()
+                    start = time.perf_counter()
+                    rows = run_query(sql, data_dir, results_cache)
+                    runs.append(time.perf_counter() - start)
+                warm = runs[1:] or runs
+                result = {"query": name, "sql": sql, "parallel": level, "cache": mode,
+                          "results_cache": results_cache, "rows": rows, "runs": runs,
+                          "cold": runs[0], "median": statistics.median(warm), "min": min(warm)}
+                results.append(result)
+                print(f"{name:<14} {level:>8} {mode:>6} {rows:>10} {runs[0]:>10.4f} {result['median']:>11.4f} {result['min']:>10.4f}")
+
+    session.PARALLEL_LEVEL = 1
+    set_cache_mode("on", defaults)
+    clear_caches(has_redis)
+    return {"dataset": dataset, "environment": environment(), "repeat": repeat, "results": results}
+
+def environment():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], cwd=base_dir, capture_output=True,
+                                text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {"commit": commit, "time": time.strftime("%Y-%m-%dT%H:%M:%S"), "python": platform.python_version(),
+            "pandas": pd.__version__, "pyarrow": pa.__version__, "platform": platform.platform(),
+            "cpus": os.cpu_count()}
+
+def compare(baseline, current):
+    # ratio of median times per (query, parallel, cache), > 1 means the current run is faster
+    before = {(r["query"], r["parallel"], r["cache"]): r for r in baseline["results"]}
+    if baseline["dataset"] != current["dataset"]:
+        print("Warning: the runs used different datasets")
+    print(f"\n{'query':<14} {'parallel':>8} {'cache':>6} {'baseline (s)':>13} {'current (s)':>12} {'speedup':>8}")
+    for r in current["results"]:
+        old = before.get((r["query"], r["parallel"], r["cache"]))
+        if old is None:
+            continue
+        speedup = old["median"] / r["median"] if r["median"] else float("inf")
+        print(f"{r['query']:<14} {r['parallel']:>8} {r['cache']:>6} {old['median']:>13.4f} {r['median']:>12.4f} {speedup:>7.2f}x")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the benchmark query mix across parallel levels and cache modes")
+    parser.add_argument("--data_dir", type=str, required=True, help="Dataset directory (generated if it has no dataset)")
+    parser.add_argument("--generate", action="store_true", help="Generate the dataset even if one exists")
+    parser.add_argument("--rows", type=int, default=1_000_000, help="Rows of emp when generating")
+    parser.add_argument("--row_group_size", type=int, default=128_000, help="Rows per row group when generating")
+    parser.add_argument("--cardinality", type=int, default=10_000, help="Distinct emp.name values when generating")
+    parser.add_argument("--skew", type=float, default=0.0, help="Zipf exponent of names and join keys when generating")
+    parser.add_argument("--sortedness", type=float, default=1.0, help="Fraction of emp rows in id order when generating")
+    parser.add_argument("--seed", type=int, default=42, help="Random seed when generating")
+    parser.add_argument("--partitions", type=int, default=0, help="Days emp is partitioned into when generating (0 = one file)")
+    parser.add_argument("--parallel", type=str, default="1,2,4", help="Comma-separated PARALLEL_LEVEL values")
+    parser.add_argument("--cache", type=str, default="off,on", help="Comma-separated cache modes (off, on)")
+    parser.add_argument("--queries", type=str, default="", help="Comma-separated subset of the query mix")
+    parser.add_argument("--repeat", type=int, default=5, help="Runs per query and configuration")
+    parser.add_argument("--output", type=str, default=None, help="JSON file to write the results to")
+    parser.add_argument("--compare", type=str, default=None, help="JSON results of a previous run to compare with")
+    args = parser.parse_args()
+
+    if args.generate or load_dataset(args.data_dir) is None:
+        print(f"Generating {args.rows} rows in {args.data_dir}")
+        generate_dataset(args.data_dir, args.rows, args.row_group_size, args.cardinality,
+                         args.skew, args.sortedness, args.seed, args.partitions)
+
+    report = bench_suite(args.data_dir, [int(p) for p in args.parallel.split(",")],
+                         args.cache.split(","), args.repeat, [q for q in args.queries.split(",") if q])
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Wrote {args.output}")
+    if args.compare:
+        with open(args.compare) as f:
+            compare(json.load(f), report)
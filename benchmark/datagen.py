@@ -0,0 +1,156 @@
+import os
+import sys
+import json
+import shutil
+import string
+import argparse
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, base_dir)
+
+# Reproducible synthetic datasets for the benchmark suite (see bench_suite.py).
+# Writes emp (id, name, age, score, dept_id) and dept (id, mgr, sal) in batches, so tables of
+# 100M rows are generated without holding them in memory, and a dataset.json with the parameters.
+#   rows            rows of emp; dept has rows / 10 rows (at most 1M)
+#   row_group_size  rows per parquet row group
+#   cardinality     distinct values of emp.name (random 8-letter strings)
+#   skew            zipf exponent of emp.name and emp.dept_id (0 = uniform); value of rank k has weight 1 / k^skew
+#   sortedness      fraction of emp rows in id order; the other rows are shuffled within each batch
+#   partitions      if > 0, emp is a directory partitioned by day, emp/dt=YYYY-MM-DD/part-0.parquet,
+#                   with consecutive rows spread evenly over that many days from FIRST_DAY
+# The same parameters and seed always give the same files.
+
+BATCH_ROWS = 1_000_000 # rows generated and written at a time
+DATASET_FILE = "dataset.json"
+FIRST_DAY = np.datetime64("2026-01-01") # day of the first partition
+
+def vocabulary(rng, size, length=8):
+    letters = np.array(list(string.ascii_lowercase))
+    words = rng.choice(letters, size=(size, length))
+    return np.array(["".join(w) for w in words], dtype=object)
+
+def zipf_sampler(rng, n, skew):
+    # draws ranks 0..n-1 with weight 1 / (rank + 1)^skew
+    if skew <= 0:
+        return lambda size: rng.integers(0, n, size)
+    weights = 1.0 / np.power(np.arange(1, n + 1, dtype=np.float64), skew)
+    cdf = np.cumsum(weights / weights.sum())
+    return lambda size: np.minimum(np.searchsorted(cdf, rng.random(size)), n - 1)
+
+def partially_sorted(rng, start, size, sortedness):
+    ids = np.arange(start, start + size)
+    moved = np.flatnonzero(rng.random(size) >= sortedness)
+    ids[moved] = ids[rng.permutation(moved)]
+    return ids
+
+class PartitionWriter:
+
+    """ Writes consecutive batches of emp into one file per day, rows [p * rows / n, (p + 1) * rows / n) on day p. """
+
+    def __init__(self, data_dir, schema, rows, partitions):
+        self.path = os.path.join(data_dir, "emp")
+        self.schema = schema
+        self.bounds = [p * rows // partitions for p in range(partitions + 1)]
+        self.writer, self.partition, self.written = None, -1, 0
+        shutil.rmtree(self.path, ignore_errors=True)
+
+    def write_table(self, batch, row_group_size):
+        while batch.num_rows:
+            if self.writer is None or self.written == self.bounds[self.partition + 1]:
+                self.open_next()
+            size = min(batch.num_rows, self.bounds[self.partition + 1] - self.written)
+            self.writer.write_table(batch.slice(0, size), row_group_size=row_group_size)
+            batch, self.written = batch.slice(size), self.written + size
+
+    def open_next(self):
+        if self.writer is not None:
+            self.writer.close()
+        self.partition += 1
+        directory = os.path.join(self.path, f"dt={FIRST_DAY + self.partition}")
+        os.makedirs(directory, exist_ok=True)
+        self.writer = pq.ParquetWriter(os.path.join(directory, "part-0.parquet"), self.schema)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if self.writer is not None:
+            self.writer.close()
+
+def generate_dataset(data_dir, rows, row_group_size, cardinality, skew, sortedness, seed=42, partitions=0):
+    os.makedirs(data_dir, exist_ok=True)
+    rng = np.random.default_rng(seed)
+    dept_rows = max(min(rows // 10, 1_000_000), 1)
+    names = vocabulary(rng, cardinality)
+    mgrs = vocabulary(rng, min(cardinality, dept_rows))
+    draw_name = zipf_sampler(rng, cardinality, skew)
+    draw_dept = zipf_sampler(rng, dept_rows, skew)
+
+    emp_schema = pa.schema([("id", pa.int64()), ("name", pa.string()), ("age", pa.int64()),
+                            ("score", pa.float64()), ("dept_id", pa.int64())])
+    # a partitioned emp replaces a single-file one, and the other way around
+    emp_file = os.path.join(data_dir, "emp.parquet")
+    if partitions > 0:
+        if os.path.exists(emp_file):
+            os.remove(emp_file)
+        emp_writer = PartitionWriter(data_dir, emp_schema, rows, partitions)
+    else:
+        shutil.rmtree(os.path.join(data_dir, "emp"), ignore_errors=True)
+        emp_writer = pq.ParquetWriter(emp_file, emp_schema)
+    with emp_writer as writer:
+        for start in range(0, rows, BATCH_ROWS):
+            size = min(BATCH_ROWS, rows - start)
+            batch = pa.table({
+                "id": partially_sorted(rng, start + 1, size, sortedness),
+                "name": names[draw_name(size)],
+                "age": rng.integers(20, 61, size),
+                "score": rng.random(size),
+                "dept_id": draw_dept(size) + 1,
+            }, schema=emp_schema)
+            writer.write_table(batch, row_group_size=row_group_size)
+
+    dept_schema = pa.schema([("id", pa.int64()), ("mgr", pa.string()), ("sal", pa.int64())])
+    with pq.ParquetWriter(os.path.join(data_dir, "dept.parquet"), dept_schema) as writer:
+        for start in range(0, dept_rows, BATCH_ROWS):
+            size = min(BATCH_ROWS, dept_rows - start)
+            batch = pa.table({
+                "id": np.arange(start + 1, start + size + 1),
+                "mgr": mgrs[rng.integers(0, len(mgrs), size)],
+                "sal": rng.integers(50_000, 200_001, size),
+            }, schema=dept_schema)
+            writer.write_table(batch, row_group_size=row_group_size)
+
+    # the hottest name (rank 0), a mid-table id, and the middle day are the literals of the query mix
+    dataset = {"rows": rows, "dept_rows": dept_rows, "row_group_size": row_group_size,
+               "cardinality": cardinality, "skew": skew, "sortedness": sortedness, "seed": seed,
+               "partitions": partitions, "hot_name": names[0], "mid_id": rows // 2,
+               "mid_day": str(FIRST_DAY + partitions // 2) if partitions > 0 else None}
+    with open(os.path.join(data_dir, DATASET_FILE), "w") as f:
+        json.dump(dataset, f, indent=2)
+    return dataset
+
+def load_dataset(data_dir):
+    path = os.path.join(data_dir, DATASET_FILE)
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate a synthetic benchmark dataset")
+    parser.add_argument("--data_dir", type=str, required=True, help="Directory to write the parquet tables to")
+    parser.add_argument("--rows", type=int, default=1_000_000, help="Rows of emp (1M to 100M)")
+    parser.add_argument("--row_group_size", type=int, default=128_000, help="Rows per parquet row group")
+    parser.add_argument("--cardinality", type=int, default=10_000, help="Distinct values of emp.name")
+    parser.add_argument("--skew", type=float, default=0.0, help="Zipf exponent of emp.name and emp.dept_id (0 = uniform)")
+    parser.add_argument("--sortedness", type=float, default=1.0, help="Fraction of emp rows in id order (0 to 1)")
+    parser.add_argument("--seed", type=int, default=42, help="Random seed")
+    parser.add_argument("--partitions", type=int, default=0, help="Days emp is partitioned into (0 = one file)")
+    args = parser.parse_args()
+
+    dataset = generate_dataset(args.data_dir, args.rows, args.row_group_size, args.cardinality,
+                               args.skew, args.sortedness, args.seed, args.partitions)
+    print(json.dumps(dataset, indent=2))
@@ -0,0 +1,116 @@
+import logging
+import threading
+from collections import OrderedDict
+from session import session
+
+# Buffer Pool
+# Decoded column chunks keyed by (file, column, row group, file version), evicted LRU
+# once the pool goes over session.BUFFER_POOL_SIZE megabytes.
+_pool = OrderedDict() # key -> pyarrow.ChunkedArray
+_lock = threading.Lock()
+_stats = {"hits": 0, "misses": 0, "evictions": 0, "bytes": 0}
+
+def budget_bytes() -> int:
+
+    """ Memory budget of the buffer pool in bytes, from session.BUFFER_POOL_SIZE (MB) """
+
+    return session.BUFFER_POOL_SIZE * 1024 * 1024
+
+def get_chunk(key):
+
+    """ Look up a decoded column chunk, marking it as most recently used
+
+    Args:
+        key (tuple): (file path, column, row group, file version)
+    Returns:
+        pyarrow.ChunkedArray or None
+
+    """
+
+    with _lock:
+        chunk = _pool.get(key)
+        if chunk is None:
+            _stats["misses"] += 1
+            return None
+        _pool.move_to_end(key)
+        _stats["hits"] += 1
+        return chunk
+
+def put_chunk(key, chunk):
+
+    """ Store a decoded column chunk, evicting least recently used chunks to stay within budget
+
+    Args:
+        key (tuple): (file path, column, row group, file version)
+        chunk (pyarrow.ChunkedArray): decoded column chunk
+    Returns:
+        None
+
+    """
+
+    budget = budget_bytes()
+    size = chunk.nbytes
+    if size > budget:
+        return
+
+    with _lock:
+        if key in _pool:
+            return
+        while _pool and _stats["bytes"] + size > budget:
+            _, evicted = _pool.popitem(last=False)
+            _stats["bytes"] -= evicted.nbytes
+            _stats["evictions"] += 1
+        _pool[key] = chunk
+        _stats["bytes"] += size
+
+def resize_pool():
+
+    """ Evict least recently used chunks until the pool fits a (new) budget
+
+    Args:
+        None
+    Returns:
+        None
+
+    """
+
+    budget = budget_bytes()
+    with _lock:
+        while _pool and _stats["bytes"] > budget:
+            _, evicted = _pool.popitem(last=False)
+            _stats["bytes"] -= evicted.nbytes
+            _stats["evictions"] += 1
+
+def pool_stats() -> dict:
+
+    """ Hit/miss/eviction counters, bytes used, and number of cached chunks
+
+    Args:
+        None
+    Returns:
+        dict: buffer pool statistics
+
+    """
+
+    with _lock:
+        stats = dict(_stats)
+        stats["chunks"] = len(_pool)
+    stats["budget"] = budget_bytes()
+    return stats
+
+def clear_pool():
+
+    """ Drop all cached column chunks and reset counters
+
+    Args:
+        None
+    Returns:
+        None
+
+    """
+
+    with _lock:
+        _pool.clear()
+        for name in _stats:
+            _stats[name] = 0
+    logging.debug("Buffer pool cleared")
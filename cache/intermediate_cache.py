@@ -0,0 +1,184 @@
+import logging
+import threading
+from collections import OrderedDict
+from planner.predicate import conjunction, implies, predicate_leaves
+from session import session
+
+# Intermediate Result Cache
+# Filtered and projected scans of single tables: the rows of a table satisfying a query's WHERE
+# predicates on it, restricted to the columns the query reads. An entry is keyed by
+# (data dir, table, table version, predicates, columns) and answers any later scan of the same
+# table version whose predicates imply the entry's and whose columns it has, e.g. a scan of
+# age > 40 is answered by re-filtering the cached rows of age > 30 instead of reading the table.
+# Entries are evicted LRU once the cache goes over session.INTERMEDIATE_CACHE_SIZE megabytes.
+_entries = OrderedDict() # (data_dir, table, version, predicates, columns) -> IntermediateResult
+_lock = threading.Lock()
+_stats = {"hits": 0, "subsumed": 0, "misses": 0, "evictions": 0, "bytes": 0}
+
+class IntermediateResult:
+
+    """ Cached rows of a table satisfying predicates, with the columns read by the query that scanned them.
+
+    Args:
+        filters (list[tuple]): predicate trees the rows satisfy
+        tbl (pyarrow.Table): the rows, columns spelled as in the table schema
+    """
+
+    def __init__(self, filters, tbl):
+        self.filters = list(filters)
+        self.tbl = tbl
+        self.columns = frozenset(name.lower() for name in tbl.column_names)
+        self.nbytes = tbl.nbytes
+
+def budget_bytes() -> int:
+
+    """ Memory budget of the intermediate result cache in bytes, from session.INTERMEDIATE_CACHE_SIZE (MB) """
+
+    return session.INTERMEDIATE_CACHE_SIZE * 1024 * 1024
+
+def entry_key(data_dir, table, version, filters, columns):
+    # Helper function to build the key of an entry, predicate trees are rendered since they hold lists
+    return (data_dir, table, version, repr(list(filters)), frozenset(columns))
+
+def remaining_filters(filters, cached):
+    # Helper function to select the predicates still to apply to rows already satisfying the cached ones
+    if not cached:
+        return list(filters)
+    applied = conjunction(cached)
+    return [node for node in filters if not implies(applied, node)]
+
+def lookup_intermediate(data_dir, table, version, filters, columns):
+
+    """ Find cached rows of a table containing the rows of a scan, marking them as most recently used
+
+    An entry answers the scan if the scan's predicates imply all of the entry's predicates
+    and the entry has the columns of the scan, including those of the predicates left to apply.
+    Of several such entries, the one with the fewest rows is used. Entries of other versions
+    of the table are dropped.
+
+    Args:
+        data_dir (str): directory containing parquet tables
+        table (str): source table name
+        version (tuple): catalog version of the table
+        filters (list[tuple]): predicate trees of the scan
+        columns (set[str]): lowercased columns the scan returns
+    Returns:
+        tuple: (pyarrow.Table, list[tuple]) cached rows and the predicates still to apply to them
+        or None
+
+    """
+
+    if not filters:
+        return None
+    query = conjunction(filters)
+    best, best_key = None, None
+    with _lock:
+        for key, entry in list(_entries.items()):
+            if key[0] != data_dir or key[1] != table:
+                continue
+            if key[2] != version:
+                del _entries[key]
+                _stats["bytes"] -= entry.nbytes
+                continue
+            if best is not None and entry.tbl.num_rows >= best.tbl.num_rows:
+                continue
+            if not all(implies(query, node) for node in entry.filters):
+                continue
+            remaining = remaining_filters(filters, entry.filters)
+            needed = set(columns) | {col.lower() for node in remaining for (col, op, value) in predicate_leaves(node)}
+            if needed <= entry.columns:
+                best, best_key = entry, key
+
+        if best is None:
+            _stats["misses"] += 1
+            return None
+        _entries.move_to_end(best_key)
+        exact = best.filters == list(filters)
+        _stats["hits" if exact else "subsumed"] += 1
+
+    logging.debug(f"Intermediate cache: {table} answered from {best.tbl.num_rows} cached rows "
+                  f"({'same' if exact else 'weaker'} predicates)")
+    return best.tbl, remaining_filters(filters, best.filters)
+
+def store_intermediate(data_dir, table, version, filters, tbl):
+
+    """ Cache the rows of a table satisfying predicates, evicting least recently used entries to stay within budget
+
+    Args:
+        data_dir (str): directory containing parquet tables
+        table (str): source table name
+        version (tuple): catalog version of the table
+        filters (list[tuple]): predicate trees the rows satisfy
+        tbl (pyarrow.Table): the rows, columns spelled as in the table schema
+    Returns:
+        None
+
+    """
+
+    entry = IntermediateResult(filters, tbl)
+    budget = budget_bytes()
+    if not filters or budget <= 0 or entry.nbytes > budget:
+        return
+
+    key = entry_key(data_dir, table, version, filters, entry.columns)
+    with _lock:
+        if key in _entries:
+            return
+        while _entries and _stats["bytes"] + entry.nbytes > budget:
+            _, evicted = _entries.popitem(last=False)
+            _stats["bytes"] -= evicted.nbytes
+            _stats["evictions"] += 1
+        _entries[key] = entry
+        _stats["bytes"] += entry.nbytes
+
+def resize_intermediate_cache():
+
+    """ Evict least recently used entries until the cache fits a (new) budget
+
+    Args:
+        None
+    Returns:
+        None
+
+    """
+
+    budget = budget_bytes()
+    with _lock:
+        while _entries and _stats["bytes"] > budget:
+            _, evicted = _entries.popitem(last=False)
+            _stats["bytes"] -= evicted.nbytes
+            _stats["evictions"] += 1
+
+def intermediate_stats() -> dict:
+
+    """ Hit (same predicates) / subsumed hit (weaker predicates) / miss / eviction counters, bytes used, and number of entries
+
+    Args:
+        None
+    Returns:
+        dict: intermediate result cache statistics
+
+    """
+
+    with _lock:
+        stats = dict(_stats)
+        stats["entries"] = len(_entries)
+    stats["budget"] = budget_bytes()
+    return stats
+
+def clear_intermediate_cache():
+
+    """ Drop all cached intermediate results and reset counters
+
+    Args:
+        None
+    Returns:
+        None
+
+    """
+
+    with _lock:
+        _entries.clear()
+        for name in _stats:
+            _stats[name] = 0
+    logging.debug("Intermediate result cache cleared")
@@ -0,0 +1,89 @@
+import copy
+import logging
+import threading
+from collections import OrderedDict
+from cache.results_cache import normalize_query
+from catalog import get_table
+from session import session
+
+# Plan Cache
+# Validated LogicalPlans keyed by normalized SQL text. An entry also records the
+# catalog version of every table the query references and is only reused while
+# none of those files has changed. Evicted LRU beyond session.PLAN_CACHE_SIZE entries.
+_plans = OrderedDict() # (data_dir, normalized sql) -> (LogicalPlan, {table: version})
+_lock = threading.Lock()
+
+def lookup_plan(sql_text: str, data_dir):
+
+    """ Look up the validated plan of a query
+        if cached and its tables are unchanged, return a deep copy of the plan; else, return None
+
+    Args:
+        sql_text (str): query string
+        data_dir (str): directory containing parquet tables
+    Returns:
+        LogicalPlan
+        or None
+    
+    """
+
+    key = (data_dir, normalize_query(sql_text))
+    with _lock:
+        entry = _plans.get(key)
+    if entry is None:
+        return None
+
+    plan, versions = entry
+    try:
+        current = {table: get_table(data_dir, table).version for table in versions}
+    except (FileNotFoundError, RuntimeError):
+        current = None
+    if current != versions:
+        logging.debug("Cached plan is stale, a table file changed")
+        with _lock:
+            _plans.pop(key, None)
+        return None
+
+    with _lock:
+        if key in _plans:
+            _plans.move_to_end(key)
+    logging.debug("Fetching validated plan from plan cache.")
+    return copy.deepcopy(plan)
+
+def store_plan(sql_text: str, plan, tables, data_dir):
+
+    """ Cache the validated plan of a query with the versions of the tables it references
+
+    Args:
+        sql_text (str): query string
+        plan (LogicalPlan): validated logical plan
+        tables (list[str]): source tables named in the query (before validation)
+        data_dir (str): directory containing parquet tables
+    Returns:
+        None
+    
+    """
+
+    if session.PLAN_CACHE_SIZE <= 0:
+        return
+    versions = {table: get_table(data_dir, table).version for table in tables}
+    key = (data_dir, normalize_query(sql_text))
+    with _lock:
+        _plans[key] = (copy.deepcopy(plan), versions)
+        _plans.move_to_end(key)
+        while len(_plans) > session.PLAN_CACHE_SIZE:
+            _plans.popitem(last=False)
+
+def clear_plan_cache():
+
+    """ Drop all cached plans
+    
+    Args:
+        None
+    Returns:
+        None
+    
+    """
+
+    with _lock:
+        _plans.clear()
@@ -1,14 +1,21 @@
+import io
 import redis
-import pickle
 import hashlib
-import pandas as pd
+import logging
+import pyarrow as pa
+from executor.profile import profile_stage
 from session import session
 
 # Redis Cache
-# NOTE: Keeping it global as only single-thread is hitting Redis cache.
-# If multi-thread, can create connection per thread.
+# NOTE: Keeping it global, the client is thread-safe (each command takes a connection from its pool),
+# so it is shared by the connections of the query server.
 r = redis.Redis(host='localhost', port=6379, db=0)
 
+# Results are stored as a compressed Arrow IPC stream split over several keys:
+#   <key>      -> number of chunks (written last, so readers never see a partial result)
+#   <key>:<i>  -> i-th chunk of the IPC stream
+BATCH_ROWS = 65536 # rows per record batch, so cached results can be streamed back
+
 def normalize_query(sql_text: str) -> str:
 
     """ Normalizes SQL text: 
@@ -34,9 +41,44 @@ def get_cache_key(sql_text):
     """
     return hashlib.md5(normalize_query(sql_text).encode(), usedforsecurity=False).hexdigest()
 
+def serialize_result(df) -> bytes:
+
+    """ Serialize a DataFrame as an Arrow IPC stream compressed with session.CACHE_COMPRESSION
+    
+    Args:
+        df (pandas.DataFrame): DataFrame
+    Returns:
+        bytes: IPC stream
+    
+    """
+
+    tbl = pa.Table.from_pandas(df, preserve_index=False)
+    options = pa.ipc.IpcWriteOptions(compression=session.CACHE_COMPRESSION)
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, tbl.schema, options=options) as writer:
+        writer.write_table(tbl, max_chunksize=BATCH_ROWS)
+    return sink.getvalue().to_pybytes()
+
+def split_chunks(data: bytes) -> list:
+
+    """ Split a serialized result into chunks of at most session.CACHE_CHUNK_SIZE bytes
+    
+    Args:
+        data (bytes): serialized result
+    Returns:
+        list[bytes]: chunks
+    
+    """
+
+    size = session.CACHE_CHUNK_SIZE
+    return [data[i:i+size] for i in range(0, len(data), size)] or [b""]
+
 def cache_query(sql_text: str, df):
 
-    """ Hash SQL text and store serialized DataFrame in Redis Cache with expiry time
+    """ Hash SQL text and store the DataFrame in Redis Cache with expiry time
+    
+    The DataFrame is stored as a compressed Arrow IPC stream, split across keys.
+    Results larger than session.CACHE_MAX_RESULT_SIZE bytes are not cached.
     
     Args:
         sql_text (str): query string
@@ -46,8 +88,153 @@ def cache_query(sql_text: str, df):
     
     """
 
+    data = serialize_result(df)
+    if len(data) > session.CACHE_MAX_RESULT_SIZE:
+        logging.debug(f"Result of {len(data)} bytes is over the cache limit, not caching")
+        return
+
+    key = get_cache_key(sql_text)
+    chunks = split_chunks(data)
+    pipe = r.pipeline(transaction=True)
+    for i, chunk in enumerate(chunks):
+        pipe.set(f"{key}:{i}", chunk, ex=session.CACHE_EXPIRY_TIME)
+    pipe.set(key, len(chunks), ex=session.CACHE_EXPIRY_TIME)
+    pipe.execute()
+    logging.debug(f"Cached result of {len(data)} bytes in {len(chunks)} chunks")
+
+class ChunkStream(io.RawIOBase):
+
+    """ Read-only file object over the chunks of a cached result, fetching one chunk at a time """
+
+    def __init__(self, key, num_chunks):
+        self.key = key
+        self.num_chunks = num_chunks
+        self.next_chunk = 0
+        self.buffer = b""
+        self.pos = 0
+
+    def readable(self):
+        return True
+
+    def readinto(self, b):
+        while self.pos >= len(self.buffer):
+            if self.next_chunk >= self.num_chunks:
+                return 0
+            chunk = r.get(f"{self.key}:{self.next_chunk}")
+            if chunk is None:
+                raise KeyError(f"Cached chunk {self.next_chunk} of {self.key} expired")
+            self.buffer, self.pos = chunk, 0
+            self.next_chunk += 1
+        n = min(len(b), len(self.buffer) - self.pos)
+        b[:n] = self.buffer[self.pos:self.pos + n]
+        self.pos += n
+        return n
+
+class ChunkSink(io.RawIOBase):
+
+    """ Write-only file object storing an IPC stream in Redis, one chunk at a time.
+    Chunk keys are written as they fill; the <key> entry is only set by commit().
+    Past session.CACHE_MAX_RESULT_SIZE bytes, further writes are dropped. """
+
+    def __init__(self, key):
+        self.key = key
+        self.num_chunks = 0
+        self.buffer = bytearray()
+        self.size = 0
+        self.overflow = False
+
+    def writable(self):
+        return True
+
+    def write(self, b):
+        n = len(b)
+        self.size += n
+        if self.size > session.CACHE_MAX_RESULT_SIZE:
+            self.overflow = True
+        if self.overflow:
+            return n
+        self.buffer += b
+        while len(self.buffer) >= session.CACHE_CHUNK_SIZE:
+            self.flush_chunk(session.CACHE_CHUNK_SIZE)
+        return n
+
+    def flush_chunk(self, size):
+        r.set(f"{self.key}:{self.num_chunks}", bytes(self.buffer[:size]), ex=session.CACHE_EXPIRY_TIME)
+        del self.buffer[:size]
+        self.num_chunks += 1
+
+    def commit(self):
+        if self.buffer or not self.num_chunks:
+            self.flush_chunk(len(self.buffer))
+        r.set(self.key, self.num_chunks, ex=session.CACHE_EXPIRY_TIME)
+
+    def discard(self):
+        if self.num_chunks:
+            r.delete(*[f"{self.key}:{i}" for i in range(self.num_chunks)])
+
+def cache_batches(sql_text: str, batches):
+
+    """ Hash SQL text and store a result in Redis Cache while it is streamed batch by batch
+
+    Every batch is passed on unchanged and appended to a compressed Arrow IPC stream,
+    which is written to Redis in chunks as it grows. The result is only visible in the
+    cache once all batches were consumed; a result that is abandoned early, fails, has
+    no batches, or is over session.CACHE_MAX_RESULT_SIZE bytes is not cached. An empty result
+    of execute_plan_batches is one zero-row batch, so it is cached with its schema.
+    
+    Args:
+        sql_text (str): query string
+        batches (iterator[pyarrow.RecordBatch]): result batches
+    Yields:
+        pyarrow.RecordBatch: the same batches
+    
+    """
+
+    sink = ChunkSink(get_cache_key(sql_text))
+    writer = None
+    try:
+        for batch in batches:
+            if writer is None:
+                options = pa.ipc.IpcWriteOptions(compression=session.CACHE_COMPRESSION)
+                writer = pa.ipc.new_stream(pa.PythonFile(sink, mode="w"), batch.schema, options=options)
+            if not sink.overflow:
+                with profile_stage("cache store", batch.num_rows) as stage:
+                    writer.write_batch(batch)
+                    stage.rows_out, stage.bytes = batch.num_rows, batch.nbytes
+            yield batch
+    except BaseException:
+        sink.discard()
+        raise
+
+    if writer is None:
+        return
+    writer.close()
+    if sink.overflow:
+        logging.debug(f"Result of over {sink.size} bytes is over the cache limit, not caching")
+        sink.discard()
+        return
+    sink.commit()
+    logging.debug(f"Cached result of {sink.size} bytes in {sink.num_chunks} chunks")
+
+def iter_cached_batches(sql_text: str):
+
+    """ Hash SQL text, check in Redis Cache
+        if cache hit, return a reader streaming the cached result batch by batch; else, return None
+    
+    Args:
+        sql_text (str): query string
+    Returns:
+        pyarrow.ipc.RecordBatchStreamReader
+        or None
+    
+    """
+
     key = get_cache_key(sql_text)
-    r.set(key, pickle.dumps(df), ex=session.CACHE_EXPIRY_TIME)
+    num_chunks = r.get(key)
+    if num_chunks is None:
+        return None
+    stream = io.BufferedReader(ChunkStream(key, int(num_chunks)))
+    return pa.ipc.open_stream(pa.PythonFile(stream, mode="r"))
 
 def check_results_cache(sql_text: str):
 
@@ -62,13 +249,16 @@ def check_results_cache(sql_text: str):
     
     """
 
-    key = get_cache_key(sql_text)
-    cached = r.get(key)
-    if cached is not None:
-        df = pickle.loads(cached)
-        if isinstance(df, pd.DataFrame):
-            return df
-    return None
+    try:
+        reader = iter_cached_batches(sql_text)
+        if reader is None:
+            return None
+        return reader.read_all().to_pandas()
+    except (KeyError, pa.ArrowInvalid) as error:
+        # partially expired or corrupt entry, treat as a miss
+        logging.debug(f"Dropping unreadable cache entry: {error}")
+        clear_query_cache(sql_text)
+        return None
 
 def clear_all_cache():
 
@@ -95,4 +285,8 @@ def clear_query_cache(sql_text: str):
     """
 
     key = get_cache_key(sql_text)
-    r.delete(key)
\ No newline at end of file
+    num_chunks = r.get(key)
+    keys = [key]
+    if num_chunks is not None:
+        keys += [f"{key}:{i}" for i in range(int(num_chunks))]
+    r.delete(*keys)
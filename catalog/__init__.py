@@ -0,0 +1 @@
+from .table_catalog import get_table, clear_catalog
@@ -0,0 +1,336 @@
+import os
+import re
+import logging
+import threading
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+from pyarrow import parquet as pq
+from urllib.parse import unquote
+
+# Process-wide table catalog
+# Each table's footer is read once and reused until its file changes on disk.
+# A table is either one file, data/<table>.parquet, or a directory of files partitioned
+# Hive-style, data/<table>/<col>=<value>/.../<file>. The partition columns are not stored in
+# the files: every row of a file takes the values of its directories. Footers of the files of
+# a partitioned table are reused across versions of the table, so a new partition only reads its own.
+_tables = {} # (data_dir, table) -> TableMetadata
+_lock = threading.Lock()
+
+DEFAULT_PARTITION = "__HIVE_DEFAULT_PARTITION__" # directory value of a NULL partition column
+DATE = re.compile(r"^\d{4}-\d{2}-\d{2}$")
+INTEGER = re.compile(r"^-?\d+$")
+MAX_DICTIONARY_SIZE = 65536 # distinct values of a string column kept as shared categories, larger columns are read plain
+
+# File of a table
+class TableFile:
+    def __init__(self, path, metadata, version, partition=None):
+        self.path = path # path of the parquet file
+        self.metadata = metadata # pyarrow.parquet.FileMetaData (row groups, statistics)
+        self.version = version # file version (mtime, size), changes when the file is rewritten
+        self.partition = partition or {} # lowercased partition column -> typed value of the file's directory (None for NULL)
+        self.col_index = {} # lowercased column name -> column index in the row groups
+        for i in range(metadata.num_columns):
+            self.col_index.setdefault(metadata.schema.column(i).path.split('.')[0].lower(), i)
+
+    def __repr__(self):
+        return f"TableFile(path={self.path}, partition={self.partition}, num_rows={self.metadata.num_rows})"
+
+# Table Metadata Structure
+class TableMetadata:
+    def __init__(self, name, file_path, schema, files, partition_columns=None):
+        self.name = name # table name
+        self.file_path = file_path # path of the parquet file, or of the directory of a partitioned table
+        self.schema = schema # pyarrow.Schema of the table, partition columns last
+        self.columns = set([col.lower() for col in schema.names]) # lowercased column names
+        self.files = files # list[TableFile] in path order, a single one for an unpartitioned table
+        self.partition_columns = partition_columns or [] # partition column names, spelled as in the directories
+        self.num_rows = sum(file.metadata.num_rows for file in files) # total number of rows
+        self.num_row_groups = sum(file.metadata.num_row_groups for file in files) # total number of row groups
+        self.version = tuple((file.path, file.version) for file in files) # table version, changes when any file does
+        self.stats = {} # lowercased column -> (min, max, null_count), filled lazily
+        self.dictionaries = {} # lowercased column -> pandas.CategoricalDtype of the distinct values scanned so far
+        self.plain_columns = set() # lowercased string columns over MAX_DICTIONARY_SIZE distinct values, read plain
+
+    def __repr__(self):
+        return (f"TableMetadata(\n"
+                f"  name={self.name},\n"
+                f"  file_path={self.file_path},\n"
+                f"  columns={self.schema.names},\n"
+                f"  partition_columns={self.partition_columns},\n"
+                f"  num_files={len(self.files)},\n"
+                f"  num_rows={self.num_rows},\n"
+                f"  num_row_groups={self.num_row_groups})")
+
+    def is_partition_column(self, col):
+        return col.lower() in (name.lower() for name in self.partition_columns)
+
+    def column_stats(self, col):
+
+        """ Combine a column's min/max/null count statistics over all row groups.
+
+        The statistics of a partition column come from the partition values of the files.
+
+        Args:
+            col (str): column name
+        Returns:
+            tuple (min, max, null_count), or None if a row group has no statistics
+        """
+
+        col = col.lower()
+        if col in self.stats:
+            return self.stats[col]
+
+        result = None
+        if self.is_partition_column(col):
+            files = [file for file in self.files if file.metadata.num_rows]
+            values = [file.partition[col] for file in files if file.partition[col] is not None]
+            nulls = sum(file.metadata.num_rows for file in files if file.partition[col] is None)
+            if values:
+                result = (min(values), max(values), nulls)
+        elif self.num_row_groups > 0 and all(col in file.col_index for file in self.files):
+            lo, hi, nulls, complete = None, None, 0, True
+            for file in self.files:
+                idx = file.col_index[col]
+                for rg in range(file.metadata.num_row_groups):
+                    stats = file.metadata.row_group(rg).column(idx).statistics
+                    if stats is None or not stats.has_min_max:
+                        complete = False
+                        break
+                    lo = stats.min if lo is None else min(lo, stats.min)
+                    hi = stats.max if hi is None else max(hi, stats.max)
+                    nulls += stats.null_count if stats.has_null_count else 0
+                if not complete:
+                    break
+            if complete and lo is not None:
+                result = (lo, hi, nulls)
+        self.stats[col] = result
+        return result
+
+    def column_dictionary(self, col, values):
+
+        """ Categories of a dictionary-encoded string column, shared by the scans of the file version.
+
+        The categories are the sorted distinct values of the row groups scanned so far: a scan passes
+        the dictionaries of the row groups it read, and only values not seen before make new categories.
+        Scans of the same row groups then share the same categories, so values derived from them,
+        like their lowercased form, can be cached across queries. A column going over
+        MAX_DICTIONARY_SIZE distinct values gets no categories and is read plain from then on.
+
+        Args:
+            col (str): column name
+            values (pyarrow.ChunkedArray): dictionary values of the row groups read
+        Returns:
+            pandas.CategoricalDtype: sorted distinct non-null values scanned so far,
+            or None if there are too many of them
+        """
+
+        col = col.lower()
+        if col in self.plain_columns:
+            return None
+        dtype = self.dictionaries.get(col)
+        if self.is_partition_column(col):
+            if dtype is None:
+                name = [n for n in self.schema.names if n.lower() == col][0]
+                values = pa.array([file.partition[col] for file in self.files], type=self.schema.field(name).type)
+                dtype = pd.CategoricalDtype(pd.Index(pc.unique(values.drop_null()).sort().to_pandas()))
+            return self.dictionaries.setdefault(col, dtype)
+
+        values = pc.unique(values.drop_null())
+        if dtype is not None:
+            known = pa.array(dtype.categories, type=values.type)
+            values = values.filter(pc.invert(pc.is_in(values, value_set=known)))
+            if len(values) == 0:
+                return dtype
+            values = pa.concat_arrays([known, values])
+        if len(values) > MAX_DICTIONARY_SIZE:
+            logging.debug(f"{self.name}.{col} has over {MAX_DICTIONARY_SIZE} distinct values, reading it plain")
+            self.plain_columns.add(col)
+            self.dictionaries.pop(col, None)
+            return None
+        dtype = pd.CategoricalDtype(pd.Index(values.sort().to_pandas()))
+        self.dictionaries[col] = dtype
+        return dtype
+
+def partition_field(name, raw_values):
+
+    """ Infer the type of a partition column from the values of its directories.
+
+    Values are int64 if all are integers, date32 if all are dates (YYYY-MM-DD), else strings.
+
+    Args:
+        name (str): partition column name
+        raw_values (list[str]): directory values, None for the default (NULL) partition
+
+    Returns:
+        tuple:
+            - pyarrow.Field: the partition column
+            - list: typed values, in the order of raw_values
+    """
+
+    present = [value for value in raw_values if value is not None]
+    if present and all(INTEGER.match(value) for value in present):
+        dtype = pa.int64()
+    elif present and all(DATE.match(value) for value in present):
+        dtype = pa.date32()
+    else:
+        dtype = pa.string()
+    values = pa.array(raw_values, type=pa.string()).cast(dtype).to_pylist()
+    return pa.field(name, dtype), values
+
+def list_partition_files(dir_path):
+
+    """ List the files of a partitioned table with the partition values of their directories.
+
+    Hidden files and directories (starting with "." or "_", e.g. _SUCCESS) are skipped.
+
+    Args:
+        dir_path (str): directory of the table
+
+    Returns:
+        list[tuple]: (path, (mtime, size), [(column, raw value)]) of every file, in path order
+    Raises:
+        RuntimeError: if a directory is not named <col>=<value>, or the files are partitioned differently
+    """
+
+    files = []
+    for root, dirs, names in os.walk(dir_path):
+        dirs[:] = sorted(d for d in dirs if not d.startswith((".", "_")))
+        relative = os.path.relpath(root, dir_path)
+        partition = []
+        for part in ([] if relative == "." else relative.split(os.sep)):
+            column, sep, value = part.partition("=")
+            if not sep or not column:
+                raise RuntimeError(f"Directory {part} of table {os.path.basename(dir_path)} is not a <column>=<value> partition")
+            value = unquote(value)
+            partition.append((column, None if value == DEFAULT_PARTITION else value))
+        for name in sorted(names):
+            if name.startswith((".", "_")):
+                continue
+            path = os.path.join(root, name)
+            stat = os.stat(path)
+            files.append((path, (stat.st_mtime_ns, stat.st_size), partition))
+
+    keys = {tuple(column for column, _ in partition) for _, _, partition in files}
+    if len(keys) > 1:
+        raise RuntimeError(f"Files of table {os.path.basename(dir_path)} are partitioned differently: {sorted(keys)}")
+    return files
+
+def load_partitioned_table(table, dir_path, listed, previous):
+
+    """ Load the metadata of a partitioned table, reusing the footers of unchanged files.
+
+    Args:
+        table (str): table name
+        dir_path (str): directory of the table
+        listed (list[tuple]): files of the table (see list_partition_files)
+        previous (TableMetadata): earlier catalog entry of the table, or None
+
+    Returns:
+        TableMetadata: the table, with its partition columns after the file columns
+    Raises:
+        RuntimeError: if the table has no files, or its files or partitions do not fit together
+    """
+
+    if not listed:
+        raise RuntimeError(f"Partitioned table {table} has no files")
+    known = {file.path: file for file in previous.files} if previous is not None else {}
+
+    names = [column for column, _ in listed[0][2]]
+    fields, typed = [], []
+    for i, name in enumerate(names):
+        field, values = partition_field(name, [partition[i][1] for _, _, partition in listed])
+        fields.append(field)
+        typed.append(values)
+
+    files, schema = [], None
+    for n, (path, version, _) in enumerate(listed):
+        metadata = known[path].metadata if path in known and known[path].version == version \
+            else pq.read_metadata(path)
+        file_schema = metadata.schema.to_arrow_schema()
+        if schema is None:
+            schema = file_schema
+        elif not file_schema.equals(schema, check_metadata=False):
+            raise RuntimeError(f"File {path} of table {table} does not have the schema of the other files")
+        partition = {name.lower(): typed[i][n] for i, name in enumerate(names)}
+        files.append(TableFile(path, metadata, version, partition))
+
+    for field in fields:
+        if field.name.lower() in (name.lower() for name in schema.names):
+            raise RuntimeError(f"Partition column {field.name} of table {table} is also a column of its files")
+        schema = schema.append(field)
+    return TableMetadata(table, dir_path, schema, files, names)
+
+def get_table(data_dir, table):
+
+    """ Get the metadata of a table, reading parquet footers only if not cached.
+
+    A cached entry is reloaded when the mtime or size of one of its files has changed,
+    or (for a partitioned table) files were added or removed.
+
+    Args:
+        data_dir (str): path to directory containing parquet files.
+        table (str): table name
+
+    Returns:
+        TableMetadata: schema, row count, and row group metadata of the table
+    Raises:
+        FileNotFoundError: if neither the parquet file nor the directory of the table exists
+        RuntimeError: if metadata cannot be read
+    """
+
+    table = table.lower()
+    file_path = os.path.join(data_dir, f"{table}.parquet")
+    dir_path = os.path.join(data_dir, table)
+    key = (data_dir, table)
+    listed = None
+    try:
+        stat = os.stat(file_path)
+        version = ((file_path, (stat.st_mtime_ns, stat.st_size)),)
+    except FileNotFoundError:
+        if not os.path.isdir(dir_path):
+            with _lock:
+                _tables.pop(key, None)
+            raise FileNotFoundError(f"Table {table} not found")
+        # the version of a partitioned table needs a listing of its files
+        try:
+            listed = list_partition_files(dir_path)
+        except OSError as e:
+            raise RuntimeError(f"Failed to list files of table {table}: {str(e)}")
+        version = tuple((path, file_version) for path, file_version, _ in listed)
+
+    with _lock:
+        entry = _tables.get(key)
+    if entry is not None and entry.version == version:
+        return entry
+
+    logging.debug(f"Loading catalog entry for table {table}")
+    try:
+        if listed is None:
+            parquet_file = pq.ParquetFile(file_path)
+            files = [TableFile(file_path, parquet_file.metadata, version[0][1])]
+            entry = TableMetadata(table, file_path, parquet_file.schema_arrow, files)
+        else:
+            entry = load_partitioned_table(table, dir_path, listed, entry)
+    except RuntimeError:
+        raise
+    except Exception as e:
+        raise RuntimeError(f"Failed to read schema for table {table}: {str(e)}")
+
+    with _lock:
+        _tables[key] = entry
+    return entry
+
+def clear_catalog():
+
+    """ Drop all cached table metadata
+
+    Args:
+        None
+    Returns:
+        None
+
+    """
+
+    with _lock:
+        _tables.clear()
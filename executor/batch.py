@@ -0,0 +1,109 @@
+# Batch execution with shared scans
+# The queries of a batch are grouped by source table and every table is read once:
+# each row group is decoded a single time and handed to every query reading the table,
+# which applies its own filters and projections to it. I/O and decoding then grow with
+# the number of tables in the batch rather than with the number of queries.
+import logging
+import pandas as pd
+from collections import defaultdict
+from executor.executor import multi_table_execute
+from executor.executor_parallel import process_chunk, merge_results
+from executor.execute_helper import column_filter, is_aggregate
+from executor.scan import required_columns, plan_shared_scan, read_row_groups, dictionary_to_pandas
+
+def table_chunk(plan, table, df):
+
+    """ Reduce a row group of a table to the rows and columns a multi-table query needs from it.
+
+    Args:
+        plan (LogicalPlan): validated logical plan
+        table (str): source table name
+        df (pandas.DataFrame): row group of the table, with lowercased columns
+
+    Returns:
+        pandas.DataFrame: rows passing the query's single-table filters, restricted to its required columns
+    """
+
+    if plan.single_filters and table in plan.single_filters:
+        df = column_filter(plan, df, table)
+    needed = required_columns(plan, table)
+    return df[[c for c in df.columns if c in needed]]
+
+def execute_batch(plans, data_dir):
+
+    """ Execute several logical plans with one shared scan per source table.
+
+    Single-table queries process every row group like a parallel chunk (see process_chunk),
+    and their chunks are merged at the end (see merge_results). A query with LIMIT and
+    without ORDER BY or aggregation stops taking row groups once it has enough rows, and the
+    scan of a table stops once no query needs more of it. Multi-table queries keep the
+    filtered rows of each table and are joined at the end (see multi_table_execute).
+    Row groups pruned for a query are skipped for that query only.
+    Execution is sequential on the pandas engine.
+
+    Args:
+        plans (list[LogicalPlan]): validated and optimized logical plans
+        data_dir (str): directory containing parquet table files.
+
+    Returns:
+        list[pandas.DataFrame]: result of every plan, in the order of plans
+    """
+
+    readers = defaultdict(list) # table -> indices of the plans reading it
+    for i, plan in enumerate(plans):
+        for table in plan.source_tables:
+            readers[table].append(i)
+
+    chunks = [defaultdict(list) for _ in plans] # per plan: table -> processed row groups
+    rows = [0] * len(plans) # rows produced so far by single-table queries
+    columns = {} # table -> lowercased scanned columns
+
+    def satisfied(i):
+        # a LIMIT without ORDER BY or aggregation is reached, later rows cannot be in the result
+        plan = plans[i]
+        return len(plan.source_tables) == 1 and plan.limit is not None and not plan.order_by \
+            and not is_aggregate(plan) and rows[i] >= plan.limit
+
+    for table, ids in readers.items():
+        entry, scan_columns, row_groups, dictionary, needed = plan_shared_scan([plans[i] for i in ids], table, data_dir)
+        columns[table] = [c.lower() for c in scan_columns]
+        empty = dictionary_to_pandas(entry.schema.empty_table().select(scan_columns), entry)
+        empty.columns = columns[table]
+
+        offset = 0
+        for rg, tbl in zip(row_groups, read_row_groups(entry, scan_columns, row_groups, dictionary)):
+            df = dictionary_to_pandas(tbl, entry)
+            df.columns = columns[table]
+            df.index = pd.RangeIndex(offset, offset + len(df))
+            offset += len(df)
+            for k, i in enumerate(ids):
+                if rg not in needed[k] or satisfied(i):
+                    continue
+                if len(plans[i].source_tables) == 1:
+                    chunk = process_chunk(df, plans[i])
+                    rows[i] += len(chunk)
+                else:
+                    chunk = table_chunk(plans[i], table, df)
+                chunks[i][table].append(chunk)
+            # stop reading once every query has what it needs
+            if all(satisfied(i) for i in ids):
+                logging.debug(f"Shared scan of {table} stopped after row group {rg}")
+                break
+
+        # a query without row groups left still needs a result with the right columns
+        for i in ids:
+            if not chunks[i][table]:
+                plan = plans[i]
+                chunk = process_chunk(empty, plan) if len(plan.source_tables) == 1 else table_chunk(plan, table, empty)
+                chunks[i][table].append(chunk)
+
+    results = []
+    for i, plan in enumerate(plans):
+        if len(plan.source_tables) == 1:
+            table = plan.source_tables[0]
+            results.append(merge_results(plan, chunks[i][table], columns[table]))
+        else:
+            df_arr = {table: pd.concat(chunks[i][table]) for table in plan.source_tables}
+            results.append(multi_table_execute(plan, plan.source_tables, df_arr))
+    logging.debug(f"Executed {len(plans)} queries with {len(readers)} table scans")
+    return results
@@ -1,45 +1,370 @@
 # This file contains all helper functions needed for EXECUTOR module.
 import logging
+import operator
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+from collections import defaultdict
+from planner.predicate import AND, is_leaf, conjunction, predicate_leaves
+from executor.spill import over_budget, external_sort
+from executor.profile import profiled
+
+# AND / OR branches are evaluated only on the rows they can still change,
+# unless more than this fraction of the rows is undecided
+SHORT_CIRCUIT_FRACTION = 0.5
+
+# comparison operators of WHERE / HAVING predicates
+COMPARE_OPS = {"=": operator.eq, ">": operator.gt, "<": operator.lt, ">=": operator.ge, "<=": operator.le}
+
+# lowercased categories of dictionary-encoded string columns, keyed by the categories object
+# (scans share the catalog's categories of each column version, see scan.dictionary_to_pandas)
+MAX_LOWERED_DICTIONARIES = 64
+_lowered_dictionaries = {} # id(categories) -> (categories, lowercased categories)
+
+# how partial aggregates of the same group are combined
+PARTIAL_COMBINE = {"rows": "sum", "count": "sum", "sum": "sum", "min": "min", "max": "max"}
+
+# Helper function to convert a WHERE literal into int/float, or leave it as str
+def parse_literal(value):
+    value = value.strip("'\"")
+
+    # check whether the value is int/float
+    try:
+        if "." in value:
+            value = float(value)
+        else:
+            value = int(value)
+    except:
+        pass
+    return value
+
+# Helper function to get the lowercased categories of a dictionary-encoded column, computed once per categories
+def lowered_dictionary(categories):
+    cached = _lowered_dictionaries.get(id(categories))
+    if cached is not None and cached[0] is categories:
+        return cached[1]
+    lowered = categories.str.lower()
+    if len(_lowered_dictionaries) >= MAX_LOWERED_DICTIONARIES:
+        _lowered_dictionaries.pop(next(iter(_lowered_dictionaries)), None)
+    _lowered_dictionaries[id(categories)] = (categories, lowered)
+    return lowered
+
+# Helper function to evaluate one comparison (col, op, value) on a column's values
+# literals are already typed by the validator; string equality is case-insensitive
+# dictionary-encoded (categorical) columns are compared on their categories, then each row takes its code's result
+def comparison_mask(values, op, value):
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        categories = values.cat.categories
+        if isinstance(value, str):
+            categories, value = lowered_dictionary(categories), value.lower()
+        hits = np.asarray(COMPARE_OPS[op](categories, value), dtype=bool)
+        # code -1 (null) takes the appended False
+        return np.append(hits, False)[values.cat.codes.to_numpy()]
+    if isinstance(value, str):
+        values, value = values.str.lower(), value.lower()
+    return COMPARE_OPS[op](values, value).fillna(False).to_numpy(dtype=bool)
+
+# Helper function to turn dictionary-encoded (categorical) columns back into their values
+# called once the filters are applied, so only the surviving rows are decoded
+@profiled("projection")
+def decode_dictionaries(df):
+    decoded = {}
+    for col in df.columns:
+        values = df[col]
+        if not isinstance(values.dtype, pd.CategoricalDtype):
+            continue
+        codes = values.cat.codes.to_numpy()
+        if (codes < 0).any():
+            decoded[col] = values.astype(values.cat.categories.dtype)
+        else:
+            decoded[col] = pd.Series(values.cat.categories.take(codes), index=df.index)
+    return df.assign(**decoded) if decoded else df
+
+# Helper function to evaluate a predicate tree into one boolean mask
+# get_column(col) returns the column's values of all rows, positions restricts the evaluation to some rows.
+# Children of AND / OR are only evaluated on rows they can still change (rows still true for AND,
+# still false for OR), and once a branch decides every row, the remaining branches are skipped.
+# The optimizer orders the most selective branches first, so later branches see few rows.
+def predicate_mask(node, get_column, num_rows, positions=None):
+    if is_leaf(node):
+        col, op, value = node
+        values = get_column(col)
+        if positions is not None:
+            values = values.iloc[positions]
+        return comparison_mask(values, op, value)
+
+    connective, children = node
+    size = num_rows if positions is None else len(positions)
+    mask = np.full(size, connective == AND)
+    for child in children:
+        undecided = np.flatnonzero(mask) if connective == AND else np.flatnonzero(~mask)
+        if len(undecided) == 0:
+            break
+        if len(undecided) > size * SHORT_CIRCUIT_FRACTION:
+            # most rows undecided, evaluating all rows is cheaper than gathering them
+            child_mask = predicate_mask(child, get_column, num_rows, positions)
+            mask = (mask & child_mask) if connective == AND else (mask | child_mask)
+        else:
+            sub_positions = undecided if positions is None else positions[undecided]
+            mask[undecided] = predicate_mask(child, get_column, num_rows, sub_positions)
+    return mask
 
 # Helper function to filter a given table based on WHERE predicates
-# WHERE predicates are stored in a plan as a dictionary (key = table, value = set of predicates)
+# WHERE predicates are stored in a plan as a dictionary (key = table, value = list of conjunctive
+# predicate trees), evaluated into a single mask so the frame is filtered only once
+@profiled("filter", arg=1)
 def column_filter(plan, df, table):
     logging.debug("Applying WHERE predicates")
-    expressions = plan.single_filters[table]
-    for (col, op, value) in expressions:
-        value = value.strip("'\"")
-        
-        # check whether the value is int/float
-        try:
-            if "." in value:
-                value = float(value)
-            else:
-                value = int(value)
-        except:
-            pass
-
-        if op == "=":
-            # For string, need case-insensitive comparison
-            if isinstance(value, str):
-                df = df[df[col].str.lower() == value.lower()]
-            else:
-                df = df[df[col] == value]
-        elif op == ">":
-            if isinstance(value, str):
-                raise TypeError(f"Operator {op} not supported with str")
-            df = df[df[col] > value]
-        elif op == "<":
-            if isinstance(value, str):
-                raise TypeError(f"Operator {op} not supported with str")
-            df = df[df[col] < value]
-        elif op == "<=":
-            if isinstance(value, str):
-                raise TypeError(f"Operator {op} not supported with str")
-            df = df[df[col] <= value]
-        elif op == ">=":
-            if isinstance(value, str):
-                raise TypeError(f"Operator {op} not supported with str")
-            df = df[df[col] >= value]
+    predicates = plan.single_filters[table]
+    if not predicates:
+        return df
+    mask = predicate_mask(conjunction(predicates), lambda col: df[col.lower()], len(df))
+    return df[mask]
+
+# Helper function to filter joined tables on WHERE predicates across tables (see column_filter)
+# their columns are named "table.column", which is looked up in the joined result
+@profiled("filter after joins", arg=1)
+def residual_filter(plan, df):
+    logging.debug("Applying WHERE predicates across tables")
+    def get_column(col):
+        table, col = col.split(".", 1)
+        return df[resolve_column(df.columns, table, col.lower())]
+    mask = predicate_mask(conjunction(plan.residual_filters), get_column, len(df))
+    return df[mask]
+
+# Helper function to collect join key columns of each table from the join filters
+# join keys have to survive the column projection until the tables are joined
+def join_key_columns(plan):
+    join_keys = defaultdict(list)
+    for (t1, c1, op, t2, c2) in plan.join_filters or []:
+        join_keys[t1].append(c1.lower())
+        join_keys[t2].append(c2.lower())
+    return join_keys
+
+# Helper function to collect the join conditions between a table and the tables joined before it
+# conditions are oriented (joined table, column, op, table, column); the optimizer lists the condition
+# the table is joined on first, the others are checked on the joined rows (see join_condition_mask)
+def join_conditions(plan, joined, table):
+    conditions = []
+    for (t1, c1, op, t2, c2) in plan.join_filters or []:
+        if op != '=':
+            raise NotImplementedError(f"Only equi-joins supported now")
+        if t2 == table and t1 in joined:
+            conditions.append((t1, c1, op, t2, c2))
+        elif t1 == table and t2 in joined:
+            conditions.append((t2, c2, op, t1, c1))
+    return conditions
+
+# Helper function to drop the rows of both inputs of an equi-join whose join key is null
+# null keys never match (pd.merge would match null to null and NaN to NaN)
+def drop_null_keys(left, right, left_on, right_on):
+    left_valid, right_valid = left[left_on].notna(), right[right_on].notna()
+    if not left_valid.all():
+        left = left[left_valid]
+    if not right_valid.all():
+        right = right[right_valid]
+    return left, right
+
+# Helper function to evaluate further equi-join conditions of a join step on the joined rows
+# get_column(table, col) returns the values of a table's column in the joined result; null keys never match
+def join_condition_mask(conditions, get_column):
+    mask = None
+    for (t1, c1, op, t2, c2) in conditions:
+        left, right = get_column(t1, c1.lower()), get_column(t2, c2.lower())
+        cond = COMPARE_OPS[op](left, right).fillna(False).to_numpy(dtype=bool)
+        mask = cond if mask is None else mask & cond
+    return mask
+
+# Helper function to follow the name of every (table, column) of the joined rows through an equi-join step
+# mirrors pd.merge / Table.join: a column on both sides takes its side's suffix, except a key
+# of the same name on both sides, which becomes one column
+def joined_names(names, table, right_columns, left_key, right_key, suffixes):
+    shared = {left_key} if left_key == right_key else set()
+    clashing = (set(names.values()) & set(right_columns)) - shared
+    result = {key: name + suffixes[0] if name in clashing else name for key, name in names.items()}
+    for col in right_columns:
+        result[(table, col)] = col + suffixes[1] if col in clashing else col
+    return result
+
+# Helper function to rename the columns a cross join step would clash on to "<column>_<table>", like join suffixes
+# returns the names after the step and the renaming of both inputs
+def cross_join_names(names, table, right_columns):
+    clashing = set(names.values()) & set(right_columns)
+    left_rename = {name: f"{name}_{t}" for (t, col), name in reversed(list(names.items())) if name in clashing}
+    right_rename = {col: f"{col}_{table}" for col in right_columns if col in clashing}
+    result = {key: left_rename.get(name, name) for key, name in names.items()}
+    for col in right_columns:
+        result[(table, col)] = right_rename.get(col, col)
+    return result, left_rename, right_rename
+
+# Helper function to find join key columns in a joined result that were not projected
+# a key shared by both sides is a single column, otherwise it carries the "_<table>" suffix
+def unprojected_join_keys(plan, join_keys, projected, columns):
+    drop_cols = []
+    for table, keys in join_keys.items():
+        for key in keys:
+            if key not in projected and key in columns:
+                drop_cols.append(key)
+            elif f"{key}_{table}" in columns and key not in [c.lower() for c in plan.col_proj[table]]:
+                drop_cols.append(f"{key}_{table}")
+    return list(dict.fromkeys(drop_cols))
+
+# Helper function to get the first n rows in ORDER BY order without sorting all rows
+# heap-based selection (Arrow's select_k) picks n candidate rows, only those are sorted
+# nulls come last in both directions, like sort_values
+def top_n(df, by, ascending, n):
+    if n >= len(df):
+        return df.sort_values(by=by, ascending=ascending)
+    order = "ascending" if ascending else "descending"
+    keys = pa.Table.from_pandas(df[by], preserve_index=False)
+    indices = pc.select_k_unstable(keys, k=n, sort_keys=[(col, order) for col in by])
+    return df.iloc[indices.to_numpy()].sort_values(by=by, ascending=ascending)
+
+# Helper function to apply ORDER BY and LIMIT of a plan to a DataFrame
+# sorts of frames over the session's memory limit spill sorted runs to disk (top-n only keeps n rows)
+@profiled("sort / limit", arg=1)
+def order_and_limit(plan, df):
+    if plan.order_by:
+        by = [col.lower() for col in plan.order_by]
+        ascending = (plan.order_dir != "DESC")
+        if plan.limit is not None:
+            return top_n(df, by, ascending, plan.limit)
+        if over_budget(df):
+            return external_sort(df, by, ascending)
+        return df.sort_values(by=by, ascending=ascending)
+    if plan.limit is not None:
+        return df.head(plan.limit)
+    return df
+
+# Helper function to check whether a plan aggregates rows (GROUP BY, aggregate functions, or HAVING)
+def is_aggregate(plan):
+    return bool(plan.aggregates or plan.group_by or plan.having)
+
+# Helper function to list the aggregates to compute: the SELECT aggregates, then those only used in HAVING
+# each aggregate is (function, table, column, name)
+def aggregate_specs(plan):
+    specs = {agg[3]: agg for agg in plan.aggregates or []}
+    for (func, table, col, name, op, value) in plan.having or []:
+        if func and name not in specs:
+            specs[name] = (func, table, col, name)
+    return list(specs.values())
+
+# Helper function to collect the (lowercased) columns of each table read by GROUP BY and aggregates
+def aggregate_columns(plan):
+    columns = defaultdict(list)
+    for (table, col) in plan.group_by or []:
+        columns[table].append(col)
+    for (func, table, col, name) in aggregate_specs(plan):
+        if table is not None:
+            columns[table].append(col)
+    return columns
+
+# Helper function to collect the (lowercased) columns of each table read by WHERE predicates across tables
+def residual_columns(plan):
+    columns = defaultdict(list)
+    for node in plan.residual_filters or []:
+        for (col, op, value) in predicate_leaves(node):
+            table, col = col.split(".", 1)
+            columns[table].append(col.lower())
+    return columns
+
+# Helper function to find a table's column in a (possibly joined) result
+# joins suffix clashing columns with "_<table>", cross joins rename columns to "<table>.<column>"
+def resolve_column(columns, table, col):
+    for name in (f"{table}.{col}", f"{col}_{table}", col):
+        if name in columns:
+            return name
+    raise KeyError(f"Column {col} of {table} not found")
+
+# Helper function to list the partial aggregate columns of a plan, see partial_aggregate
+def partial_columns(plan):
+    columns = ["#rows"]
+    for (func, table, col, name) in aggregate_specs(plan):
+        if table is None:
+            continue
+        if func in ("COUNT", "SUM", "AVG"):
+            columns.append(f"{name}#count")
+        if func in ("SUM", "AVG"):
+            columns.append(f"{name}#sum")
+        if func in ("MIN", "MAX"):
+            columns.append(f"{name}#{func.lower()}")
+    return columns
+
+# Helper function for the first phase of an aggregation: partial aggregates of a chunk of rows
+# per group, "#rows" counts the rows, and each aggregate keeps mergeable partial columns:
+# COUNT -> count, SUM / AVG -> sum and count, MIN -> min, MAX -> max
+@profiled("partial aggregate", arg=1)
+def partial_aggregate(plan, df):
+    keys = [col for (table, col) in plan.group_by or []]
+    work = {col: df[resolve_column(df.columns, table, col)] for (table, col) in plan.group_by or []}
+    specs = [spec for spec in aggregate_specs(plan) if spec[1] is not None]
+    for (func, table, col, name) in specs:
+        work[f"{name}#in"] = df[resolve_column(df.columns, table, col)]
+    work = pd.DataFrame(work, index=df.index)
+
+    if keys:
+        groups = work.groupby(keys, sort=False, dropna=False)
+        parts = {"#rows": groups.size()}
+        values = lambda name: groups[f"{name}#in"]
+    else:
+        parts = {"#rows": len(work)}
+        values = lambda name: work[f"{name}#in"]
+
+    for (func, table, col, name) in specs:
+        if func in ("COUNT", "SUM", "AVG"):
+            parts[f"{name}#count"] = values(name).count()
+        if func in ("SUM", "AVG"):
+            parts[f"{name}#sum"] = values(name).sum()
+        if func in ("MIN", "MAX"):
+            parts[f"{name}#{func.lower()}"] = getattr(values(name), func.lower())()
+
+    if keys:
+        return pd.DataFrame(parts).reset_index()
+    return pd.DataFrame({col: [value] for col, value in parts.items()})
+
+# Helper function for the second phase of an aggregation: merge partial aggregates into the result
+# partial counts and sums are added up, partial minimums / maximums are combined,
+# then HAVING is applied and only the SELECT columns are kept
+@profiled("final aggregate", arg=1)
+def final_aggregate(plan, partials):
+    keys = [col for (table, col) in plan.group_by or []]
+    partials = [p for p in partials if not p.empty]
+    if partials:
+        df = pd.concat(partials, ignore_index=True)
+    else:
+        df = pd.DataFrame(columns=keys + partial_columns(plan))
+    combine = {col: PARTIAL_COMBINE[col.rsplit("#", 1)[1]] for col in partial_columns(plan)}
+
+    if keys:
+        result = df.groupby(keys, sort=False, dropna=False).agg(combine).reset_index()
+    else:
+        # a global aggregation always returns one row, even without input rows
+        result = pd.DataFrame({col: [getattr(df[col], func)()] for col, func in combine.items()})
+
+    for (func, table, col, name) in aggregate_specs(plan):
+        if table is None:
+            result[name] = result["#rows"]
+        elif func == "COUNT":
+            result[name] = result[f"{name}#count"]
+        elif func == "SUM":
+            # SUM of a group without values is NULL
+            result[name] = result[f"{name}#sum"].where(result[f"{name}#count"] > 0)
+        elif func == "AVG":
+            result[name] = (result[f"{name}#sum"] / result[f"{name}#count"]).where(result[f"{name}#count"] > 0)
         else:
-            raise NotImplementedError(f"Operator {op} not supported yet.")
-    return df
\ No newline at end of file
+            result[name] = result[f"{name}#{func.lower()}"]
+
+    # HAVING clause, filter the groups
+    for (func, table, col, name, op, value) in plan.having or []:
+        value = parse_literal(value)
+        column = result[name]
+        if isinstance(value, str):
+            if op != "=":
+                raise TypeError(f"Operator {op} not supported with str")
+            column, value = column.str.lower(), value.lower()
+        result = result[COMPARE_OPS[op](column, value).fillna(False).astype(bool)]
+
+    output = [c.lower() for table in plan.source_tables for c in plan.col_proj.get(table, [])]
+    output += [agg[3] for agg in plan.aggregates or []]
+    return result[output].reset_index(drop=True)
@@ -1,16 +1,27 @@
-import os 
 import logging
-import pyarrow.parquet as pq
 import pandas as pd
-from executor.executor_parallel import parallel_execute_single_table
-from executor.execute_helper import column_filter
+import pyarrow as pa
+from executor.executor_parallel import parallel_execute_single_table, process_execute_single_table, parallel_hash_join
+from executor.executor_parallel import grace_hash_join
+from executor.spill import over_budget, cross_join
+from executor.execute_helper import column_filter, join_key_columns, unprojected_join_keys, order_and_limit
+from executor.execute_helper import is_aggregate, aggregate_columns, partial_aggregate, final_aggregate
+from executor.execute_helper import residual_columns, residual_filter, resolve_column, decode_dictionaries
+from executor.execute_helper import join_conditions, join_condition_mask, joined_names, cross_join_names, drop_null_keys
+from executor.executor_arrow import arrow_single_table_execute, arrow_multi_table_execute
+from executor.scan import scan_table, read_table, iter_row_groups, read_filtered, cached_filtered, filter_rows
+from executor.scan import unfiltered_plan, dictionary_to_pandas, plan_scan
+from cache.intermediate_cache import store_intermediate
+from catalog import get_table
+from executor.profile import profile_stage
 from session import session
 
 def single_table_execute(plan, table, df):
 
     """ Execute plan on a single table.
 
-    Applies column projections, WHERE clause filters, and ORDER BY to table specified.
+    Applies column projections, WHERE clause filters, GROUP BY / aggregates / HAVING,
+    ORDER BY, and LIMIT to table specified.
 
     Args:
         plan (LogicalPlan): logical plan containing filters, projections, and ordering.
@@ -27,34 +38,39 @@ def single_table_execute(plan, table, df):
     if plan.single_filters:
         df = column_filter(plan, df, table)
 
-    # only get the column projections
+    # GROUP BY / aggregates, the result only has the grouped and aggregated columns
+    if is_aggregate(plan):
+        return order_and_limit(plan, final_aggregate(plan, [partial_aggregate(plan, decode_dictionaries(df))]))
+
+    # only get the column projections, decoding the surviving rows of dictionary-encoded columns
     proj_cols = []
     for col in plan.col_proj[table]:
         if col.lower() in df:
             proj_cols.append(col.lower())
-    df = df[proj_cols]
-
-    # ORDER BY specified, apply it
-    if plan.order_by:
-        df = df.sort_values(
-                    by=[col.lower() for col in plan.order_by],
-                    ascending=(plan.order_dir != "DESC")
-                )
+    df = decode_dictionaries(df[proj_cols])
+
+    # ORDER BY / LIMIT specified, apply it (top-n selection for ORDER BY ... LIMIT)
+    df = order_and_limit(plan, df)
     
     return df
 
-def multi_table_execute(plan, tables, df_arr):
+def multi_table_execute(plan, tables, df_arr, join=pd.merge):
 
     """Execute plan across multiple tables.
 
-    Handles single-table filters, column projections, join filters, and cross joins.
-    Performs inner joins for equi-joins or cross joins if no join conditions are present.
-    Applies ORDER BY sorting after joining tables together.
+    Handles single-table filters, column projections, join filters, cross joins, and
+    filters across tables (applied to the joined rows).
+    Tables are joined in the order of plan.source_tables: inner joins for equi-joins, where null
+    keys never match (further conditions with tables already joined filter the joined rows), and cross joins for tables
+    without a join condition.
+    Applies GROUP BY / aggregates / HAVING, ORDER BY sorting, and LIMIT after joining tables together.
 
     Args:
         plan (LogicalPlan): logical plan containing filters, projections, join info, and ordering.
         tables (list[str]): list of source tables
         df_arr (dict[str, pandas.DataFrame]): map of source tables to its DataFrames.
+        join (callable): equi-join function with pd.merge's left_on/right_on/suffixes signature,
+            parallel_hash_join when running in parallel.
 
     Returns:
         pandas.DataFrame: resulting DataFrame after joins, filters, projections, and sorting.
@@ -71,26 +87,63 @@ def multi_table_execute(plan, tables, df_arr):
         for table, expressions in plan.single_filters.items():
             df_arr[table] = column_filter(plan, df_arr[table], table)
     
-    # only get the column projections
+    # join keys have to survive the projection until the tables are joined
+    join_keys = join_key_columns(plan)
+    agg_cols = aggregate_columns(plan)
+
+    # filter columns across tables are only needed until the joined rows are filtered
+    filter_cols = residual_columns(plan)
+    filter_only = {}
+
+    # only get the column projections (and the columns grouped or aggregated)
+    projected = set()
     for table in tables:
         df = df_arr[table]
         proj_cols = [c.lower() for c in plan.col_proj[table] if c.lower() in df.columns]
+        proj_cols += [c for c in dict.fromkeys(agg_cols[table]) if c not in proj_cols]
+        projected.update(proj_cols)
+        proj_cols += [c for c in dict.fromkeys(join_keys[table]) if c not in proj_cols]
+        filter_only[table] = [c for c in dict.fromkeys(filter_cols[table]) if c not in proj_cols]
+        proj_cols += filter_only[table]
         if proj_cols:
-            df_arr[table] = df[proj_cols]
+            df_arr[table] = decode_dictionaries(df[proj_cols])
     
     joined_df = None
     if plan.join_filters:
+        # join the tables in the plan's join order, each one on its conditions with the tables joined before it
+        # names tracks the column of every (table, column) in the joined rows, as joins suffix clashing columns
         joined_df = df_arr[tables[0]]
-        for (t1, c1, op, t2, c2) in plan.join_filters:
-            if op != '=':
-                raise NotImplementedError(f"Only equi-joins supported now")
-            
-            # perform inner-join between tables
-            joined_df = pd.merge(joined_df,
-                                df_arr[t2],
-                                left_on=c1.lower(),
-                                right_on=c2.lower(),
-                                suffixes=(f"_{t1}", f"_{t2}"))
+        names = {(tables[0], col): col for col in joined_df.columns}
+        for table in tables[1:]:
+            conditions = join_conditions(plan, {t for (t, col) in names}, table)
+            right = df_arr[table]
+            if not conditions:
+                # no condition links the table to the joined ones, cross join it in the join order
+                names, left_rename, right_rename = cross_join_names(names, table, right.columns)
+                with profile_stage("cross join", len(joined_df) + len(right)) as stage:
+                    joined_df = cross_join(joined_df.rename(columns=left_rename), right.rename(columns=right_rename))
+                    stage.rows_out = len(joined_df)
+                continue
+
+            # perform inner-join between tables, partitioned through spill files over the memory limit
+            # rows with a null join key never match, as in the Arrow engine
+            (t1, c1, op, t2, c2) = conditions[0]
+            left_key, right_key, suffixes = names[(t1, c1.lower())], c2.lower(), (f"_{t1}", f"_{t2}")
+            joined_df, right = drop_null_keys(joined_df, right, left_key, right_key)
+            join_fn = grace_hash_join if over_budget(joined_df, right) else join
+            with profile_stage("join", len(joined_df) + len(right)) as stage:
+                joined_df = join_fn(joined_df,
+                                    right,
+                                    left_on=left_key,
+                                    right_on=right_key,
+                                    suffixes=suffixes)
+                names = joined_names(names, table, right.columns, left_key, right_key, suffixes)
+                # further conditions between the table and the joined ones filter the joined rows
+                if len(conditions) > 1:
+                    mask = join_condition_mask(conditions[1:], lambda t, c: joined_df[names[(t, c)]])
+                    joined_df = joined_df[mask]
+                stage.rows_out = len(joined_df)
+                stage.detail = join_fn.__name__
     else:
         # do a cross join on all tables
         for table in tables:
@@ -98,13 +151,25 @@ def multi_table_execute(plan, tables, df_arr):
         dfs = [df_arr[t] for t in tables]
         joined_df = dfs[0]
         for next_df in dfs[1:]:
-            joined_df = joined_df.merge(next_df, how='cross')
+            with profile_stage("cross join", len(joined_df) + len(next_df)) as stage:
+                joined_df = cross_join(joined_df, next_df)
+                stage.rows_out = len(joined_df)
+
+    # WHERE predicates across tables, then drop the columns only they needed
+    if plan.residual_filters:
+        joined_df = residual_filter(plan, joined_df)
+        joined_df = joined_df.drop(columns=[resolve_column(joined_df.columns, table, col)
+                                            for table, cols in filter_only.items() for col in cols])
+
+    # drop join keys that were not part of the column projection
+    if plan.join_filters and not is_aggregate(plan):
+        joined_df = joined_df.drop(columns=unprojected_join_keys(plan, join_keys, projected, joined_df.columns))
+
+    # GROUP BY / aggregates over the joined rows
+    if is_aggregate(plan):
+        joined_df = final_aggregate(plan, [partial_aggregate(plan, joined_df)])
     
-    if plan.order_by:
-        joined_df = joined_df.sort_values(
-            by=[c.lower() for c in plan.order_by],
-            ascending=(plan.order_dir != "DESC")
-        )
+    joined_df = order_and_limit(plan, joined_df)
     return joined_df
 
 def execute_plan(plan, data_dir):
@@ -112,7 +177,10 @@ def execute_plan(plan, data_dir):
     """Execute a logical plan 
     
     Load table data and use either single or multi-table execution based on session's PARALLEL_LEVEL
-    Currently, parallel execution for multiple tables is not supported.
+    Parallel execution for multiple tables joins with a partitioned hash join.
+    With session's INTERMEDIATE_CACHE_SIZE > 0, each table is scanned filtered through the
+    intermediate result cache (see scan.read_filtered). With session's ENGINE set to ARROW, the plan is executed on Arrow tables instead
+    and only the final result is converted to pandas.
 
     Args:
         plan (LogicalPlan): logical plan of the query
@@ -120,15 +188,28 @@ def execute_plan(plan, data_dir):
 
     Returns:
         pandas.DataFrame: final query result as a DataFrame.
-
-    Raises:
-        NotImplementedError: if parallel execution is used for multiple tables.
     """
 
+    if session.ENGINE == "ARROW":
+        return arrow_execute_plan(plan, data_dir)
+
+    # worker processes read their own row groups, so the table is not loaded here (unless its rows are cached)
+    filtered = session.INTERMEDIATE_CACHE_SIZE > 0
     table_data = {}
+    if session.PARALLEL_MODE == "PROCESS" and session.PARALLEL_LEVEL > 1 and len(plan.source_tables) == 1:
+        table = plan.source_tables[0]
+        cached = cached_filtered(plan, table, data_dir) if filtered else None
+        if cached is None:
+            logging.debug(f"Executing with {session.PARALLEL_LEVEL} worker processes")
+            return process_execute_single_table(plan, data_dir)
+        table_data[table] = dictionary_to_pandas(cached, get_table(data_dir, table))
+
+    # only read the columns referenced by the plan
     for table in plan.source_tables:
-        file_path = os.path.join(data_dir, f"{table}.parquet")
-        table_data[table] = pq.read_table(file_path).to_pandas()
+        if table not in table_data:
+            table_data[table] = scan_table(plan, table, data_dir, filtered)
+    if filtered:
+        plan = unfiltered_plan(plan, plan.source_tables)
     
     logging.debug(f"Executing with parallelism {session.PARALLEL_LEVEL}")
     parallel = session.PARALLEL_LEVEL
@@ -141,5 +222,142 @@ def execute_plan(plan, data_dir):
     elif parallel == 1:
         df = multi_table_execute(plan, plan.source_tables, table_data)
     else:
-        raise NotImplementedError("Parallel support for multiple tables not implemented.")
+        df = multi_table_execute(plan, plan.source_tables, table_data, join=parallel_hash_join)
     return df
+
+def arrow_execute_plan(plan, data_dir):
+
+    """Execute a logical plan with the Arrow engine
+
+    Tables are kept as pyarrow.Table through filters, joins, and sorting.
+    Arrow compute kernels use their own thread pool, so PARALLEL_LEVEL does not apply.
+    Tables are scanned through the intermediate result cache as in execute_plan.
+
+    Args:
+        plan (LogicalPlan): logical plan of the query
+        data_dir (str): directory containing parquet table files.
+
+    Returns:
+        pandas.DataFrame: final query result as a DataFrame.
+    """
+
+    table_data = {}
+    for table in plan.source_tables:
+        if session.INTERMEDIATE_CACHE_SIZE > 0:
+            table_data[table] = read_filtered(plan, table, data_dir)
+        else:
+            table_data[table] = read_table(plan, table, data_dir)
+    if session.INTERMEDIATE_CACHE_SIZE > 0:
+        plan = unfiltered_plan(plan, plan.source_tables)
+
+    logging.debug("Executing with arrow engine")
+    if len(table_data) == 1:
+        result = arrow_single_table_execute(plan, plan.source_tables[0], table_data[plan.source_tables[0]])
+    else:
+        result = arrow_multi_table_execute(plan, plan.source_tables, table_data)
+
+    # convert to pandas only for display
+    return result.to_pandas()
+
+def execute_plan_batches(plan, data_dir, batch_size):
+
+    """Execute a logical plan, returning the result as an iterator of record batches
+
+    Single-table queries without ORDER BY or aggregation are streamed (see result_tables).
+    Other queries are executed with execute_plan and the result is split into batches.
+    An empty result is a single zero-row batch, so consumers (and the results cache)
+    still get the result's schema.
+
+    Args:
+        plan (LogicalPlan): logical plan of the query
+        data_dir (str): directory containing parquet table files.
+        batch_size (int): maximum rows per batch.
+
+    Yields:
+        pyarrow.RecordBatch: batches of the query result.
+    """
+
+    schema, produced = None, False
+    for tbl in result_tables(plan, data_dir):
+        schema = tbl.schema
+        for batch in tbl.to_batches(max_chunksize=batch_size):
+            produced = True
+            yield batch
+    if not produced:
+        yield pa.RecordBatch.from_pylist([], schema=schema)
+
+def result_tables(plan, data_dir):
+
+    """Execute a logical plan, returning the result as an iterator of Arrow tables
+
+    Single-table queries without ORDER BY or aggregation are streamed: each row group is read, filtered,
+    and projected on its own, so the first rows are available after one row group and
+    memory use does not grow with the table. With LIMIT, reading stops once enough rows
+    were produced. Other queries are executed with execute_plan as one table.
+    A streamed scan answered by the intermediate result cache is executed on the cached rows;
+    otherwise the filtered rows of a scan read to the end are cached (see scan.read_filtered).
+    A scan reading no row group yields the result of an empty scan, so at least one table,
+    with the result's schema, is always yielded.
+
+    Args:
+        plan (LogicalPlan): logical plan of the query
+        data_dir (str): directory containing parquet table files.
+
+    Yields:
+        pyarrow.Table: parts of the query result, in order.
+    """
+
+    streaming = len(plan.source_tables) == 1 and not plan.order_by and not is_aggregate(plan) \
+        and session.PARALLEL_LEVEL == 1
+    if not streaming:
+        yield pa.Table.from_pandas(execute_plan(plan, data_dir), preserve_index=False)
+        return
+
+    logging.debug("Streaming single-table scan")
+    table = plan.source_tables[0]
+    remaining = plan.limit
+    if remaining == 0:
+        yield empty_scan(plan, table, data_dir)
+        return
+
+    # rows of the scan are filtered here and kept for the intermediate result cache, up to its budget
+    filters = plan.single_filters.get(table) if plan.single_filters else None
+    caching = bool(filters) and session.INTERMEDIATE_CACHE_SIZE > 0
+    exec_plan = plan
+    if caching:
+        cached = cached_filtered(plan, table, data_dir)
+        exec_plan, version = unfiltered_plan(plan, [table]), get_table(data_dir, table).version
+        if cached is not None:
+            yield arrow_single_table_execute(exec_plan, table, cached)
+            return
+    kept, kept_bytes = [], 0
+
+    scanned = False
+    for tbl in iter_row_groups(plan, table, data_dir):
+        scanned = True
+        if caching:
+            tbl = filter_rows(tbl, filters)
+            if kept is not None:
+                kept.append(tbl)
+                kept_bytes += tbl.nbytes
+                if kept_bytes > session.INTERMEDIATE_CACHE_SIZE * 1024 * 1024:
+                    kept = None
+        tbl = arrow_single_table_execute(exec_plan, table, tbl)
+        if remaining is not None:
+            tbl = tbl.slice(0, remaining)
+            remaining -= tbl.num_rows
+        yield tbl
+        # stop before reading another row group once LIMIT is reached
+        if remaining == 0:
+            return
+    if not scanned:
+        yield empty_scan(plan, table, data_dir)
+
+    # the scan read every row group that may match, so the kept rows are all rows satisfying the filters
+    if caching and kept:
+        store_intermediate(data_dir, table, version, filters, pa.concat_tables(kept))
+
+def empty_scan(plan, table, data_dir):
+    # Helper function to execute a single-table plan on no rows, for the schema of an empty streamed result
+    entry, columns, row_groups, dictionary = plan_scan(plan, table, data_dir)
+    return arrow_single_table_execute(plan, table, entry.schema.empty_table().select(columns))
@@ -0,0 +1,368 @@
+import logging
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+from executor.execute_helper import parse_literal, join_key_columns, unprojected_join_keys, residual_columns
+from executor.execute_helper import is_aggregate, aggregate_specs, aggregate_columns, resolve_column
+from executor.execute_helper import join_conditions, joined_names, cross_join_names
+from executor.profile import profiled, profile_stage
+from planner.predicate import AND, is_leaf, conjunction
+
+# Arrow-native execution: tables stay as pyarrow.Table until the result is displayed
+
+def lower_columns(tbl):
+
+    """ Lowercase the column names of an Arrow table. """
+
+    return tbl.rename_columns([name.lower() for name in tbl.column_names])
+
+ARROW_COMPARE = {"=": pc.equal, ">": pc.greater, "<": pc.less, "<=": pc.less_equal, ">=": pc.greater_equal}
+
+def arrow_compare(values, op, value):
+
+    """ Compare an Arrow array with a typed literal, string equality being case-insensitive. """
+
+    if isinstance(value, str):
+        values, value = pc.utf8_lower(values), value.lower()
+    return ARROW_COMPARE[op](values, value)
+
+@profiled("projection")
+def decode_arrow_dictionaries(tbl):
+
+    """ Cast dictionary-encoded columns of an Arrow table back to their value type.
+
+    Called once the filters are applied, so only the surviving rows are decoded.
+    """
+
+    for i, field in enumerate(tbl.schema):
+        if pa.types.is_dictionary(field.type):
+            tbl = tbl.set_column(i, field.name, tbl.column(i).cast(field.type.value_type))
+    return tbl
+
+def arrow_predicate_mask(node, get_column):
+
+    """ Evaluate a predicate tree into one boolean mask with pyarrow.compute.
+
+    Semantics follow execute_helper.predicate_mask: literals are already typed,
+    string equality is case-insensitive and null comparisons are false.
+
+    Args:
+        node (tuple): predicate tree, see planner.predicate
+        get_column (callable): column name of a comparison -> pyarrow column
+
+    Returns:
+        pyarrow.ChunkedArray: boolean mask without nulls
+    """
+
+    if is_leaf(node):
+        col, op, value = node
+        column = get_column(col)
+        if pa.types.is_dictionary(column.type):
+            # compare each chunk's (small) dictionary, then each row takes its index's result
+            chunks = [pc.take(arrow_compare(chunk.dictionary, op, value), chunk.indices)
+                      for chunk in column.chunks]
+            return pc.fill_null(pa.chunked_array(chunks, type=pa.bool_()), False)
+        return pc.fill_null(arrow_compare(column, op, value), False)
+
+    connective, children = node
+    combine = pc.and_ if connective == AND else pc.or_
+    mask = arrow_predicate_mask(children[0], get_column)
+    for child in children[1:]:
+        mask = combine(mask, arrow_predicate_mask(child, get_column))
+    return mask
+
+@profiled("filter", arg=1)
+def arrow_column_filter(plan, tbl, table):
+
+    """ Filter an Arrow table on the WHERE predicates of a table.
+
+    Builds one boolean mask with pyarrow.compute and filters the table once.
+
+    Args:
+        plan (LogicalPlan): logical plan containing single filters.
+        tbl (pyarrow.Table): table data with lowercased column names.
+        table (str): source table name
+
+    Returns:
+        pyarrow.Table: rows satisfying all predicates.
+    """
+
+    logging.debug("Applying WHERE predicates (arrow)")
+    predicates = plan.single_filters[table]
+    if not predicates:
+        return tbl
+    return tbl.filter(arrow_predicate_mask(conjunction(predicates), lambda col: tbl[col.lower()]))
+
+@profiled("filter after joins", arg=1)
+def arrow_residual_filter(plan, tbl):
+
+    """ Filter joined Arrow tables on the WHERE predicates across tables.
+
+    Args:
+        plan (LogicalPlan): logical plan containing residual filters ("table.column" names).
+        tbl (pyarrow.Table): joined table data.
+
+    Returns:
+        pyarrow.Table: rows satisfying all predicates.
+    """
+
+    logging.debug("Applying WHERE predicates across tables (arrow)")
+    def get_column(col):
+        table, col = col.split(".", 1)
+        return tbl[resolve_column(tbl.column_names, table, col.lower())]
+    return tbl.filter(arrow_predicate_mask(conjunction(plan.residual_filters), get_column))
+
+def arrow_sort(plan, tbl):
+
+    """ Sort an Arrow table on the ORDER BY columns using sort_indices/take.
+
+    Args:
+        plan (LogicalPlan): logical plan containing order_by and order_dir.
+        tbl (pyarrow.Table): table data with lowercased column names.
+
+    Returns:
+        pyarrow.Table: sorted table.
+    """
+
+    order = "descending" if plan.order_dir == "DESC" else "ascending"
+    indices = pc.sort_indices(tbl, sort_keys=[(col.lower(), order) for col in plan.order_by])
+    return tbl.take(indices)
+
+@profiled("sort / limit", arg=1)
+def arrow_order_and_limit(plan, tbl):
+
+    """ Apply ORDER BY and LIMIT to an Arrow table.
+
+    For ORDER BY ... LIMIT n, select_k_unstable picks the first n rows with a heap,
+    and only those are sorted.
+
+    Args:
+        plan (LogicalPlan): logical plan containing order_by, order_dir, and limit.
+        tbl (pyarrow.Table): table data with lowercased column names.
+
+    Returns:
+        pyarrow.Table: sorted and limited table.
+    """
+
+    if plan.order_by and plan.limit is not None and plan.limit < tbl.num_rows:
+        order = "descending" if plan.order_dir == "DESC" else "ascending"
+        indices = pc.select_k_unstable(tbl, k=plan.limit,
+                                       sort_keys=[(col.lower(), order) for col in plan.order_by])
+        return arrow_sort(plan, tbl.take(indices))
+    if plan.order_by:
+        tbl = arrow_sort(plan, tbl)
+    if plan.limit is not None:
+        tbl = tbl.slice(0, plan.limit)
+    return tbl
+
+@profiled("aggregate", arg=1)
+def arrow_aggregate(plan, tbl):
+
+    """ Apply GROUP BY / aggregates and HAVING to an Arrow table.
+
+    Uses Arrow's hash aggregation (Table.group_by), which runs on Arrow's own thread pool.
+    Semantics follow execute_helper.final_aggregate.
+
+    Args:
+        plan (LogicalPlan): logical plan containing group_by, aggregates, and having.
+        tbl (pyarrow.Table): table data with lowercased column names, possibly joined.
+
+    Returns:
+        pyarrow.Table: one row per group with the grouped columns and aggregates in SELECT.
+    """
+
+    keys = [col for (table, col) in plan.group_by or []]
+    columns = {col: tbl[resolve_column(tbl.column_names, table, col)] for (table, col) in plan.group_by or []}
+    aggregations, names = [], []
+    arrow_func = {"COUNT": "count", "SUM": "sum", "AVG": "mean", "MIN": "min", "MAX": "max"}
+    for (func, table, col, name) in aggregate_specs(plan):
+        if table is None:
+            aggregations.append(([], "count_all"))
+        else:
+            columns[f"{name}#in"] = tbl[resolve_column(tbl.column_names, table, col)]
+            aggregations.append((f"{name}#in", arrow_func[func]))
+        names.append(name)
+
+    work = pa.table(columns) if columns else pa.table({"#rows": pa.nulls(tbl.num_rows)})
+    result = work.group_by(keys, use_threads=True).aggregate(aggregations)
+    # grouped columns come first, then the aggregates in order
+    result = result.rename_columns(keys + names)
+
+    # HAVING clause, filter the groups
+    mask = None
+    for (func, table, col, name, op, value) in plan.having or []:
+        value = parse_literal(value)
+        column = result[name]
+        if isinstance(value, str):
+            if op != "=":
+                raise TypeError(f"Operator {op} not supported with str")
+            column, value = pc.utf8_lower(column), value.lower()
+        compare = {"=": pc.equal, ">": pc.greater, "<": pc.less, "<=": pc.less_equal, ">=": pc.greater_equal}[op]
+        cond = pc.fill_null(compare(column, value), False)
+        mask = cond if mask is None else pc.and_(mask, cond)
+    if mask is not None:
+        result = result.filter(mask)
+
+    output = [c.lower() for table in plan.source_tables for c in plan.col_proj.get(table, [])]
+    output += [agg[3] for agg in plan.aggregates or []]
+    return result.select(output)
+
+def arrow_cross_join(left, right):
+
+    """ Cartesian product of two Arrow tables (Arrow's join has no cross join). """
+
+    left_idx = np.repeat(np.arange(left.num_rows), right.num_rows)
+    right_idx = np.tile(np.arange(right.num_rows), left.num_rows)
+    left = left.take(pa.array(left_idx))
+    right = right.take(pa.array(right_idx))
+    columns = left.columns + right.columns
+    return pa.table(columns, names=left.column_names + right.column_names)
+
+def arrow_single_table_execute(plan, table, tbl):
+
+    """ Execute plan on a single Arrow table.
+
+    Applies WHERE clause filters, column projections, ORDER BY, and LIMIT to table specified.
+
+    Args:
+        plan (LogicalPlan): logical plan containing filters, projections, and ordering.
+        table (str): source table name
+        tbl (pyarrow.Table): table data.
+
+    Returns:
+        pyarrow.Table: Filtered, projected, and sorted table.
+    """
+
+    tbl = lower_columns(tbl)
+
+    # WHERE clause, apply single filters
+    if plan.single_filters:
+        tbl = arrow_column_filter(plan, tbl, table)
+
+    # GROUP BY / aggregates, the result only has the grouped and aggregated columns
+    if is_aggregate(plan):
+        return arrow_order_and_limit(plan, arrow_aggregate(plan, decode_arrow_dictionaries(tbl)))
+
+    # only get the column projections
+    proj_cols = []
+    for col in plan.col_proj[table]:
+        if col.lower() in tbl.column_names:
+            proj_cols.append(col.lower())
+    tbl = decode_arrow_dictionaries(tbl.select(proj_cols))
+
+    # ORDER BY / LIMIT specified, apply it
+    tbl = arrow_order_and_limit(plan, tbl)
+    return tbl
+
+def arrow_multi_table_execute(plan, tables, tbl_arr):
+
+    """ Execute plan across multiple Arrow tables.
+
+    Mirrors executor.multi_table_execute: filters and projects each table, then joins them
+    in the order of plan.source_tables with inner hash joins for equi-joins, or cross joins
+    for tables without a join condition, and filters the joined rows on predicates across tables.
+
+    Args:
+        plan (LogicalPlan): logical plan containing filters, projections, join info, and ordering.
+        tables (list[str]): list of source tables
+        tbl_arr (dict[str, pyarrow.Table]): map of source tables to its Arrow tables.
+
+    Returns:
+        pyarrow.Table: resulting table after joins, filters, projections, and sorting.
+
+    Raises:
+        NotImplementedError: if a non-equi join is requested.
+    """
+
+    for table in tbl_arr.keys():
+        tbl_arr[table] = lower_columns(tbl_arr[table])
+
+    # WHERE clause, apply single filters
+    if plan.single_filters:
+        for table, expressions in plan.single_filters.items():
+            tbl_arr[table] = arrow_column_filter(plan, tbl_arr[table], table)
+
+    # join keys have to survive the projection until the tables are joined
+    join_keys = join_key_columns(plan)
+    agg_cols = aggregate_columns(plan)
+
+    # filter columns across tables are only needed until the joined rows are filtered
+    filter_cols = residual_columns(plan)
+    filter_only = {}
+
+    # only get the column projections (and the columns grouped or aggregated)
+    projected = set()
+    for table in tables:
+        tbl = tbl_arr[table]
+        proj_cols = [c.lower() for c in plan.col_proj[table] if c.lower() in tbl.column_names]
+        proj_cols += [c for c in dict.fromkeys(agg_cols[table]) if c not in proj_cols]
+        projected.update(proj_cols)
+        proj_cols += [c for c in dict.fromkeys(join_keys[table]) if c not in proj_cols]
+        filter_only[table] = [c for c in dict.fromkeys(filter_cols[table]) if c not in proj_cols]
+        proj_cols += filter_only[table]
+        if proj_cols:
+            tbl_arr[table] = decode_arrow_dictionaries(tbl.select(proj_cols))
+
+    joined = None
+    if plan.join_filters:
+        # join the tables in the plan's join order, each one on its conditions with the tables joined before it
+        # names tracks the column of every (table, column) in the joined rows, as joins suffix clashing columns
+        joined = tbl_arr[tables[0]]
+        names = {(tables[0], col): col for col in joined.column_names}
+        for table in tables[1:]:
+            conditions = join_conditions(plan, {t for (t, col) in names}, table)
+            right = tbl_arr[table]
+            if not conditions:
+                # no condition links the table to the joined ones, cross join it in the join order
+                names, left_rename, right_rename = cross_join_names(names, table, right.column_names)
+                with profile_stage("cross join", len(joined) + len(right)) as stage:
+                    joined = arrow_cross_join(joined.rename_columns(left_rename), right.rename_columns(right_rename))
+                    stage.rows_out = len(joined)
+                continue
+
+            # perform inner hash join between tables
+            # keys with the same name collapse into one column, like pd.merge
+            (t1, c1, op, t2, c2) = conditions[0]
+            left_key, right_key, suffixes = names[(t1, c1.lower())], c2.lower(), (f"_{t1}", f"_{t2}")
+            with profile_stage("join", len(joined) + len(right)) as stage:
+                joined = joined.join(right,
+                                     keys=left_key,
+                                     right_keys=right_key,
+                                     join_type="inner",
+                                     left_suffix=suffixes[0],
+                                     right_suffix=suffixes[1],
+                                     coalesce_keys=(left_key == right_key))
+                names = joined_names(names, table, right.column_names, left_key, right_key, suffixes)
+                # further conditions between the table and the joined ones filter the joined rows
+                for (t1, c1, op, t2, c2) in conditions[1:]:
+                    cond = ARROW_COMPARE[op](joined[names[(t1, c1.lower())]], joined[names[(t2, c2.lower())]])
+                    joined = joined.filter(pc.fill_null(cond, False))
+                stage.rows_out = len(joined)
+    else:
+        # do a cross join on all tables
+        for table in tables:
+            tbl_arr[table] = tbl_arr[table].rename_columns(
+                [f"{table}.{col}" for col in tbl_arr[table].column_names])
+        joined = tbl_arr[tables[0]]
+        for table in tables[1:]:
+            with profile_stage("cross join", len(joined) + len(tbl_arr[table])) as stage:
+                joined = arrow_cross_join(joined, tbl_arr[table])
+                stage.rows_out = len(joined)
+
+    # WHERE predicates across tables, then drop the columns only they needed
+    if plan.residual_filters:
+        joined = arrow_residual_filter(plan, joined)
+        joined = joined.drop_columns([resolve_column(joined.column_names, table, col)
+                                      for table, cols in filter_only.items() for col in cols])
+
+    # drop join keys that were not part of the column projection
+    if plan.join_filters and not is_aggregate(plan):
+        drop_cols = unprojected_join_keys(plan, join_keys, projected, joined.column_names)
+        joined = joined.drop_columns(drop_cols)
+
+    # GROUP BY / aggregates over the joined rows
+    if is_aggregate(plan):
+        joined = arrow_aggregate(plan, joined)
+
+    joined = arrow_order_and_limit(plan, joined)
+    return joined
@@ -1,22 +1,60 @@
-from concurrent.futures import ThreadPoolExecutor
-from executor.execute_helper import column_filter
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from executor.execute_helper import column_filter, order_and_limit, is_aggregate, partial_aggregate, final_aggregate
+from executor.execute_helper import decode_dictionaries, drop_null_keys
+from executor.spill import SpillDirectory, memory_budget, frame_bytes, over_budget, external_merge, spilled_frame
+from executor.scan import plan_scan, column_chunk_bytes, file_columns, with_partition_columns
+from executor.profile import profiled, record_stage
+import multiprocessing
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
 import pandas as pd
+import numpy as np
 import logging
+import os
 import math
+import time
+import threading
+import contextvars
+from collections import defaultdict
 from session import session
 
+# Process pool kept across queries, since spawning workers costs more than most scans
+_process_pool = None
+_process_pool_workers = 0
+_process_pool_lock = threading.Lock() # queries of several server connections may ask for the pool at once
+
+def submit_task(executor, fn, *args):
+
+    """ Submit a task to a thread pool, running it in a copy of the caller's context.
+
+    The task then sees the session of the query (see session.new_session) and records
+    into its profile (see executor.profile).
+
+    Returns:
+        concurrent.futures.Future: future of the task
+    """
+
+    return executor.submit(contextvars.copy_context().run, fn, *args)
+
+@profiled("chunk")
 def process_chunk(df_chunk, plan):
 
     """ Process a chunk given to worker.
 
     Applies WHERE filters and column projections on the chunk of a DataFrame.
+    With GROUP BY / aggregates, the chunk's partial aggregates are returned instead,
+    to be merged by merge_results.
+    With ORDER BY, the chunk is sorted, so it can be merged with the other sorted chunks.
+    With LIMIT n, only the chunk's first n rows (in ORDER BY order, if any) are kept,
+    since no other row of the chunk can be in the final result.
 
     Args:
         df_chunk (pandas.DataFrame): subset of the table.
         plan (LogicalPlan): logical plan containing filters and column projections.
 
     Returns:
-        pandas.DataFrame: filtered and projected chunk of data.
+        pandas.DataFrame: filtered, projected, and (with ORDER BY) sorted chunk of data.
     """
 
     logging.debug(f"Processing chunk of size {len(df_chunk)}")
@@ -25,10 +63,18 @@ def process_chunk(df_chunk, plan):
     # Apply filters
     if plan.single_filters:
         df_chunk = column_filter(plan, df_chunk, table)
+
+    # First phase of the aggregation
+    if is_aggregate(plan):
+        return partial_aggregate(plan, decode_dictionaries(df_chunk))
     
-    # Apply column projection
+    # Apply column projection, decoding the surviving rows of dictionary-encoded columns
     proj_cols = [c.lower() for c in plan.col_proj[table] if c.lower() in df_chunk]
-    df_chunk = df_chunk[proj_cols]
+    df_chunk = decode_dictionaries(df_chunk[proj_cols])
+
+    # Sort the chunk / keep the local top-n
+    if plan.order_by or plan.limit is not None:
+        df_chunk = order_and_limit(plan, df_chunk)
     
     return df_chunk
 
@@ -37,7 +83,8 @@ def parallel_execute_single_table(plan, df):
 
     """ Execute a single-table query in parallel.
 
-    Determine chunk size based on number of workers, max chunk size, and number of chunks per worker. 
+    Determine chunk size based on number of workers, min / max chunk size, and number of chunks per worker. 
+    Chunks are zero-copy positional slices of the DataFrame.
     Processes each chunk in a ThreadPoolExecutor and concatenate results.
     Apply ORDER BY if specified.
 
@@ -59,38 +106,532 @@ def parallel_execute_single_table(plan, df):
     chunk size is then size of dataframe / total number of chunks.
     Since size of dataframe >> number of workers in some cases, 
     cap the chunk size to max_chunk_size
-    also, ensure that each chunk has atleast one row.
+    also, ensure that each chunk has atleast min_chunk_size rows, since the
+    task of a small chunk costs more than filtering its rows.
     '''
     num_workers = session.PARALLEL_LEVEL
     max_chunk_size = session.MAX_CHUNK_SIZE
+    min_chunk_size = max(min(session.MIN_CHUNK_SIZE, max_chunk_size), 1)
     num_chunks_per_worker = session.NUM_CHUNKS_PER_WORKER
     target_chunks = num_workers * num_chunks_per_worker
-    chunk_size = min(max(math.ceil(n / target_chunks), 1), max_chunk_size)
+    chunk_size = min(max(math.ceil(n / target_chunks), min_chunk_size), max_chunk_size)
     logging.debug(f"Chunk size per worker: {chunk_size}")
 
-    index_chunks = [df.index[i:i+chunk_size] for i in range(0, n, chunk_size)]
-    chunks = [df.loc[idx].copy() for idx in index_chunks]
+    # positional slices are views of the table, rows are only copied by each worker's filter
+    chunks = [df.iloc[i:i+chunk_size] for i in range(0, n, chunk_size)]
+
+    # a table of one chunk is processed here, without starting workers
+    if len(chunks) <= 1:
+        return merge_results(plan, [process_chunk(chunk, plan) for chunk in chunks], df.columns)
 
     results = []
-    with ThreadPoolExecutor(max_workers=num_workers) as executor:
+    with ThreadPoolExecutor(max_workers=num_workers, thread_name_prefix="worker") as executor:
         # submit the task of each chunk with process_chunk function
-        futures = [executor.submit(process_chunk, chunk, plan) for chunk in chunks]
+        futures = [submit_task(executor, process_chunk, chunk, plan) for chunk in chunks]
         for future in futures:
             results.append(future.result())
 
+    return merge_results(plan, results, df.columns)
+
+@profiled("merge", arg=1)
+def merge_results(plan, results, columns):
+
+    """ Concatenate the chunks returned by workers and apply ORDER BY / LIMIT if specified.
+
+    With GROUP BY / aggregates, the chunks hold partial aggregates, which are merged per group.
+    With ORDER BY, the chunks are already sorted and are combined by a parallel k-way merge,
+    or by an external merge when they are larger than the session's memory limit.
+    With LIMIT, each chunk holds at most n rows, so the final top-n merge is over
+    num_chunks * n rows instead of the whole table.
+
+    Args:
+        plan (LogicalPlan): logical plan containing column projections and ordering.
+        results (list[pandas.DataFrame]): filtered and projected chunks.
+        columns (list[str]): columns of the scanned table.
+
+    Returns:
+        pandas.DataFrame: final filtered, projected, and sorted DataFrame.
+    """
+
+    # second phase of the aggregation
+    if is_aggregate(plan):
+        return order_and_limit(plan, final_aggregate(plan, results))
+
     results = [r for r in results if not r.empty]
 
     # after filtering, can yield no rows, so return empty df
     if not results:
-        return pd.DataFrame(columns=df.columns)
+        table = plan.source_tables[0]
+        return pd.DataFrame(columns=[c.lower() for c in plan.col_proj[table] if c.lower() in columns])
     
-    # finally, apply order by if specified
+    # sorted chunks, merge them instead of sorting again (through spill files over the memory limit)
+    if plan.order_by and plan.limit is None:
+        by = [col.lower() for col in plan.order_by]
+        if over_budget(*results):
+            return external_merge(results, by, plan.order_dir != "DESC")
+        return kway_merge(results, by, plan.order_dir != "DESC", session.PARALLEL_LEVEL)
+
+    # finally, apply order by / limit if specified
     final_df = pd.concat(results)
-    if plan.order_by:
-        final_df = final_df.sort_values(by=plan.order_by, ascending=(plan.order_dir != "DESC"))
-    return final_df
-
-# Parallel support for multi-table scan
-def parallel_execute_multi_table(plan, df, num_workers):
-    # TO_DO
-    pass
\ No newline at end of file
+    return order_and_limit(plan, final_df)
+
+def merge_key_range(keys, positions):
+
+    """ Merge the slices of one key range taken from every sorted run.
+
+    Args:
+        keys (list[numpy.ndarray]): ascending keys of the range, one slice per run.
+        positions (list[numpy.ndarray]): row positions of those keys.
+
+    Returns:
+        numpy.ndarray: row positions in merged order.
+    """
+
+    # a stable timsort finds the sorted slices and merges them, without holding the GIL
+    order = np.argsort(np.concatenate(keys), kind="stable")
+    return np.concatenate(positions)[order]
+
+def merge_sorted_range(keys, positions, sort_keys):
+
+    """ Merge the slices of one key range taken from every sorted run, for any sort keys.
+
+    Args:
+        keys (pyarrow.Table): sort key columns of all runs.
+        positions (numpy.ndarray): row positions of the range, slice by slice in run order.
+        sort_keys (list[tuple]): (column, order) of every sort column.
+
+    Returns:
+        numpy.ndarray: row positions in merged order.
+    """
+
+    # Arrow's sort is stable and does not hold the GIL, ties stay in run order
+    order = pc.sort_indices(keys.take(positions), sort_keys=sort_keys).to_numpy()
+    return positions[order]
+
+def first_key_cuts(values, splitters, ascending):
+
+    """ Cut a run's sorted, non-null first sort key into the key ranges of the splitters.
+
+    Keys equal to a splitter start its range, in every run, so equal keys are merged by one worker.
+
+    Args:
+        values (pyarrow.ChunkedArray): first sort key of the run, sorted in the sort direction.
+        splitters (list): splitter keys in the sort direction.
+        ascending (bool): sort direction.
+
+    Returns:
+        list[int]: range boundaries, from 0 to len(values).
+    """
+
+    cuts = [0]
+    for splitter in splitters:
+        # binary search for the first key not before the splitter, reading only log(n) keys
+        lo, hi = cuts[-1], len(values)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            key = values[mid].as_py()
+            if key < splitter if ascending else key > splitter:
+                lo = mid + 1
+            else:
+                hi = mid
+        cuts.append(lo)
+    return cuts + [len(values)]
+
+def kway_merge(runs, by, ascending, num_workers):
+
+    """ Merge DataFrames sorted on the same columns into one sorted DataFrame.
+
+    For a single numeric sort column without nulls, splitter keys sampled from the runs
+    cut every run into num_workers key ranges. Each worker merges one key range across
+    all runs, and the merged ranges are concatenated, so the whole merge is parallel.
+    Rows are gathered with one take at the end. Other sort keys (several columns, strings,
+    nulls) are range-partitioned the same way on the first sort column, rows with a null first key
+    forming a last range, and each range is merged with a stable Arrow sort on all sort columns
+    (see merge_sorted_range). Categorical sort columns, ordered by their categories, fall back
+    to a stable sort of the concatenated runs.
+
+    Args:
+        runs (list[pandas.DataFrame]): runs sorted on the same columns.
+        by (list[str]): sort columns.
+        ascending (bool): sort direction.
+        num_workers (int): number of threads.
+
+    Returns:
+        pandas.DataFrame: merged DataFrame.
+    """
+
+    logging.debug(f"K-way merge of {len(runs)} sorted runs")
+    combined = pd.concat(runs)
+    if any(isinstance(combined[col].dtype, pd.CategoricalDtype) for col in by):
+        return combined.sort_values(by=by, ascending=ascending, kind="stable")
+    keys = combined[by[0]]
+    if len(by) > 1 or not pd.api.types.is_numeric_dtype(keys) or keys.isna().any():
+        return combined.iloc[range_merge(runs, combined, by, ascending, num_workers)]
+
+    # ascending keys and row positions of every run (descending runs are reversed)
+    keys = keys.to_numpy()
+    bounds = np.cumsum([0] + [len(run) for run in runs])
+    run_keys, run_pos = [], []
+    for i in range(len(runs)):
+        pos = np.arange(bounds[i], bounds[i + 1])
+        if not ascending:
+            pos = pos[::-1]
+        run_keys.append(keys[pos])
+        run_pos.append(pos)
+
+    # splitters at the quantiles of a sample of every run
+    sample = np.sort(np.concatenate([k[::max(len(k) // num_workers, 1)] for k in run_keys]))
+    splitters = sample[(np.arange(1, num_workers) * len(sample)) // num_workers]
+    cuts = [np.concatenate([[0], np.searchsorted(k, splitters, side="left"), [len(k)]]) for k in run_keys]
+
+    with ThreadPoolExecutor(max_workers=num_workers, thread_name_prefix="worker") as executor:
+        futures = [submit_task(executor, merge_key_range,
+                                   [k[c[p]:c[p + 1]] for k, c in zip(run_keys, cuts)],
+                                   [pos[c[p]:c[p + 1]] for pos, c in zip(run_pos, cuts)])
+                   for p in range(num_workers)]
+        order = np.concatenate([future.result() for future in futures])
+
+    if not ascending:
+        order = order[::-1]
+    return combined.iloc[order]
+
+def range_merge(runs, combined, by, ascending, num_workers):
+
+    """ Merged order of sorted runs for any sort keys, by range-partitioning on the first sort column.
+
+    In every run, the non-null values of the first sort column are sorted and its nulls come last.
+    Splitters sampled from the non-null values cut the runs into num_workers key ranges, the rows with
+    a null first key form one more range, and each range is merged by a worker (see merge_sorted_range).
+
+    Args:
+        runs (list[pandas.DataFrame]): runs sorted on the same columns.
+        combined (pandas.DataFrame): the runs concatenated.
+        by (list[str]): sort columns.
+        ascending (bool): sort direction.
+        num_workers (int): number of threads.
+
+    Returns:
+        numpy.ndarray: row positions of combined in merged order.
+    """
+
+    keys = pa.Table.from_pandas(combined[by], preserve_index=False)
+    sort_keys = [(col, "ascending" if ascending else "descending") for col in by]
+    # non-null first keys of every run (nulls are sorted last)
+    first = keys.column(0)
+    valid = first.is_valid().to_numpy(zero_copy_only=False)
+    bounds = np.cumsum([0] + [len(run) for run in runs])
+    run_valid = [int(valid[bounds[i]:bounds[i + 1]].sum()) for i in range(len(runs))]
+    run_values = [first.slice(bounds[i], run_valid[i]) for i in range(len(runs))]
+
+    # splitters at the quantiles of a sample of every run
+    sample = pa.chunked_array([v.take(np.arange(0, len(v), max(len(v) // num_workers, 1))).combine_chunks()
+                               for v in run_values], type=first.type).combine_chunks()
+    sample = sample.take(pc.array_sort_indices(sample, order=sort_keys[0][1])).to_pylist()
+    splitters = [sample[(p * len(sample)) // num_workers] for p in range(1, num_workers)] if sample else []
+    cuts = [first_key_cuts(v, splitters, ascending) for v in run_values]
+
+    ranges = [np.concatenate([np.arange(bounds[i] + c[p], bounds[i] + c[p + 1]) for i, c in enumerate(cuts)])
+              for p in range(len(splitters) + 1)]
+    ranges.append(np.concatenate([np.arange(bounds[i] + run_valid[i], bounds[i + 1]) for i in range(len(runs))]))
+    ranges = [positions for positions in ranges if len(positions)]
+
+    with ThreadPoolExecutor(max_workers=num_workers, thread_name_prefix="worker") as executor:
+        futures = [submit_task(executor, merge_sorted_range, keys, positions, sort_keys) for positions in ranges]
+        return np.concatenate([future.result() for future in futures])
+
+def get_process_pool(num_workers):
+
+    """ Get the shared process pool, recreating it when the number of workers changes.
+
+    Workers are spawned rather than forked, as forking a process that already
+    runs Arrow's thread pool is not safe.
+
+    Args:
+        num_workers (int): number of worker processes.
+
+    Returns:
+        concurrent.futures.ProcessPoolExecutor: process pool
+    """
+
+    global _process_pool, _process_pool_workers
+    with _process_pool_lock:
+        if _process_pool is None or _process_pool_workers != num_workers:
+            if _process_pool is not None:
+                _process_pool.shutdown()
+            _process_pool = ProcessPoolExecutor(max_workers=num_workers,
+                                                mp_context=multiprocessing.get_context("spawn"))
+            _process_pool_workers = num_workers
+        return _process_pool
+
+def scan_row_groups(file, schema, row_groups, columns, dictionary, plan):
+
+    """ Worker task of the process scan: read, filter, and project a set of row groups of one file.
+
+    Runs in a worker process, which opens the parquet file itself so that no table
+    data is pickled to it. Only the surviving rows are sent back.
+
+    Args:
+        file (TableFile): file of the table, with its footer from the table catalog.
+        schema (pyarrow.Schema): schema of the table.
+        row_groups (list[int]): row groups of the file assigned to this worker.
+        columns (list[str]): columns to read.
+        dictionary (list[str]): columns to read dictionary-encoded.
+        plan (LogicalPlan): logical plan containing filters and column projections.
+
+    Returns:
+        tuple:
+            - bytes: surviving rows serialized as an Arrow IPC stream.
+            - tuple: (process id, wall time, CPU time, rows read, rows sent back, bytes read) of the task
+    """
+
+    start = (time.perf_counter(), time.process_time())
+    stored, encoded = file_columns(file, columns, dictionary)
+    parquet_file = pq.ParquetFile(file.path, metadata=file.metadata, read_dictionary=encoded)
+    tbl = with_partition_columns(parquet_file.read_row_groups(row_groups, columns=stored),
+                                 file, schema, columns, dictionary)
+    df_chunk = tbl.to_pandas()
+    rows_read = len(df_chunk)
+    df_chunk.columns = df_chunk.columns.str.lower()
+    df_chunk = process_chunk(df_chunk, plan)
+
+    tbl = pa.Table.from_pandas(df_chunk, preserve_index=False)
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, tbl.schema) as writer:
+        writer.write_table(tbl)
+    stats = (os.getpid(), time.perf_counter() - start[0], time.process_time() - start[1],
+             rows_read, tbl.num_rows, column_chunk_bytes(file.metadata, row_groups, stored))
+    return sink.getvalue().to_pybytes(), stats
+
+# Parallel support for single table scan with worker processes
+def process_execute_single_table(plan, data_dir):
+
+    """ Execute a single-table query in parallel with worker processes.
+
+    Splits the table's (unpruned) row groups into tasks of contiguous row groups of one file,
+    so the files of a partitioned table are scanned in parallel too.
+    Each worker reads and decodes its own row groups, so filters on string columns
+    are not serialized by the GIL. Results come back as Arrow IPC buffers.
+    Apply ORDER BY if specified.
+
+    Args:
+        plan (LogicalPlan): logical plan containing filters, projections, and ordering.
+        data_dir (str): directory containing parquet table files.
+
+    Returns:
+        pandas.DataFrame: final filtered, projected, and sorted DataFrame.
+    """
+
+    table = plan.source_tables[0]
+    entry, columns, row_groups, dictionary = plan_scan(plan, table, data_dir)
+    logging.debug(f"Initiating process scan of {len(row_groups)} row groups")
+
+    # split row groups into contiguous tasks, at least one row group per task, never across files
+    num_workers = session.PARALLEL_LEVEL
+    target_tasks = num_workers * session.NUM_CHUNKS_PER_WORKER
+    rg_per_task = max(math.ceil(len(row_groups) / target_tasks), 1)
+    by_file = defaultdict(list)
+    for f, rg in row_groups:
+        by_file[f].append(rg)
+    tasks = [(f, rgs[i:i+rg_per_task]) for f, rgs in by_file.items() for i in range(0, len(rgs), rg_per_task)]
+    logging.debug(f"Row groups per worker task: {rg_per_task}")
+
+    executor = get_process_pool(num_workers)
+    futures = [executor.submit(scan_row_groups, entry.files[f], entry.schema, task, columns, dictionary, plan)
+               for f, task in tasks]
+
+    results = []
+    for future in futures:
+        buffer, (pid, wall, cpu, rows_in, rows_out, bytes_read) = future.result()
+        record_stage("worker task", wall, cpu, rows_in, rows_out, bytes_read, worker=f"process {pid}")
+        with pa.ipc.open_stream(buffer) as reader:
+            results.append(reader.read_all().to_pandas())
+
+    return merge_results(plan, results, [c.lower() for c in columns])
+
+def hash_partitions(keys, num_partitions, divisor=1):
+
+    """ Map join keys onto partitions by hash.
+
+    Args:
+        keys (pandas.Series): join key column.
+        num_partitions (int): number of partitions.
+        divisor (int): hash bits already used to partition the keys (product of the
+            partition counts of earlier passes), so a repartitioning pass uses other bits.
+
+    Returns:
+        numpy.ndarray: partition id of every row.
+    """
+
+    hashes = pd.util.hash_pandas_object(keys, index=False).to_numpy()
+    return ((hashes // np.uint64(divisor)) % np.uint64(num_partitions)).astype(np.int64)
+
+def common_key_type(left_keys, right_keys):
+
+    """ Bring numeric join keys of both sides to one type, since int and float keys hash differently. """
+
+    if pd.api.types.is_numeric_dtype(left_keys) and pd.api.types.is_numeric_dtype(right_keys) \
+            and left_keys.dtype != right_keys.dtype:
+        common = np.result_type(left_keys.dtype, right_keys.dtype)
+        return left_keys.astype(common), right_keys.astype(common)
+    return left_keys, right_keys
+
+def split_partitions(df, part_ids, num_partitions):
+
+    """ Split a DataFrame into one DataFrame per partition id.
+
+    Args:
+        df (pandas.DataFrame): rows to split.
+        part_ids (numpy.ndarray): partition id of every row.
+        num_partitions (int): number of partitions.
+
+    Returns:
+        list[pandas.DataFrame]: rows of each partition.
+    """
+
+    order = np.argsort(part_ids, kind="stable")
+    bounds = np.searchsorted(part_ids[order], np.arange(num_partitions + 1))
+    df = df.iloc[order]
+    return [df.iloc[bounds[p]:bounds[p + 1]] for p in range(num_partitions)]
+
+# Parallel support for multi-table joins
+def parallel_hash_join(left, right, left_on, right_on, suffixes):
+
+    """ Inner equi-join two DataFrames with a parallel partitioned hash join.
+
+    Both inputs are hash-partitioned on the join key, and each partition pair is
+    joined by a worker. The smaller input is the build side. Keys that occur far
+    more often than an average partition's share on the probe side are spread
+    over several partitions, and their build rows are copied to each of them,
+    so one hot key does not end up on a single worker.
+    Rows with a null join key never match, so they are dropped first.
+    Output columns are the same as pd.merge(left, right, ...).
+
+    Args:
+        left (pandas.DataFrame): left input.
+        right (pandas.DataFrame): right input.
+        left_on (str): join key column of the left input.
+        right_on (str): join key column of the right input.
+        suffixes (tuple[str, str]): suffixes of overlapping columns.
+
+    Returns:
+        pandas.DataFrame: joined rows.
+    """
+
+    left, right = drop_null_keys(left, right, left_on, right_on)
+    num_workers = session.PARALLEL_LEVEL
+    num_partitions = num_workers * session.NUM_CHUNKS_PER_WORKER
+
+    # int and float keys hash differently, so bring both sides to one type
+    left_keys, right_keys = common_key_type(left[left_on], right[right_on])
+
+    # smaller input is the build side
+    build_is_left = len(left) <= len(right)
+    build, probe = (left, right) if build_is_left else (right, left)
+    build_keys, probe_keys = (left_keys, right_keys) if build_is_left else (right_keys, left_keys)
+    logging.debug(f"Parallel hash join: build {len(build)} rows, probe {len(probe)} rows, "
+                  f"{num_partitions} partitions")
+
+    build_parts = hash_partitions(build_keys, num_partitions)
+    probe_parts = hash_partitions(probe_keys, num_partitions)
+
+    # spread skewed probe keys round robin over several partitions
+    avg_partition = max(math.ceil(len(probe) / num_partitions), 1)
+    counts = probe_keys.value_counts()
+    skewed = counts[counts > 2 * avg_partition]
+    if not skewed.empty:
+        logging.debug(f"Spreading {len(skewed)} skewed join keys over multiple partitions")
+        spread = pd.Series(np.minimum(np.ceil(skewed.to_numpy() / avg_partition), num_partitions).astype(np.int64),
+                           index=skewed.index)
+
+        is_skewed = probe_keys.isin(spread.index).to_numpy()
+        skewed_keys = probe_keys[is_skewed]
+        rank = skewed_keys.groupby(skewed_keys).cumcount().to_numpy()
+        fanout = skewed_keys.map(spread).to_numpy()
+        probe_parts[is_skewed] = (probe_parts[is_skewed] + rank % fanout) % num_partitions
+
+        # copy build rows of a skewed key to every partition its probe rows went to
+        build_skewed = build_keys.isin(spread.index).to_numpy()
+        build_fanout = build_keys[build_skewed].map(spread).to_numpy()
+        copies = np.repeat(np.flatnonzero(build_skewed), build_fanout)
+        offsets = np.concatenate([np.arange(n) for n in build_fanout]) if len(build_fanout) else np.array([], dtype=np.int64)
+        build = pd.concat([build.iloc[~build_skewed], build.iloc[copies]])
+        build_parts = np.concatenate([build_parts[~build_skewed],
+                                      (build_parts[copies] + offsets) % num_partitions])
+
+    build_split = split_partitions(build, build_parts, num_partitions)
+    probe_split = split_partitions(probe, probe_parts, num_partitions)
+
+    def join_partition(build_part, probe_part):
+        if build_is_left:
+            return pd.merge(build_part, probe_part, left_on=left_on, right_on=right_on, suffixes=suffixes)
+        return pd.merge(probe_part, build_part, left_on=left_on, right_on=right_on, suffixes=suffixes)
+
+    results = []
+    with ThreadPoolExecutor(max_workers=num_workers, thread_name_prefix="worker") as executor:
+        futures = [submit_task(executor, join_partition, b, p)
+                   for b, p in zip(build_split, probe_split) if not b.empty and not p.empty]
+        for future in futures:
+            results.append(future.result())
+
+    if not results:
+        return pd.merge(left.iloc[:0], right.iloc[:0], left_on=left_on, right_on=right_on, suffixes=suffixes)
+    return pd.concat(results, ignore_index=True)
+
+# Out-of-core support for multi-table joins
+MAX_GRACE_DEPTH = 3 # repartitioning passes of a partition still over the memory limit
+
+def grace_hash_join(left, right, left_on, right_on, suffixes, depth=0, divisor=1):
+
+    """ Inner equi-join two DataFrames larger than the memory budget with a grace hash join.
+
+    Both inputs are hash-partitioned on the join key into enough partitions for a partition
+    pair (and the hash table of its build side) to fit the session's memory limit. The partitions are
+    spilled as Arrow IPC files, then each partition pair is read back memory-mapped and
+    joined, and its result is spilled as well. A partition pair still over the limit is
+    partitioned again on other hash bits; a single hot key cannot be split and is joined as is.
+    Rows with a null join key never match, so they are dropped before partitioning.
+    Output columns are the same as pd.merge(left, right, ...).
+
+    Args:
+        left (pandas.DataFrame): left input.
+        right (pandas.DataFrame): right input.
+        left_on (str): join key column of the left input.
+        right_on (str): join key column of the right input.
+        suffixes (tuple[str, str]): suffixes of overlapping columns.
+        depth (int): repartitioning pass, 0 for the first one.
+        divisor (int): hash bits used by earlier passes (see hash_partitions).
+
+    Returns:
+        pandas.DataFrame: joined rows.
+    """
+
+    left, right = drop_null_keys(left, right, left_on, right_on)
+    if left.empty or right.empty or depth > MAX_GRACE_DEPTH or not over_budget(left, right):
+        return pd.merge(left, right, left_on=left_on, right_on=right_on, suffixes=suffixes)
+
+    # a partition pair and its hash table have to fit the budget
+    input_bytes = frame_bytes(left) + frame_bytes(right)
+    num_partitions = max(math.ceil(2 * input_bytes / memory_budget()), 2)
+    logging.debug(f"Grace hash join pass {depth}: {len(left)} x {len(right)} rows, {num_partitions} partitions")
+
+    left_keys, right_keys = common_key_type(left[left_on], right[right_on])
+    with SpillDirectory() as spill:
+        left_files = [spill.write(part) for part in
+                      split_partitions(left, hash_partitions(left_keys, num_partitions, divisor), num_partitions)]
+        right_files = [spill.write(part) for part in
+                       split_partitions(right, hash_partitions(right_keys, num_partitions, divisor), num_partitions)]
+
+        results = []
+        for left_file, right_file in zip(left_files, right_files):
+            left_part = spilled_frame([spill.read(left_file)])
+            right_part = spilled_frame([spill.read(right_file)])
+            if left_part.empty or right_part.empty:
+                continue
+            joined = grace_hash_join(left_part, right_part, left_on, right_on, suffixes,
+                                     depth + 1, divisor * num_partitions)
+            results.append(spill.read(spill.write(joined, index=False)))
+            del left_part, right_part, joined
+
+        if not results:
+            return pd.merge(left.iloc[:0], right.iloc[:0], left_on=left_on, right_on=right_on, suffixes=suffixes)
+        return spilled_frame(results)
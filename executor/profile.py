@@ -0,0 +1,206 @@
+# Query profiles of EXPLAIN ANALYZE
+# While a query runs under a profile (see QueryProfile.activate), every stage of the executor
+# (parquet read, filter, projection, join, sort, ...) records its wall time, CPU time of its thread,
+# rows in / out, and bytes read. Stages of the same name are summed, and the samples of each
+# worker thread are kept apart, so per-worker chunk timings can be compared.
+# The profile is held in a context variable, which worker threads inherit from the query's thread
+# (see executor_parallel.submit_task). Without a profile, stages cost one context variable lookup.
+import time
+import functools
+import threading
+import contextvars
+from collections import defaultdict
+
+_profile = contextvars.ContextVar("query_profile", default=None) # profile of the query run in this context
+
+class Stage:
+
+    """ One execution of a stage, recorded into the profile when the with block ends.
+
+    Set rows_out (and bytes, detail) inside the with block once they are known.
+    """
+
+    def __init__(self, profile, name, rows_in=None):
+        self.profile = profile
+        self.name = name
+        self.rows_in = rows_in
+        self.rows_out = None
+        self.bytes = 0
+        self.detail = None
+
+    def __enter__(self):
+        self.wall = time.perf_counter()
+        self.cpu = time.thread_time()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.wall = time.perf_counter() - self.wall
+        self.cpu = time.thread_time() - self.cpu
+        self.profile.record(self)
+        return False
+
+class NullStage:
+
+    """ Stage of a query that is not profiled, ignoring everything set on it. """
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+    def __setattr__(self, name, value):
+        pass
+
+NULL_STAGE = NullStage()
+
+class StageTotals:
+
+    """ Sums of all executions of a stage, overall and per thread """
+
+    def __init__(self):
+        self.calls = 0
+        self.wall = 0.0
+        self.cpu = 0.0
+        self.rows_in = 0
+        self.rows_out = 0
+        self.bytes = 0
+        self.details = []
+        self.threads = defaultdict(lambda: [0, 0.0, 0.0, 0]) # thread name -> [calls, wall, cpu, rows out]
+
+class QueryProfile:
+
+    """ Stages of one query, in the order they first ran """
+
+    def __init__(self):
+        self.stages = {} # stage name -> StageTotals
+        self.lock = threading.Lock() # worker threads record concurrently
+        self.wall = 0.0
+        self.cpu = 0.0
+
+    def record(self, stage, worker=None):
+        thread = worker or threading.current_thread().name
+        with self.lock:
+            totals = self.stages.setdefault(stage.name, StageTotals())
+            totals.calls += 1
+            totals.wall += stage.wall
+            totals.cpu += stage.cpu
+            totals.rows_in += stage.rows_in or 0
+            totals.rows_out += stage.rows_out or 0
+            totals.bytes += stage.bytes
+            if stage.detail and stage.detail not in totals.details:
+                totals.details.append(stage.detail)
+            per_thread = totals.threads[thread]
+            per_thread[0] += 1
+            per_thread[1] += stage.wall
+            per_thread[2] += stage.cpu
+            per_thread[3] += stage.rows_out or 0
+
+    def activate(self):
+
+        """ Profile what runs in the current context from now on (see deactivate).
+
+        Returns:
+            contextvars.Token: token restoring the previous profile
+        """
+
+        self.start = (time.perf_counter(), time.process_time())
+        return _profile.set(self)
+
+    def deactivate(self, token):
+        self.wall = time.perf_counter() - self.start[0]
+        self.cpu = time.process_time() - self.start[1]
+        _profile.reset(token)
+
+    def report(self) -> list:
+
+        """ Describe the recorded stages, one line per stage, followed by its per-worker timings.
+
+        Times of stages running on several workers are summed over the workers.
+
+        Returns:
+            list[str]: lines of the report
+        """
+
+        lines = [f"{'stage':<20} {'calls':>6} {'wall (ms)':>10} {'cpu (ms)':>10} {'rows in':>10} {'rows out':>10} {'bytes':>12}"]
+        for name, totals in self.stages.items():
+            line = f"{name:<20} {totals.calls:>6} {totals.wall * 1000:>10.1f} {totals.cpu * 1000:>10.1f} " \
+                   f"{totals.rows_in:>10} {totals.rows_out:>10} {totals.bytes:>12}"
+            if totals.details:
+                line += "  " + ", ".join(totals.details)
+            lines.append(line)
+            if len(totals.threads) > 1:
+                for thread, (calls, wall, cpu, rows_out) in sorted(totals.threads.items()):
+                    lines.append(f"  {thread:<18} {calls:>6} {wall * 1000:>10.1f} {cpu * 1000:>10.1f} {'':>10} {rows_out:>10}")
+        lines.append(f"Total: {self.wall * 1000:.1f} ms wall, {self.cpu * 1000:.1f} ms cpu (process)")
+        return lines
+
+def profile_stage(name, rows_in=None):
+
+    """ Start a stage of the profiled query in this context, to be used as a with block.
+
+    Args:
+        name (str): stage name, e.g. "filter"
+        rows_in (int): rows going into the stage, if known
+
+    Returns:
+        Stage: the stage, or NULL_STAGE when no query is profiled
+    """
+
+    profile = _profile.get()
+    if profile is None:
+        return NULL_STAGE
+    return Stage(profile, name, rows_in)
+
+def record_stage(name, wall, cpu, rows_in=None, rows_out=None, bytes=0, worker=None):
+
+    """ Record a stage measured elsewhere, e.g. by a worker process, into the profiled query in this context.
+
+    Args:
+        name (str): stage name
+        wall (float): wall time in seconds
+        cpu (float): CPU time in seconds
+        rows_in (int): rows going into the stage
+        rows_out (int): rows coming out of the stage
+        bytes (int): bytes read by the stage
+        worker (str): name of the worker that ran it, the current thread if None
+    """
+
+    profile = _profile.get()
+    if profile is None:
+        return
+    stage = Stage(profile, name, rows_in)
+    stage.wall, stage.cpu, stage.rows_out, stage.bytes = wall, cpu, rows_out, bytes
+    profile.record(stage, worker)
+
+def num_rows(data):
+    # Helper function to count the rows of a DataFrame / Arrow table, or of a list of them
+    if isinstance(data, (list, tuple)):
+        return sum(len(item) for item in data)
+    return len(data)
+
+def profiled(name, arg=0):
+
+    """ Decorator recording every call of an executor function as a stage (see profile_stage).
+
+    Rows in are the rows of the function's positional argument arg, rows out those of its result.
+
+    Args:
+        name (str): stage name
+        arg (int): position of the argument holding the input rows
+
+    Returns:
+        callable: decorator
+    """
+
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if _profile.get() is None:
+                return fn(*args, **kwargs)
+            with profile_stage(name, num_rows(args[arg])) as stage:
+                result = fn(*args, **kwargs)
+                stage.rows_out = num_rows(result)
+            return result
+        return wrapper
+    return decorator
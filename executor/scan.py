@@ -0,0 +1,646 @@
+# This file contains the table scan used by the EXECUTOR module.
+import copy
+import logging
+import contextvars
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from catalog import get_table
+from cache import buffer_pool
+from cache.intermediate_cache import lookup_intermediate, store_intermediate
+from executor.execute_helper import aggregate_columns, residual_columns
+from executor.executor_arrow import arrow_predicate_mask
+from executor.profile import profile_stage, profiled
+from planner.predicate import AND, is_leaf, predicate_leaves, compare_value, conjunction
+from session import session
+
+def required_columns(plan, table):
+
+    """ Collect the (lowercased) columns of a table referenced anywhere in the plan.
+
+    Args:
+        plan (LogicalPlan): validated logical plan
+        table (str): source table name
+
+    Returns:
+        set[str]: lowercased column names needed from the table
+    """
+
+    columns = set(c.lower() for c in plan.col_proj.get(table, []))
+
+    if plan.single_filters and table in plan.single_filters:
+        for node in plan.single_filters[table]:
+            for (col, op, value) in predicate_leaves(node):
+                columns.add(col.lower())
+
+    # columns of predicates across tables, filtered after the joins
+    columns.update(residual_columns(plan)[table])
+
+    if plan.join_filters:
+        for (t1, c1, op, t2, c2) in plan.join_filters:
+            if t1 == table:
+                columns.add(c1.lower())
+            if t2 == table:
+                columns.add(c2.lower())
+
+    # grouped and aggregated columns
+    columns.update(aggregate_columns(plan)[table])
+
+    # ORDER BY columns are either TABLE.COLUMN or unqualified
+    if plan.order_by:
+        for col in plan.order_by:
+            if '.' in col:
+                table_name, col_name = col.split('.', 1)
+                if table_name == table:
+                    columns.add(col_name.lower())
+            else:
+                columns.add(col.lower())
+    return columns
+
+def dictionary_columns(plan, table, columns, entry):
+
+    """ Select the string columns compared with string literals in a table's WHERE predicates.
+
+    Those columns are read dictionary-encoded, so case-insensitive equality is evaluated
+    once per distinct value instead of once per row. Columns with too many distinct values
+    for shared categories are read plain (see TableMetadata.column_dictionary).
+
+    Args:
+        plan (LogicalPlan): validated logical plan
+        table (str): source table name
+        columns (list[str]): columns to read, spelled as in the file schema
+        entry (TableMetadata): catalog entry of the table
+
+    Returns:
+        list[str]: columns to read dictionary-encoded, spelled as in the file schema
+    """
+
+    if not plan.single_filters or not plan.single_filters.get(table):
+        return []
+    compared = set()
+    for node in plan.single_filters[table]:
+        for (col, op, value) in predicate_leaves(node):
+            if isinstance(value, str):
+                compared.add(col.lower())
+    schema = entry.schema
+    return [name for name in columns if name.lower() in compared and name.lower() not in entry.plain_columns
+            and (pa.types.is_string(schema.field(name).type) or pa.types.is_large_string(schema.field(name).type))]
+
+def row_group_may_match(row_group, col_index, filters):
+
+    """ Check a row group's min/max statistics against conjunctive WHERE predicate trees.
+
+    Only numeric comparisons are checked: string equality is case-insensitive,
+    so the byte-ordered min/max of a string column cannot rule it out.
+    An AND rules the row group out if any child does, an OR only if all children do.
+
+    Args:
+        row_group (pyarrow.parquet.RowGroupMetaData): metadata of the row group
+        col_index (dict[str, int]): lowercased column name to column index in the row group
+        filters (list[tuple]): predicate trees on the table
+
+    Returns:
+        bool: False if no row in the row group can satisfy all predicates
+    """
+
+    return all(node_may_match(row_group, col_index, node) for node in filters)
+
+def node_may_match(row_group, col_index, node):
+
+    """ Check a row group's min/max statistics against one predicate tree (see row_group_may_match). """
+
+    if not is_leaf(node):
+        connective, children = node
+        matches = (node_may_match(row_group, col_index, child) for child in children)
+        return all(matches) if connective == AND else any(matches)
+
+    col, op, value = node
+    idx = col_index.get(col.lower())
+    if idx is None:
+        return True
+    stats = row_group.column(idx).statistics
+    if stats is None:
+        return True
+
+    # a column chunk with only nulls never satisfies a comparison
+    if stats.has_null_count and stats.null_count == row_group.num_rows:
+        return False
+
+    if isinstance(value, bool) or not isinstance(value, (int, float)) or not stats.has_min_max:
+        return True
+    if isinstance(stats.min, bool) or not isinstance(stats.min, (int, float)):
+        return True
+
+    lo, hi = stats.min, stats.max
+    if op == "=":
+        return lo <= value <= hi
+    elif op == ">":
+        return hi > value
+    elif op == ">=":
+        return hi >= value
+    elif op == "<":
+        return lo < value
+    elif op == "<=":
+        return lo <= value
+    return True
+
+def partition_may_match(partition, filters):
+
+    """ Check the partition values of a file against conjunctive WHERE predicate trees.
+
+    Comparisons on partition columns are decided exactly, every row of the file has the
+    value of its directory; comparisons on other columns may match.
+
+    Args:
+        partition (dict): lowercased partition column -> typed value of the file (None for NULL)
+        filters (list[tuple]): predicate trees on the table
+
+    Returns:
+        bool: False if no row of the file can satisfy all predicates
+    """
+
+    return all(partition_node_may_match(partition, node) for node in filters)
+
+def partition_node_may_match(partition, node):
+
+    """ Check the partition values of a file against one predicate tree (see partition_may_match). """
+
+    if not is_leaf(node):
+        connective, children = node
+        matches = (partition_node_may_match(partition, child) for child in children)
+        return all(matches) if connective == AND else any(matches)
+
+    col, op, value = node
+    if col.lower() not in partition:
+        return True
+    return compare_value(partition[col.lower()], op, value)
+
+def prune_row_groups(plan, table, entry):
+
+    """ Select the row groups of a table that may contain rows matching the WHERE clause.
+
+    Files of a partitioned table whose partition values rule out the predicates are
+    skipped as a whole, before their row group statistics are looked at.
+
+    Args:
+        plan (LogicalPlan): validated logical plan
+        table (str): source table name
+        entry (TableMetadata): catalog entry of the table
+
+    Returns:
+        list[tuple]: (file index, row group) of the row groups to read
+    """
+
+    filters = plan.single_filters.get(table) if plan.single_filters else None
+    row_groups, files = [], 0
+    for f, file in enumerate(entry.files):
+        if filters and file.partition and not partition_may_match(file.partition, filters):
+            continue
+        files += 1
+        for rg in range(file.metadata.num_row_groups):
+            if not filters or row_group_may_match(file.metadata.row_group(rg), file.col_index, filters):
+                row_groups.append((f, rg))
+
+    if filters:
+        logging.debug(f"Pruning on {table}: reading {len(row_groups)} of {entry.num_row_groups} row groups "
+                      f"in {files} of {len(entry.files)} files")
+    return row_groups
+
+def plan_scan(plan, table, data_dir):
+
+    """ Decide which columns and row groups of a table's parquet files to read.
+
+    Args:
+        plan (LogicalPlan): validated logical plan
+        table (str): source table name
+        data_dir (str): directory containing parquet table files.
+
+    Returns:
+        tuple:
+            - TableMetadata: catalog entry of the table
+            - list[str]: columns to read, spelled as in the table schema
+            - list[tuple]: (file index, row group) of the row groups that may contain matching rows
+            - list[str]: columns to read dictionary-encoded (see dictionary_columns)
+    """
+
+    entry = get_table(data_dir, table)
+    needed = required_columns(plan, table)
+
+    # map onto the schema's own spelling, keeping file column order
+    names = entry.schema.names
+    columns = [name for name in names if name.lower() in needed]
+
+    if logging.getLogger().isEnabledFor(logging.DEBUG):
+        skipped_bytes = 0
+        for file in entry.files:
+            for rg in range(file.metadata.num_row_groups):
+                row_group = file.metadata.row_group(rg)
+                for i in range(row_group.num_columns):
+                    column = row_group.column(i)
+                    if column.path_in_schema.split('.')[0] not in columns:
+                        skipped_bytes += column.total_uncompressed_size
+        logging.debug(f"Projection pushdown on {table}: reading {len(columns)} of {len(names)} columns "
+                      f"{columns}, skipping {skipped_bytes} bytes")
+
+    # skip partitions and row groups whose values or statistics rule out the WHERE predicates
+    row_groups = prune_row_groups(plan, table, entry)
+    return entry, columns, row_groups, dictionary_columns(plan, table, columns, entry)
+
+def column_chunk_bytes(metadata, row_groups, columns):
+
+    """ Compressed bytes of the column chunks of some columns and row groups, as stored in the file.
+
+    Args:
+        metadata (pyarrow.parquet.FileMetaData): footer of the parquet file
+        row_groups (list[int]): row groups
+        columns (list[str]): columns, spelled as in the file schema
+
+    Returns:
+        int: bytes read from the file to decode these column chunks
+    """
+
+    total = 0
+    for rg in row_groups:
+        row_group = metadata.row_group(rg)
+        for i in range(row_group.num_columns):
+            column = row_group.column(i)
+            if column.path_in_schema.split('.')[0] in columns:
+                total += column.total_compressed_size
+    return total
+
+def with_partition_columns(tbl, file, schema, columns, dictionary):
+
+    """ Add the partition columns of a table to rows read from one of its files.
+
+    The files do not store them: every row takes the value of the file's directory.
+
+    Args:
+        tbl (pyarrow.Table): rows read from the file
+        file (TableFile): the file
+        schema (pyarrow.Schema): schema of the table
+        columns (list[str]): columns read, spelled as in the table schema
+        dictionary (list[str]): columns read dictionary-encoded
+
+    Returns:
+        pyarrow.Table: rows with the partition columns among columns, in the order of columns
+    """
+
+    partition = [name for name in columns if name.lower() in file.partition]
+    if not partition:
+        return tbl
+    for name in partition:
+        field, value = schema.field(name), file.partition[name.lower()]
+        if name in dictionary:
+            indices = pa.nulls(tbl.num_rows, pa.int32()) if value is None \
+                else pa.array(np.zeros(tbl.num_rows, dtype=np.int32))
+            values = pa.array([] if value is None else [value], type=field.type)
+            tbl = tbl.append_column(name, pa.DictionaryArray.from_arrays(indices, values))
+        else:
+            tbl = tbl.append_column(field, pa.repeat(pa.scalar(value, type=field.type), tbl.num_rows))
+    return tbl.select(columns)
+
+def file_columns(file, columns, dictionary):
+    # Helper function to split the columns of a scan into those stored in a file, and those read dictionary-encoded
+    stored = [name for name in columns if name.lower() not in file.partition]
+    return stored, [name for name in dictionary if name in stored]
+
+def read_file(entry, f, row_groups, columns, dictionary):
+
+    """ Read row groups of one file of a table (through the buffer pool, if enabled).
+
+    Args:
+        entry (TableMetadata): catalog entry of the table
+        f (int): index of the file in entry.files
+        row_groups (list[int]): row groups of the file to read
+        columns (list[str]): columns to read, spelled as in the table schema
+        dictionary (list[str]): columns to read dictionary-encoded
+
+    Returns:
+        pyarrow.Table: rows of the row groups restricted to the columns, partition columns included
+    """
+
+    file = entry.files[f]
+    stored, encoded = file_columns(file, columns, dictionary)
+
+    # reuse the catalog's footer instead of parsing it again
+    parquet_file = pq.ParquetFile(file.path, metadata=file.metadata, read_dictionary=encoded)
+    if session.BUFFER_POOL_SIZE <= 0:
+        with profile_stage("parquet read") as stage:
+            tbl = parquet_file.read_row_groups(row_groups, columns=stored)
+            stage.rows_out, stage.bytes = tbl.num_rows, column_chunk_bytes(file.metadata, row_groups, stored)
+    else:
+        tbl = read_through_pool(parquet_file, entry, file, row_groups, stored, encoded)
+    return with_partition_columns(tbl, file, entry.schema, columns, dictionary)
+
+def read_table(plan, table, data_dir):
+
+    """ Read a table from its parquet files, only decoding the columns and row groups the plan needs.
+
+    With session.PARALLEL_LEVEL > 1, the files of a partitioned table left after pruning are read in parallel.
+
+    Args:
+        plan (LogicalPlan): validated logical plan
+        table (str): source table name
+        data_dir (str): directory containing parquet table files.
+
+    Returns:
+        pyarrow.Table: table data restricted to the required columns and row groups.
+    """
+
+    entry, columns, row_groups, dictionary = plan_scan(plan, table, data_dir)
+
+    by_file = defaultdict(list) # file index -> row groups, in file order
+    for f, rg in row_groups:
+        by_file[f].append(rg)
+    if not by_file:
+        return read_file(entry, 0, [], columns, dictionary)
+    if len(by_file) == 1 or session.PARALLEL_LEVEL <= 1:
+        return pa.concat_tables([read_file(entry, f, rgs, columns, dictionary) for f, rgs in by_file.items()])
+
+    # reading and decoding release the GIL; tasks run in the query's context (session, profile)
+    logging.debug(f"Reading {len(by_file)} files of {table} with {session.PARALLEL_LEVEL} threads")
+    with ThreadPoolExecutor(max_workers=session.PARALLEL_LEVEL, thread_name_prefix="reader") as executor:
+        futures = [executor.submit(contextvars.copy_context().run, read_file, entry, f, rgs, columns, dictionary)
+                   for f, rgs in by_file.items()]
+        return pa.concat_tables([future.result() for future in futures])
+
+def read_through_pool(parquet_file, entry, file, row_groups, columns, dictionary):
+
+    """ Read row groups of a file through the buffer pool, decoding only the column chunks it misses.
+
+    Args:
+        parquet_file (pyarrow.parquet.ParquetFile): open parquet file
+        entry (TableMetadata): catalog entry of the table
+        file (TableFile): the file
+        row_groups (list[int]): row groups of the file to read
+        columns (list[str]): columns to read, all stored in the file
+        dictionary (list[str]): columns read dictionary-encoded
+
+    Returns:
+        pyarrow.Table: table data restricted to the columns and row groups.
+    """
+
+    if not columns:
+        # only partition columns are scanned, the row counts come from the footer
+        return parquet_file.read_row_groups(row_groups, columns=[])
+
+    chunks = {col: [] for col in columns}
+    decoded = 0
+    for rg in row_groups:
+        # dictionary-encoded chunks are cached apart from the plain ones
+        keys = {col: (file.path, col, rg, file.version, col in dictionary) for col in columns}
+        cached = {col: buffer_pool.get_chunk(key) for col, key in keys.items()}
+        missing = [col for col in columns if cached[col] is None]
+
+        if missing:
+            with profile_stage("parquet read") as stage:
+                tbl = parquet_file.read_row_group(rg, columns=missing)
+                stage.rows_out, stage.bytes = tbl.num_rows, column_chunk_bytes(file.metadata, [rg], missing)
+            for col in missing:
+                cached[col] = tbl[col]
+                buffer_pool.put_chunk(keys[col], tbl[col])
+            decoded += len(missing)
+
+        for col in columns:
+            chunks[col].extend(cached[col].chunks)
+
+    logging.debug(f"Buffer pool: decoded {decoded} of {len(row_groups) * len(columns)} column chunks "
+                  f"from {entry.name}, stats {buffer_pool.pool_stats()}")
+
+    # the file's arrow schema has the dictionary-encoded types of the columns read that way
+    read_schema = parquet_file.schema_arrow
+    schema = pa.schema([read_schema.field(col) for col in columns], metadata=entry.schema.metadata)
+    arrays = [pa.chunked_array(chunks[col], type=schema.field(col).type) for col in columns]
+    return pa.Table.from_arrays(arrays, schema=schema)
+
+def iter_row_groups(plan, table, data_dir):
+
+    """ Read a table one row group at a time, only decoding the columns and row groups the plan needs.
+
+    Args:
+        plan (LogicalPlan): validated logical plan
+        table (str): source table name
+        data_dir (str): directory containing parquet table files.
+
+    Yields:
+        pyarrow.Table: data of one row group restricted to the required columns.
+    """
+
+    entry, columns, row_groups, dictionary = plan_scan(plan, table, data_dir)
+    yield from read_row_groups(entry, columns, row_groups, dictionary)
+
+def read_row_groups(entry, columns, row_groups, dictionary):
+
+    """ Read row groups of a table one at a time (through the buffer pool, if enabled).
+
+    Args:
+        entry (TableMetadata): catalog entry of the table
+        columns (list[str]): columns to read, spelled as in the table schema
+        row_groups (list[tuple]): (file index, row group) of the row groups to read
+        dictionary (list[str]): columns to read dictionary-encoded
+
+    Yields:
+        pyarrow.Table: data of one row group restricted to the columns.
+    """
+
+    opened = {} # file index -> open parquet file, files are only opened once they are read
+    for f, rg in row_groups:
+        file = entry.files[f]
+        stored, encoded = file_columns(file, columns, dictionary)
+        if f not in opened:
+            opened[f] = pq.ParquetFile(file.path, metadata=file.metadata, read_dictionary=encoded)
+        if session.BUFFER_POOL_SIZE <= 0:
+            with profile_stage("parquet read") as stage:
+                tbl = opened[f].read_row_group(rg, columns=stored)
+                stage.rows_out, stage.bytes = tbl.num_rows, column_chunk_bytes(file.metadata, [rg], stored)
+        else:
+            tbl = read_through_pool(opened[f], entry, file, [rg], stored, encoded)
+        yield with_partition_columns(tbl, file, entry.schema, columns, dictionary)
+
+def plan_shared_scan(plans, table, data_dir):
+
+    """ Decide which columns and row groups of a table to read once for several plans.
+
+    The scan reads the union of the columns and row groups each plan needs (see plan_scan).
+
+    Args:
+        plans (list[LogicalPlan]): validated logical plans reading the table
+        table (str): source table name
+        data_dir (str): directory containing parquet table files.
+
+    Returns:
+        tuple:
+            - TableMetadata: catalog entry of the table
+            - list[str]: columns to read, spelled as in the table schema
+            - list[tuple]: (file index, row group) of the row groups to read
+            - list[str]: columns to read dictionary-encoded
+            - list[set[tuple]]: row groups each plan needs, in the order of plans
+    """
+
+    scans = [plan_scan(plan, table, data_dir) for plan in plans]
+    entry = scans[0][0]
+    columns = [name for name in entry.schema.names if any(name in scan[1] for scan in scans)]
+    row_groups = sorted(set().union(*[scan[2] for scan in scans]))
+    dictionary = [name for name in columns if any(name in scan[3] for scan in scans)]
+    logging.debug(f"Shared scan of {table} for {len(plans)} queries: {len(columns)} columns, "
+                  f"{len(row_groups)} of {entry.num_row_groups} row groups")
+    return entry, columns, row_groups, dictionary, [set(scan[2]) for scan in scans]
+
+def unfiltered_plan(plan, tables):
+
+    """ Copy a plan without the WHERE predicates of some tables, for scans that are already filtered (see read_filtered).
+
+    Args:
+        plan (LogicalPlan): validated logical plan
+        tables (list[str]): tables whose predicates are dropped
+
+    Returns:
+        LogicalPlan: shallow copy of the plan
+    """
+
+    plan = copy.copy(plan)
+    plan.single_filters = defaultdict(list, {table: nodes for table, nodes in (plan.single_filters or {}).items()
+                                             if table not in tables})
+    return plan
+
+@profiled("filter")
+def filter_rows(tbl, filters):
+
+    """ Filter scanned rows on predicate trees (see executor_arrow.arrow_predicate_mask).
+
+    Args:
+        tbl (pyarrow.Table): scanned rows, columns spelled as in the table schema
+        filters (list[tuple]): predicate trees on the table
+
+    Returns:
+        pyarrow.Table: rows satisfying all predicates
+    """
+
+    if not filters:
+        return tbl
+    names = {name.lower(): name for name in tbl.column_names}
+    return tbl.filter(arrow_predicate_mask(conjunction(filters), lambda col: tbl[names[col.lower()]]))
+
+def cached_filtered(plan, table, data_dir):
+
+    """ Look up the rows of a table satisfying its WHERE predicates in the intermediate result cache.
+
+    Cached rows of weaker predicates (see intermediate_cache.lookup_intermediate) are filtered again
+    on the predicates they do not imply.
+
+    Args:
+        plan (LogicalPlan): validated logical plan
+        table (str): source table name
+        data_dir (str): directory containing parquet table files.
+
+    Returns:
+        pyarrow.Table: matching rows, restricted to the columns the plan reads besides its predicates on the table
+        or None, if no cached rows contain them
+    """
+
+    filters = plan.single_filters.get(table) if plan.single_filters else None
+    if not filters or session.INTERMEDIATE_CACHE_SIZE <= 0:
+        return None
+    entry = get_table(data_dir, table)
+    columns = required_columns(unfiltered_plan(plan, [table]), table)
+    with profile_stage("intermediate cache") as stage:
+        found = lookup_intermediate(data_dir, table, entry.version, filters, columns)
+        stage.detail = f"{table}: {'miss' if found is None else 'hit'}"
+        stage.rows_out = 0 if found is None else found[0].num_rows
+    if found is None:
+        return None
+    tbl, remaining = found
+    tbl = filter_rows(tbl, remaining)
+    return tbl.select([name for name in tbl.column_names if name.lower() in columns])
+
+def read_filtered(plan, table, data_dir):
+
+    """ Read the rows of a table satisfying its WHERE predicates, through the intermediate result cache.
+
+    Rows are answered from the cache if possible (see cached_filtered); otherwise the table is read
+    (see read_table), filtered, and cached with the columns of its predicates, so later queries
+    with stronger predicates can filter them again. The plan's predicates on the table are then
+    already applied (see unfiltered_plan).
+
+    Args:
+        plan (LogicalPlan): validated logical plan
+        table (str): source table name
+        data_dir (str): directory containing parquet table files.
+
+    Returns:
+        pyarrow.Table: matching rows, restricted to the columns the plan reads besides its predicates on the table
+    """
+
+    filters = plan.single_filters.get(table) if plan.single_filters else None
+    if not filters:
+        return read_table(plan, table, data_dir)
+    tbl = cached_filtered(plan, table, data_dir)
+    if tbl is not None:
+        return tbl
+
+    version = get_table(data_dir, table).version
+    tbl = filter_rows(read_table(plan, table, data_dir), filters)
+    if session.INTERMEDIATE_CACHE_SIZE > 0:
+        store_intermediate(data_dir, table, version, filters, tbl)
+    columns = required_columns(unfiltered_plan(plan, [table]), table)
+    return tbl.select([name for name in tbl.column_names if name.lower() in columns])
+
+def scan_table(plan, table, data_dir, filtered=False):
+
+    """ Read a table as a pandas DataFrame (see read_table).
+
+    Args:
+        plan (LogicalPlan): validated logical plan
+        table (str): source table name
+        data_dir (str): directory containing parquet table files.
+        filtered (bool): apply the table's WHERE predicates through the intermediate result cache (see read_filtered)
+
+    Returns:
+        pandas.DataFrame: table data restricted to the required columns and row groups.
+    """
+
+    tbl = read_filtered(plan, table, data_dir) if filtered else read_table(plan, table, data_dir)
+    return dictionary_to_pandas(tbl, get_table(data_dir, table))
+
+@profiled("to pandas")
+def dictionary_to_pandas(tbl, entry):
+
+    """ Convert a scanned table to pandas, dictionary-encoded columns becoming categoricals.
+
+    Each row group has its own dictionary, so the codes are remapped onto the catalog's
+    dictionary of the column, built from the dictionaries of the row groups read (see
+    TableMetadata.column_dictionary). Scans of a column version then share the same categories.
+    Columns with too many distinct values for the catalog's dictionary are decoded instead.
+
+    Args:
+        tbl (pyarrow.Table): scanned table data
+        entry (TableMetadata): catalog entry of the table
+
+    Returns:
+        pandas.DataFrame: table data
+    """
+
+    encoded = [field.name for field in tbl.schema if pa.types.is_dictionary(field.type)]
+    if not encoded:
+        return tbl.to_pandas()
+
+    df = tbl.drop_columns(encoded).to_pandas()
+    for name in encoded:
+        column = tbl[name]
+        dtype = entry.column_dictionary(name, pa.chunked_array([chunk.dictionary for chunk in column.chunks],
+                                                               type=column.type.value_type))
+        if dtype is None:
+            df[name] = column.cast(column.type.value_type).to_pandas()
+            continue
+        value_set = pa.array(dtype.categories)
+        codes = [np.empty(0, dtype=np.int32)]
+        for chunk in column.chunks:
+            # position of each chunk dictionary value in the catalog's dictionary, nulls become -1
+            remap = pc.index_in(chunk.dictionary, value_set=value_set)
+            codes.append(pc.fill_null(pc.take(remap, chunk.indices), -1).to_numpy())
+        df[name] = pd.Categorical.from_codes(np.concatenate(codes), dtype=dtype)
+    return df[tbl.column_names]
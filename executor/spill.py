@@ -0,0 +1,303 @@
+# This file contains the out-of-core support of the EXECUTOR module.
+# With a session MEMORY_LIMIT, sorts and joins whose inputs are larger than the budget work on
+# pieces that fit it, and spill the pieces to Arrow IPC files in a temporary directory.
+# Spilled data is read back memory-mapped, so it is backed by the page cache instead of the heap
+# and the OS can evict it under memory pressure.
+import os
+import heapq
+import shutil
+import logging
+import tempfile
+import functools
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+from session import session
+
+def memory_budget() -> int:
+
+    """ Memory budget of a sort or join in bytes, from session.MEMORY_LIMIT (MB), 0 if unlimited """
+
+    return session.MEMORY_LIMIT * 1024 * 1024
+
+def frame_bytes(df) -> int:
+
+    """ Bytes of a DataFrame in memory, including the values of string columns """
+
+    return int(df.memory_usage(index=False, deep=True).sum())
+
+def over_budget(*dfs) -> bool:
+
+    """ True if a memory limit is set and the DataFrames together go over it """
+
+    budget = memory_budget()
+    return budget > 0 and sum(frame_bytes(df) for df in dfs) > budget
+
+class SpillDirectory:
+
+    """ Temporary directory holding the spill files of one operator, removed when closed.
+
+    Files are Arrow IPC files, read back memory-mapped. Memory-mapped files stay readable
+    after the directory is removed, so results built from them outlive the operator.
+    """
+
+    def __init__(self):
+        self.path = tempfile.mkdtemp(prefix="spill-")
+        self.files = 0 # number of files written
+        self.bytes = 0 # bytes written
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def write(self, df, index=True) -> str:
+
+        """ Spill a DataFrame to a new Arrow IPC file.
+
+        Args:
+            df (pandas.DataFrame): rows to spill
+            index (bool): whether to keep the index of the rows
+        Returns:
+            str: path of the spill file
+        """
+
+        tbl = pa.Table.from_pandas(df, preserve_index=index)
+        return self.write_batches(tbl.schema, [tbl])
+
+    def write_batches(self, schema, batches) -> str:
+
+        """ Spill Arrow tables to a new Arrow IPC file as they are produced, so only one is in memory at a time.
+
+        Args:
+            schema (pyarrow.Schema): schema of the tables
+            batches (iterable[pyarrow.Table]): rows to spill
+        Returns:
+            str: path of the spill file
+        """
+
+        path = os.path.join(self.path, f"{self.files}.arrow")
+        with pa.OSFile(path, "wb") as sink:
+            with pa.ipc.new_file(sink, schema) as writer:
+                for batch in batches:
+                    writer.write_table(batch)
+            self.bytes += sink.tell()
+        self.files += 1
+        return path
+
+    def read(self, path):
+
+        """ Memory-map a spill file.
+
+        Args:
+            path (str): path of the spill file
+        Returns:
+            pyarrow.Table: spilled rows, backed by the file
+        """
+
+        with pa.ipc.open_file(pa.memory_map(path)) as reader:
+            return reader.read_all()
+
+    def close(self):
+        logging.debug(f"Spilled {self.files} files, {self.bytes} bytes to {self.path}")
+        shutil.rmtree(self.path, ignore_errors=True)
+
+def spilled_frame(tables):
+
+    """ Combine spilled Arrow tables into one DataFrame, keeping column data on the mapped files where possible. """
+
+    return pa.concat_tables(tables).to_pandas(split_blocks=True)
+
+def compare_keys(a, b, ascending):
+    # Helper function to compare the sort keys of two rows in ORDER BY order, nulls last in both directions
+    for x, y in zip(a, b):
+        if x is None or y is None:
+            if x is None and y is None:
+                continue
+            return 1 if x is None else -1
+        if x != y:
+            return (-1 if x < y else 1) if ascending else (1 if x < y else -1)
+    return 0
+
+def merge_batches(tables, by, ascending, batch_rows):
+
+    """ Streaming k-way merge of sorted, spilled runs, yielding the merged rows in bounded batches.
+
+    Every run has a cursor on a window of its next batch_rows rows, and a heap orders the cursors
+    on the keys of their windows' last rows. Rows before the smallest of these keys (the bound)
+    are all in the windows: each step takes them from every run (found by binary search, since
+    the runs are sorted) and sorts only them. The rows equal to the bound follow, run by run, so
+    ties stay in run order without being sorted. The runs are read through their memory maps.
+
+    Args:
+        tables (list[pyarrow.Table]): memory-mapped runs, each sorted on the keys
+        by (list[str]): sort key columns
+        ascending (bool): sort direction
+        batch_rows (int): rows of a run window
+
+    Yields:
+        pyarrow.Table: the next rows in sorted order, ties kept in run order
+    """
+
+    order = functools.cmp_to_key(lambda a, b: compare_keys(a, b, ascending))
+    sort_keys = [(col, "ascending" if ascending else "descending") for col in by]
+    key_at = lambda run, row: order(tuple(tables[run].column(col)[row].as_py() for col in by))
+    positions = [0] * len(tables) # next row of every run
+    heap = [] # (key of the window's last row, run, window end) of every run with rows left
+
+    def open_window(run):
+        end = min(positions[run] + batch_rows, tables[run].num_rows)
+        heapq.heappush(heap, (key_at(run, end - 1), run, end))
+
+    def first_after(run, hi, before):
+        # first row of a run from its position on (up to hi) that does not come before the bound
+        lo = positions[run]
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if before(key_at(run, mid)):
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    for run, tbl in enumerate(tables):
+        if tbl.num_rows:
+            open_window(run)
+
+    while heap:
+        bound = heap[0][0]
+        cursors = sorted((run, end, not bound < key) for (key, run, end) in heap)
+        pieces = []
+        for run, end, _ in cursors:
+            row = first_after(run, end, lambda key: key < bound)
+            if row > positions[run]:
+                pieces.append(tables[run].slice(positions[run], row - positions[run]))
+                positions[run] = row
+        if pieces:
+            batch = pa.concat_tables(pieces)
+            yield batch.take(pc.sort_indices(batch, sort_keys=sort_keys))
+        # rows equal to the bound, past the window of a run whose window ends on the bound
+        for run, end, on_bound in cursors:
+            row = first_after(run, tables[run].num_rows if on_bound else end, lambda key: not bound < key)
+            for start in range(positions[run], row, batch_rows):
+                yield tables[run].slice(start, min(batch_rows, row - start))
+            positions[run] = row
+        while heap and not bound < heap[0][0]:
+            run = heapq.heappop(heap)[1]
+            if positions[run] < tables[run].num_rows:
+                open_window(run)
+
+def merge_spilled_runs(spill, tables, by, ascending):
+
+    """ Merge sorted, spilled runs into a spill file (see merge_batches).
+
+    Batches hold about the memory budget, and each is written to the output file once merged,
+    so the merged rows are only read into the heap when the result is converted to pandas.
+
+    Args:
+        spill (SpillDirectory): spill directory of the operator
+        tables (list[pyarrow.Table]): memory-mapped runs, each sorted on the keys
+        by (list[str]): sort key columns
+        ascending (bool): sort direction
+
+    Returns:
+        pandas.DataFrame: rows of all runs in sorted order, ties kept in run order
+    """
+
+    rows = sum(tbl.num_rows for tbl in tables)
+    row_bytes = max(sum(tbl.nbytes for tbl in tables) / max(rows, 1), 1)
+    # a batch is taken from all runs and sorted, so it is held twice
+    batch_rows = max(int(memory_budget() / (2 * row_bytes * len(tables))), 1)
+    logging.debug(f"External merge of {len(tables)} runs, {rows} rows in windows of {batch_rows} rows")
+    path = spill.write_batches(tables[0].schema, merge_batches(tables, by, ascending, batch_rows))
+    return spilled_frame([spill.read(path)])
+
+def external_merge(runs, by, ascending):
+
+    """ Merge sorted runs larger than the memory budget: every run is spilled, then merged (see merge_spilled_runs).
+
+    Args:
+        runs (list[pandas.DataFrame]): runs, each sorted on the keys
+        by (list[str]): sort key columns
+        ascending (bool): sort direction
+
+    Returns:
+        pandas.DataFrame: rows of all runs in sorted order
+    """
+
+    runs = [run for run in runs if not run.empty]
+    with SpillDirectory() as spill:
+        tables = [spill.read(spill.write(run)) for run in runs]
+        del runs
+        return merge_spilled_runs(spill, tables, by, ascending)
+
+def sorted_run(df, by, ascending):
+    # Helper function to sort rows of a run with Arrow (a stable sort), categorical keys sorting on their values
+    keys = {col: df[col].astype(df[col].cat.categories.dtype) for col in by
+            if isinstance(df[col].dtype, pd.CategoricalDtype)}
+    tbl = pa.Table.from_pandas(df.assign(**keys) if keys else df, preserve_index=True)
+    return tbl.take(pc.sort_indices(tbl, sort_keys=[(col, "ascending" if ascending else "descending") for col in by]))
+
+def external_sort(df, by, ascending):
+
+    """ Sort a DataFrame larger than the memory budget with an external merge sort.
+
+    The rows are cut into runs that can be sorted within the budget (a run and its
+    sorted copy), each run is sorted and spilled, and the runs are merged (see merge_spilled_runs).
+    The sort consumes its input: once every run is spilled, the columns of df are dropped,
+    so its memory is released during the merge unless the caller holds other references to it.
+
+    Args:
+        df (pandas.DataFrame): rows to sort, not to be used by the caller afterwards
+        by (list[str]): sort key columns
+        ascending (bool): sort direction
+
+    Returns:
+        pandas.DataFrame: sorted rows, the same as df.sort_values(by, ascending, kind="stable")
+    """
+
+    if df.empty:
+        return df
+    run_rows = max(int(len(df) * memory_budget() / (2 * max(frame_bytes(df), 1))), 1)
+    logging.debug(f"External sort of {len(df)} rows in runs of {run_rows} rows")
+    with SpillDirectory() as spill:
+        tables = []
+        for start in range(0, len(df), run_rows):
+            run = sorted_run(df.iloc[start:start + run_rows], by, ascending)
+            tables.append(spill.read(spill.write_batches(run.schema, [run])))
+            del run
+        df.drop(columns=list(df.columns), inplace=True)
+        return merge_spilled_runs(spill, tables, by, ascending)
+
+def cross_join(left, right):
+
+    """ Cartesian product of two DataFrames, spilled when it is larger than the memory budget.
+
+    Over the budget, the left rows are taken in blocks whose product with the right input
+    fits the budget, and the product of every block is spilled, so the (possibly huge)
+    result is built on memory-mapped files instead of the heap.
+
+    Args:
+        left (pandas.DataFrame): left input
+        right (pandas.DataFrame): right input
+
+    Returns:
+        pandas.DataFrame: the same rows as left.merge(right, how="cross")
+    """
+
+    budget = memory_budget()
+    if left.empty or right.empty or budget <= 0:
+        return left.merge(right, how="cross")
+    row_bytes = frame_bytes(left) / len(left) + frame_bytes(right) / len(right)
+    if row_bytes * len(left) * len(right) <= budget:
+        return left.merge(right, how="cross")
+    block_rows = max(int(budget / (row_bytes * len(right))), 1)
+    logging.debug(f"Spilling cross join of {len(left)} x {len(right)} rows in blocks of {block_rows} rows")
+    with SpillDirectory() as spill:
+        tables = []
+        for start in range(0, len(left), block_rows):
+            block = left.iloc[start:start + block_rows].merge(right, how="cross")
+            tables.append(spill.read(spill.write(block, index=False)))
+            del block
+        return spilled_frame(tables)
@@ -1,8 +1,15 @@
-from session.cli import handle_session_command, handle_desc_command
+from session.cli import handle_session_command, handle_desc_command, handle_explain_command, handle_prepared_command, print_batches
 from parser.sql_parser import parse_query
-from executor.executor import execute_plan
+from executor.executor import execute_plan_batches
+from executor.batch import execute_batch
+from server import serve, run_client
 from semantic.validator import validate_logical_plan
-from cache.results_cache import check_results_cache, cache_query
+from planner.optimizer import optimize_plan
+from cache.results_cache import iter_cached_batches, cache_batches, clear_query_cache
+from session import session
+from cache.plan_cache import lookup_plan, store_plan
+import pyarrow as pa
+import argparse
 import logging
 import os
 
@@ -13,7 +20,136 @@ logging.basicConfig(
     datefmt='%H:%M:%S'
 )
 
+def split_statements(text):
+    # Helper function to split a script into statements on ";" outside of quotes, dropping "--" comments
+    statements, current, quote = [], [], None
+    for line in text.splitlines():
+        i = 0
+        while i < len(line):
+            ch = line[i]
+            if quote:
+                if ch == quote:
+                    quote = None
+            elif ch in ("'", '"'):
+                quote = ch
+            elif line.startswith("--", i):
+                break
+            elif ch == ";":
+                statements.append("".join(current).strip())
+                current = []
+                i += 1
+                continue
+            current.append(ch)
+            i += 1
+        current.append(" ")
+    statements.append("".join(current).strip())
+    return [s for s in statements if s]
+
+def run_batch(path, data_dir):
+
+    """ Run a file of SQL statements as one batch.
+
+    SET / DESC / EXPLAIN / PREPARE / EXECUTE statements run first, in file order. Cached results are printed
+    from the cache; the other queries are planned and executed together with one shared
+    scan per table (see execute_batch), and each result is printed and cached in file order.
+    A statement that fails is reported and the rest of the batch still runs.
+
+    Args:
+        path (str): file with SQL statements separated by ";"
+        data_dir (str): directory containing parquet table files.
+    """
+
+    with open(path) as f:
+        statements = split_statements(f.read())
+
+    queries, plans = [], []
+    for query in statements:
+        try:
+            if handle_session_command(query) or handle_desc_command(query, data_dir=data_dir) \
+                    or handle_explain_command(query, data_dir=data_dir) \
+                    or handle_prepared_command(query, data_dir=data_dir):
+                continue
+        except (FileNotFoundError, ValueError) as error:
+            print(error)
+            continue
+
+        plan = lookup_plan(query, data_dir)
+        if plan is None:
+            try:
+                plan = parse_query(query)
+                tables = list(plan.source_tables)
+                plan = validate_logical_plan(plan, data_dir)
+                plan = optimize_plan(plan, data_dir)
+                store_plan(query, plan, tables, data_dir)
+            except (FileNotFoundError, ValueError) as error:
+                print(f"{query}\nError: {error}\n")
+                plan = None
+        queries.append(query)
+        plans.append(plan)
+
+    # results already cached are not executed again
+    cached = {}
+    for i, query in enumerate(queries):
+        if plans[i] is None:
+            continue
+        try:
+            reader = iter_cached_batches(query)
+        except (KeyError, pa.ArrowInvalid):
+            clear_query_cache(query)
+            reader = None
+        if reader is not None:
+            cached[i] = reader
+
+    pending = [i for i in range(len(queries)) if plans[i] is not None and i not in cached]
+    try:
+        results = dict(zip(pending, execute_batch([plans[i] for i in pending], data_dir)))
+    except (FileNotFoundError, NotImplementedError, ValueError, KeyError) as error:
+        print("Error:", error)
+        results = {}
+
+    for i, query in enumerate(queries):
+        if plans[i] is None or (i not in cached and i not in results):
+            continue
+        print(query)
+        if i in cached:
+            batches = cached[i]
+        else:
+            result = pa.Table.from_pandas(results[i], preserve_index=False)
+            batches = cache_batches(query, iter(result.to_batches(max_chunksize=session.FETCH_SIZE)))
+        try:
+            num_rows = print_batches(batches, session.FETCH_SIZE)
+        except (KeyError, pa.ArrowInvalid) as error:
+            print(f"Cached result is no longer readable ({error}), run the query again.")
+            clear_query_cache(query)
+            continue
+        print(f"\n {num_rows} rows selected.\n" if num_rows else "\nno rows selected.\n")
+
 if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description="Mini parallel query engine")
+    arg_parser.add_argument("--batch", type=str, default=None,
+                            help="File of SQL statements to run as one batch, scanning each table once")
+    arg_parser.add_argument("--serve", type=str, default=None, metavar="ADDRESS",
+                            help="Serve clients on host:port or a Unix socket path")
+    arg_parser.add_argument("--connect", type=str, default=None, metavar="ADDRESS",
+                            help="Run the REPL on a query server at host:port or a Unix socket path")
+    arg_parser.add_argument("--max-queries", type=int, default=session.SERVER_MAX_QUERIES,
+                            help="Queries the server runs at the same time")
+    arg_parser.add_argument("--max-queued", type=int, default=session.SERVER_MAX_QUEUED,
+                            help="Queries waiting for the server before new ones are rejected")
+    args = arg_parser.parse_args()
+    if args.serve:
+        session.SERVER_MAX_QUERIES, session.SERVER_MAX_QUEUED = args.max_queries, args.max_queued
+        base_dir = os.path.dirname(os.path.abspath(__file__))
+        serve(args.serve, os.path.join(base_dir, "data"))
+        exit(0)
+    if args.connect:
+        run_client(args.connect)
+        exit(0)
+    if args.batch:
+        base_dir = os.path.dirname(os.path.abspath(__file__))
+        run_batch(args.batch, os.path.join(base_dir, "data"))
+        exit(0)
+
     while True:
         # 1. Get SQL statement from client
         query = input("SQL > ")
@@ -32,55 +168,72 @@ if __name__ == "__main__":
             data_dir = os.path.join(base_dir, "data")
             if handle_desc_command(query, data_dir=data_dir):
                 continue
+            if handle_explain_command(query, data_dir=data_dir):
+                continue
+            if handle_prepared_command(query, data_dir=data_dir):
+                continue
         except (FileNotFoundError, ValueError) as error:
             print(error)
             continue
 
-        # 2a. Check whether SQL text is cached in Redis
+        # 2a. Check whether SQL text is cached in Redis, and stream it back
         try:
-            results = check_results_cache(query)
-            if results is not None and not results.empty:
+            reader = iter_cached_batches(query)
+            if reader is not None:
                 logging.debug("Fetching results from cache.")
-                print("\n", results.to_string(index=False), "\n")
-                print(f"\n {len(results)} rows selected.\n")
+                num_rows = print_batches(reader, session.FETCH_SIZE)
+                print(f"\n {num_rows} rows selected.\n" if num_rows else "\nno rows selected.\n")
                 continue
+        except (KeyError, pa.ArrowInvalid) as error:
+            # partially expired or corrupt entry
+            print(f"Cached result is no longer readable ({error}), run the query again.")
+            clear_query_cache(query)
+            continue
         except Exception as e:
             print(f"Redis error: {e}")
             exit(1)
 
-        # 2. Parse Query into a logical plan
-        try:
-            plan = parse_query(query)
-            logging.debug("Parsed query.")
-        except ValueError as error:
-            print("Error:", error)
-            exit(1)
-        logging.debug(f"{plan}")
-        
-        # 3. Validate logical plan
-        try:
-            base_dir = os.path.dirname(os.path.abspath(__file__))
-            data_dir = os.path.join(base_dir, "data")
-            plan = validate_logical_plan(plan, data_dir)
-            logging.debug("Validated query semantics.")
-        except (FileNotFoundError, ValueError) as error:
-            print("Error:", error)
-            exit(1)
-        logging.debug(f"{plan}")
+        # 2b. Reuse the validated plan if the query was planned before
+        base_dir = os.path.dirname(os.path.abspath(__file__))
+        data_dir = os.path.join(base_dir, "data")
+        plan = lookup_plan(query, data_dir)
+
+        if plan is None:
+            # 2. Parse Query into a logical plan
+            try:
+                plan = parse_query(query)
+                logging.debug("Parsed query.")
+            except ValueError as error:
+                print("Error:", error)
+                exit(1)
+            logging.debug(f"{plan}")
+            tables = list(plan.source_tables)
+
+            # 3. Validate logical plan
+            try:
+                plan = validate_logical_plan(plan, data_dir)
+                logging.debug("Validated query semantics.")
+            except (FileNotFoundError, ValueError) as error:
+                print("Error:", error)
+                exit(1)
+            logging.debug(f"{plan}")
+
+            # 3a. Choose join order from table metadata
+            plan = optimize_plan(plan, data_dir)
+            store_plan(query, plan, tables, data_dir)
 
-        # 4: Schedule logical plan for execution
+        # 4: Schedule logical plan for execution, and
+        # 5. Return result rows to client as they are produced (and cache them)
         try:
             base_dir = os.path.dirname(os.path.abspath(__file__))
             data_dir = os.path.join(base_dir, "data")
-            results = execute_plan(plan, data_dir)
-            cache_query(query, results)
+            batches = cache_batches(query, execute_plan_batches(plan, data_dir, session.FETCH_SIZE))
+            num_rows = print_batches(batches, session.FETCH_SIZE)
         except (FileNotFoundError, NotImplementedError, ValueError, KeyError) as error:
             print("Error:", error)
             exit(1)
 
-        # 5. Return result rows to client
-        if results.empty:
+        if num_rows == 0:
             print("\nno rows selected.\n")
-        else:        
-            print("\n", results.to_string(index=False), "\n")
-            print(f"\n {len(results)} rows selected.\n")
\ No newline at end of file
+        else:
+            print(f"\n {num_rows} rows selected.\n")
@@ -1,5 +1,8 @@
 from planner.logical_plan import LogicalPlan
 from collections import defaultdict
+import re
+
+AGGREGATE_FUNCTIONS = ("COUNT", "SUM", "MIN", "MAX", "AVG")
 
 def reformat_col_proj(col_proj: str):
     
@@ -21,6 +24,27 @@ def reformat_col_proj(col_proj: str):
             col_proj_dict[None].append(col)
     return col_proj_dict
 
+def reformat_aggregates(select_list: str):
+
+    """ Splits a SELECT list into aggregate functions and plain column projections
+
+    Args:
+        select_list (str): SELECT list without whitespace
+    Returns:
+        aggregates (list): (function, argument) of each aggregate, argument lowercased
+        col_proj (str): remaining column projections
+    
+    """
+    aggregates = []
+    columns = []
+    for item in select_list.split(','):
+        match = re.match(r"^(\w+)\((\*|[\w\.]+)\)$", item)
+        if match and match.group(1) in AGGREGATE_FUNCTIONS:
+            aggregates.append((match.group(1), match.group(2).lower()))
+        else:
+            columns.append(item)
+    return aggregates, ",".join(columns)
+
 def reformat_source_tables(source_tables: str) -> list:
 
     """ Parses source tables into list of source tables
@@ -57,6 +81,15 @@ def valid_format(sql_text: str) -> LogicalPlan | None:
 
     if tokens[0] != "SELECT":
         return False
+
+    # get limit, only allowed as the last clause: LIMIT <n>
+    limit = None
+    if "LIMIT" in tokens:
+        limit_idx = tokens.index("LIMIT")
+        if limit_idx != len(tokens) - 2 or not tokens[-1].isdigit():
+            return None
+        limit = int(tokens[-1])
+        tokens = tokens[:limit_idx]
     
     try:
         sel_idx = tokens.index("SELECT") # required
@@ -76,6 +109,28 @@ def valid_format(sql_text: str) -> LogicalPlan | None:
     except (ValueError, IndexError):
         oby_idx = -1
 
+    try:
+        gby_idx = tokens.index("GROUP") # optional
+        if tokens[gby_idx + 1] != "BY":
+            return None
+    except (ValueError, IndexError):
+        gby_idx = -1
+
+    try:
+        having_idx = tokens.index("HAVING") # optional
+    except ValueError:
+        having_idx = -1
+
+    # clauses have to come in order: WHERE, GROUP BY, HAVING, ORDER BY
+    clause_idx = [idx for idx in (where_idx, gby_idx, having_idx, oby_idx) if idx != -1]
+    if clause_idx != sorted(clause_idx):
+        return None
+
+    def clause_end(idx):
+        # a clause runs until the next clause, or the end of the query
+        later = [i for i in clause_idx if i > idx]
+        return later[0] if later else len(tokens)
+
     try:
         oby_dir_idx = tokens.index("ASC") # optional
         order_by_dir = "ASC"
@@ -91,12 +146,7 @@ def valid_format(sql_text: str) -> LogicalPlan | None:
                 order_by_dir = None
 
     # get source tables
-    if where_idx == -1 and oby_idx == -1:
-        source_tables = tokens[from_idx + 1 : len(tokens)]
-    elif where_idx == -1:
-        source_tables = tokens[from_idx + 1 : oby_idx]
-    else:
-        source_tables = tokens[from_idx + 1 : where_idx]
+    source_tables = tokens[from_idx + 1 : clause_end(from_idx)]
     
     if not source_tables:
         return False
@@ -104,9 +154,10 @@ def valid_format(sql_text: str) -> LogicalPlan | None:
         source_tables = [table.lower() for table in source_tables]
         source_tables = reformat_source_tables("".join(source_tables))
 
-    # get column projection
-    col_proj = reformat_col_proj("".join(tokens[sel_idx + 1 : from_idx]))
-    if not col_proj:
+    # get column projection, aggregate functions are kept apart
+    aggregates, select_list = reformat_aggregates("".join(tokens[sel_idx + 1 : from_idx]))
+    col_proj = reformat_col_proj(select_list) if select_list else defaultdict(list)
+    if not col_proj and not aggregates:
         return False
     
     # check if select * query
@@ -115,12 +166,24 @@ def valid_format(sql_text: str) -> LogicalPlan | None:
     # get filters
     filter_clause = None
     if where_idx != -1:
-        if oby_idx == -1:
-            filter_clause = " ".join(tokens[where_idx + 1: len(tokens)])
-        else:
-            filter_clause = " ".join(tokens[where_idx + 1: oby_idx])
+        filter_clause = " ".join(tokens[where_idx + 1: clause_end(where_idx)])
         filter_clause = filter_clause.lower()
 
+    # get group by
+    group_by = None
+    if gby_idx != -1:
+        group_by_str = "".join(tokens[gby_idx + 2 : clause_end(gby_idx)])
+        group_by = [col.lower() for col in group_by_str.split(",") if col]
+        if not group_by:
+            return None
+
+    # get having
+    having_clause = None
+    if having_idx != -1:
+        having_clause = " ".join(tokens[having_idx + 1: clause_end(having_idx)]).lower()
+        if not having_clause:
+            return None
+
     # get order by
     order_by = None
     if oby_idx != -1:
@@ -130,12 +193,13 @@ def valid_format(sql_text: str) -> LogicalPlan | None:
             order_by_str = " ".join(tokens[oby_idx + 2 :])
         
         if order_by_str:
-            order_by = [col.strip().lower() for col in order_by_str.split(",") if col.strip()]
+            order_by = ["".join(col.split()).lower() for col in order_by_str.split(",") if col.strip()]
 
 
     return LogicalPlan(col_proj=col_proj, source_tables=source_tables, 
                         filter=filter_clause, order_by=order_by, order_dir=order_by_dir,
-                        sel_all=sel_all)
+                        sel_all=sel_all, limit=limit, group_by=group_by,
+                        aggregates=aggregates or None, having=having_clause)
 
 
 def parse_query(sql_text: str) -> LogicalPlan:
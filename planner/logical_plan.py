@@ -1,14 +1,22 @@
 # Logical Plan Structure
 class LogicalPlan:
-    def __init__(self, col_proj=None, source_tables=None, filter=None, order_by=None, order_dir=None, sel_all=None):
+    def __init__(self, col_proj=None, source_tables=None, filter=None, order_by=None, order_dir=None, sel_all=None, limit=None,
+                 group_by=None, aggregates=None, having=None):
         self.col_proj = col_proj # defaultdict(list) column projections for each source table
         self.source_tables = source_tables # list of source tables
         self.filter = filter # where predicate (during PARSE time)
         self.single_filters = None # where predicate (during SEMANTIC time)
         self.join_filters = None # where predicate joining two tables (during SEMANTIC time)
+        self.residual_filters = None # where predicate across tables, applied after the joins (during SEMANTIC time)
+        self.parameters = None # ? placeholders of the where predicate, in order (during SEMANTIC time, prepared statements only)
         self.order_by = order_by # order by columns
         self.order_dir = order_dir # order by direction [ASC, DESC]
         self.sel_all = sel_all # '*' present
+        self.limit = limit # maximum number of result rows (LIMIT n)
+        self.group_by = group_by # group by columns
+        self.aggregates = aggregates # aggregate functions in SELECT [COUNT, SUM, MIN, MAX, AVG]
+        self.having = having # having predicate on groups
+        self.estimates = None # cardinality estimates of scans and joins (during OPTIMIZER time)
     
     def __repr__(self):
         return (f"LogicalPlan(\n"
@@ -17,6 +25,12 @@ class LogicalPlan:
                 f"  filter={self.filter},\n"
                 f"  single_filters={self.single_filters},\n"
                 f"  join_filters={self.join_filters},\n"
+                f"  residual_filters={self.residual_filters},\n"
+                f"  parameters={self.parameters},\n"
                 f"  order_by={self.order_by},\n"
                 f"  order_dir={self.order_dir}\n"
-                f"  select_all = {self.sel_all})")
\ No newline at end of file
+                f"  select_all = {self.sel_all}\n"
+                f"  limit={self.limit}\n"
+                f"  group_by={self.group_by},\n"
+                f"  aggregates={self.aggregates},\n"
+                f"  having={self.having})")
\ No newline at end of file
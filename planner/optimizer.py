@@ -0,0 +1,343 @@
+import logging
+from catalog import get_table
+from planner.predicate import AND, is_leaf, format_predicate, compare_value
+
+# Cost-based join ordering
+# Cardinalities are estimated from the row counts and min/max statistics in the
+# parquet footers (via the table catalog), assuming uniformly distributed values
+# and independent predicates; predicates on partition columns count the rows of the matching files. Join order minimizes the sum of intermediate result sizes.
+
+DEFAULT_EQ_SELECTIVITY = 0.1 # equality on a column without usable statistics (e.g. strings)
+DEFAULT_RANGE_SELECTIVITY = 1 / 3 # range predicate on a column without usable statistics
+MAX_EXHAUSTIVE_TABLES = 8 # above this many tables, fall back to greedy ordering
+FLIP_OP = {"=": "=", "<": ">", ">": "<", "<=": ">=", ">=": "<="} # operator of a comparison with its sides swapped
+
+def is_number(value):
+
+    """ True for int/float literals and statistics (bool excluded). """
+
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+def distinct_estimate(entry, col, num_rows):
+
+    """ Estimate the number of distinct values of a column.
+
+    Integer columns cannot have more distinct values than their min/max range.
+
+    Args:
+        entry (TableMetadata): catalog entry of the table
+        col (str): column name
+        num_rows (float): (estimated) number of rows
+
+    Returns:
+        float: estimated number of distinct values, at least 1
+    """
+
+    stats = entry.column_stats(col)
+    ndv = num_rows
+    if stats is not None and isinstance(stats[0], int) and isinstance(stats[1], int) \
+            and not isinstance(stats[0], bool):
+        ndv = min(ndv, stats[1] - stats[0] + 1)
+    return max(ndv, 1)
+
+def predicate_selectivity(entry, col, op, value):
+
+    """ Estimate the fraction of rows of a table satisfying "col op value".
+
+    Args:
+        entry (TableMetadata): catalog entry of the table
+        col (str): column name
+        op (str): comparison operator
+        value: literal of the predicate, typed by the validator
+
+    Returns:
+        float: selectivity between 0 and 1
+    """
+
+    if entry.is_partition_column(col):
+        # every row of a file has the value of its partition, so the fraction is exact
+        matching = sum(file.metadata.num_rows for file in entry.files
+                       if compare_value(file.partition[col.lower()], op, value))
+        return matching / entry.num_rows if entry.num_rows else 0.0
+
+    stats = entry.column_stats(col)
+    if stats is None or not is_number(value) or not is_number(stats[0]) or not is_number(stats[1]):
+        return DEFAULT_EQ_SELECTIVITY if op == "=" else DEFAULT_RANGE_SELECTIVITY
+
+    lo, hi, nulls = stats
+    non_null = 1 - nulls / entry.num_rows if entry.num_rows else 1
+    if op == "=":
+        if value < lo or value > hi:
+            return 0.0
+        return non_null / distinct_estimate(entry, col, entry.num_rows)
+
+    if hi == lo:
+        width = 1.0
+        below = 0.0 if value <= lo else 1.0
+    else:
+        width = hi - lo
+        below = min(max((value - lo) / width, 0.0), 1.0) # fraction of values < value
+    if op in ("<", "<="):
+        return non_null * below
+    return non_null * (1 - below)
+
+def node_selectivity(entry, node):
+
+    """ Estimate the fraction of rows of a table satisfying a predicate tree.
+
+    Children are assumed independent: AND multiplies, OR is 1 - prod(1 - s).
+
+    Args:
+        entry (TableMetadata): catalog entry of the table
+        node (tuple): predicate tree on the table
+
+    Returns:
+        float: selectivity between 0 and 1
+    """
+
+    if is_leaf(node):
+        return predicate_selectivity(entry, *node)
+    connective, children = node
+    result = 1.0
+    for child in children:
+        s = node_selectivity(entry, child)
+        result *= s if connective == AND else (1 - s)
+    return result if connective == AND else 1 - result
+
+def order_predicates(entry, node):
+
+    """ Reorder a predicate tree so that short-circuit evaluation decides rows early.
+
+    Children of AND are ordered by ascending selectivity (the first child drops the
+    most rows), children of OR by descending selectivity (the first child accepts the most).
+
+    Args:
+        entry (TableMetadata): catalog entry of the table
+        node (tuple): predicate tree on the table
+
+    Returns:
+        tuple: reordered predicate tree
+    """
+
+    if is_leaf(node):
+        return node
+    connective, children = node
+    children = [order_predicates(entry, child) for child in children]
+    children.sort(key=lambda child: node_selectivity(entry, child), reverse=(connective != AND))
+    return (connective, children)
+
+def estimate_table_rows(plan, table, data_dir):
+
+    """ Estimate the rows of a table surviving its single-table filters.
+
+    Args:
+        plan (LogicalPlan): validated logical plan
+        table (str): source table name
+        data_dir (str): directory containing parquet tables
+
+    Returns:
+        float: estimated number of rows
+    """
+
+    entry = get_table(data_dir, table)
+    rows = float(entry.num_rows)
+    if plan.single_filters and table in plan.single_filters:
+        for node in plan.single_filters[table]:
+            rows *= node_selectivity(entry, node)
+    return rows
+
+def order_joins(tables, rows, edges):
+
+    """ Choose a left-deep join order minimizing the sum of intermediate result sizes.
+
+    Orders are searched exhaustively with dynamic programming over table subsets,
+    or greedily for many tables. Cross products are only used when no join
+    condition connects the remaining tables.
+
+    Args:
+        tables (list[str]): source tables
+        rows (dict[str, float]): estimated rows of each table after filters
+        edges (dict[frozenset, float]): estimated join size factor 1 / max(ndv) of each joined table pair
+
+    Returns:
+        tuple:
+            - list[str]: join order
+            - list[float]: estimated rows after each step of the order
+    """
+
+    def step(card, joined, table):
+        # estimated size after joining table onto the tables already joined:
+        # |L| * |R| / max(ndv(L.key), ndv(R.key)), or a cross product without a condition
+        factors = [edges[frozenset((t, table))] for t in joined if frozenset((t, table)) in edges]
+        return card * rows[table] * (min(factors) if factors else 1.0)
+
+    def connected(joined, table):
+        return any(frozenset((t, table)) in edges for t in joined)
+
+    if len(tables) <= MAX_EXHAUSTIVE_TABLES:
+        # best[subset] = (cost, cardinality, order, step cardinalities)
+        best = {frozenset([t]): (0.0, rows[t], [t], [rows[t]]) for t in tables}
+        for size in range(2, len(tables) + 1):
+            for subset, (cost, card, order, cards) in [(s, v) for s, v in best.items() if len(s) == size - 1]:
+                candidates = [t for t in tables if t not in subset]
+                # avoid cross products while some table can still be joined on a condition
+                if any(connected(subset, t) for t in candidates):
+                    candidates = [t for t in candidates if connected(subset, t)]
+                for table in candidates:
+                    new_card = step(card, subset, table)
+                    new_cost = cost + new_card
+                    key = subset | {table}
+                    if key not in best or new_cost < best[key][0]:
+                        best[key] = (new_cost, new_card, order + [table], cards + [new_card])
+        _, _, order, cards = best[frozenset(tables)]
+        return order, cards
+
+    # greedy: start from the smallest table, add the table giving the smallest intermediate
+    order = [min(tables, key=lambda t: rows[t])]
+    cards = [rows[order[0]]]
+    while len(order) < len(tables):
+        candidates = [t for t in tables if t not in order]
+        if any(connected(order, t) for t in candidates):
+            candidates = [t for t in candidates if connected(order, t)]
+        table = min(candidates, key=lambda t: step(cards[-1], order, t))
+        cards.append(step(cards[-1], order, table))
+        order.append(table)
+    return order, cards
+
+def optimize_plan(plan, data_dir):
+
+    """ Reorder the WHERE predicates and the joins of a validated plan by estimated cost.
+
+    Orders each table's predicates for short-circuit evaluation (see order_predicates).
+    Estimates each table's filtered cardinality and each equi-join's output size,
+    then reorders plan.source_tables into the chosen join order and orients
+    plan.join_filters so that every join adds one new table to the tables already
+    joined. The executors join in that order. Estimates are kept on the plan for EXPLAIN.
+
+    Args:
+        plan (LogicalPlan): validated logical plan
+        data_dir (str): directory containing parquet tables
+
+    Returns:
+        LogicalPlan: plan with single_filters in evaluation order, source_tables and join_filters in join order
+    """
+
+    tables = plan.source_tables
+
+    # most selective predicates first, for short-circuit evaluation of the WHERE clause
+    if plan.single_filters:
+        for table, nodes in plan.single_filters.items():
+            entry = get_table(data_dir, table)
+            nodes = [order_predicates(entry, node) for node in nodes]
+            plan.single_filters[table] = sorted(nodes, key=lambda node: node_selectivity(entry, node))
+
+    rows = {table: estimate_table_rows(plan, table, data_dir) for table in tables}
+    plan.estimates = {"tables": rows, "joins": []}
+    if len(tables) < 2:
+        return plan
+
+    # join size factor of each table pair connected by an equi-join
+    edges = {}
+    for (t1, c1, op, t2, c2) in plan.join_filters or []:
+        if op != "=" or t1 not in rows or t2 not in rows:
+            continue
+        ndv1 = distinct_estimate(get_table(data_dir, t1), c1, rows[t1])
+        ndv2 = distinct_estimate(get_table(data_dir, t2), c2, rows[t2])
+        pair = frozenset((t1, t2))
+        edges[pair] = min(edges.get(pair, 1.0), 1 / max(ndv1, ndv2, 1))
+
+    order, cards = order_joins(tables, rows, edges)
+
+    # orient join filters: left side already joined, right side is the new table
+    # every condition belongs to the step joining the later of its two tables; the first one of a step
+    # is its join key, the others (e.g. a second condition between the same tables) filter the joined rows
+    join_filters = []
+    for i, table in enumerate(order[1:], start=1):
+        joined = order[:i]
+        conditions = []
+        for (t1, c1, op, t2, c2) in plan.join_filters or []:
+            if t2 == table and t1 in joined:
+                conditions.append((t1, c1, op, t2, c2))
+            elif t1 == table and t2 in joined:
+                conditions.append((t2, c2, FLIP_OP[op], t1, c1))
+        join_filters += conditions
+        join_filter = conditions[0] if conditions else None
+
+        # the smaller input is the build side of the hash join
+        build = table if rows[table] <= cards[i - 1] else " x ".join(joined)
+        plan.estimates["joins"].append({"table": table, "filter": join_filter, "conditions": conditions[1:],
+                                        "rows": cards[i], "build": build})
+
+    if plan.join_filters:
+        plan.join_filters = join_filters
+    plan.source_tables = order
+    logging.debug(f"Join order {order} with estimated rows {[round(c) for c in cards]}")
+    return plan
+
+def explain_plan(plan) -> list:
+
+    """ Describe the operator tree of an optimized plan, with the chosen join order and cardinality estimates.
+
+    Operators are listed from the root (the last one applied) down, each input indented under
+    its operator. Joins form a left-deep tree: the left input of a join is the join before it.
+
+    Args:
+        plan (LogicalPlan): optimized logical plan
+
+    Returns:
+        list[str]: lines of the explanation
+    """
+
+    estimates = plan.estimates or {"tables": {}, "joins": []}
+    tables = plan.source_tables
+
+    # operators over the joined rows, from the root down
+    operators = []
+    order_by = ", ".join(plan.order_by or []) + (" DESC" if plan.order_dir == "DESC" else " ASC")
+    if plan.order_by and plan.limit is not None:
+        operators.append(f"Top-N {plan.limit}: order by {order_by}")
+    elif plan.order_by:
+        operators.append(f"Sort: order by {order_by}")
+    elif plan.limit is not None:
+        operators.append(f"Limit {plan.limit}")
+    if plan.aggregates or plan.group_by or plan.having:
+        group_by = [f"{table}.{col}" for (table, col) in plan.group_by or []]
+        aggregates = [agg[3] for agg in plan.aggregates or []]
+        having = [f"{h[3]} {h[4]} {h[5]}" for h in plan.having or []]
+        operators.append(f"Aggregate (two-phase): group by {group_by}, aggregates {aggregates}, having {having}")
+    else:
+        operators.append("Project " + str([f"{table}.{col}" for table in tables for col in plan.col_proj.get(table, [])]))
+    if plan.residual_filters:
+        filters = " AND ".join(f"({format_predicate(node)})" for node in plan.residual_filters)
+        operators.append(f"Filter after joins: {filters}")
+
+    lines = ["Join order: " + " -> ".join(tables)]
+    for depth, operator in enumerate(operators):
+        lines.append("  " * depth + operator)
+
+    def scan(table, depth):
+        filters = plan.single_filters.get(table, []) if plan.single_filters else []
+        filters = " AND ".join(f"({format_predicate(node)})" if len(filters) > 1 and not is_leaf(node)
+                               else format_predicate(node) for node in filters) or "none"
+        est = estimates["tables"].get(table)
+        est = f"{est:.0f}" if est is not None else "?"
+        lines.append("  " * depth + f"Scan {table}: est. {est} rows, filters {filters}")
+
+    def join(i, depth):
+        # operator producing the first i + 1 tables of the join order
+        if i == 0:
+            scan(tables[0], depth)
+            return
+        step = estimates["joins"][i - 1] if i - 1 < len(estimates["joins"]) else {"filter": None, "rows": None}
+        rows = f"{step['rows']:.0f}" if step["rows"] is not None else "?"
+        if step["filter"]:
+            condition = " AND ".join(f"{t1}.{c1} {op} {t2}.{c2}"
+                                     for (t1, c1, op, t2, c2) in [step["filter"]] + step.get("conditions", []))
+            lines.append("  " * depth + f"Join {condition}: est. {rows} rows, build side {step['build']}")
+        else:
+            lines.append("  " * depth + f"Cross join {tables[i]}: est. {rows} rows")
+        join(i - 1, depth + 1)
+        scan(tables[i], depth + 1)
+
+    join(len(tables) - 1, len(operators))
+    return lines
@@ -0,0 +1,157 @@
+# Predicate trees of the WHERE clause
+# A predicate is either a comparison leaf (col, op, value), with the literal value already
+# converted to the column's type, or a connective (AND / OR, [children]).
+# Single-table predicates name the column only; predicates across tables (evaluated after
+# the joins) name it as "table.column".
+# The value of a comparison in a prepared statement may be a Parameter (a ? placeholder),
+# replaced with the typed value given at execution (see bind_parameters).
+# implies decides conservatively whether one predicate tree rules out every row another rules out,
+# so rows filtered on a weaker predicate can be filtered again for a stronger one.
+
+import operator
+
+AND = "AND"
+OR = "OR"
+COMPARISONS = {"=": operator.eq, "<": operator.lt, ">": operator.gt, "<=": operator.le, ">=": operator.ge}
+
+class Parameter:
+
+    """ ? placeholder of a prepared statement, standing for the value of a comparison.
+
+    Args:
+        index (int): position of the placeholder in the WHERE clause, from 0
+        field (pyarrow.Field): column compared with the placeholder, whose type the value takes
+        op (str): comparison operator, with the column on the left
+    """
+
+    def __init__(self, index, field, op):
+        self.index = index
+        self.field = field
+        self.op = op
+
+    def __repr__(self):
+        return f"${self.index + 1}"
+
+def is_leaf(node):
+
+    """ True for a comparison (col, op, value), False for an AND / OR connective. """
+
+    return len(node) == 3
+
+def compare_value(left, op, value):
+
+    """ Evaluate one comparison on a single value, e.g. a partition value of a file.
+
+    String equality is case-insensitive, like in the executors; NULL (None) never matches.
+    """
+
+    if left is None:
+        return False
+    if isinstance(value, str):
+        return str(left).lower() == value.lower()
+    return COMPARISONS[op](left, value)
+
+def comparison_implies(leaf, other):
+
+    """ Check whether every value satisfying comparison leaf also satisfies comparison other. """
+
+    col, op, value = leaf
+    other_col, other_op, other_value = other
+    if col.lower() != other_col.lower():
+        return False
+    # string comparisons are case-insensitive equalities
+    if isinstance(value, str) or isinstance(other_value, str):
+        return op == other_op == "=" and isinstance(value, str) and isinstance(other_value, str) \
+            and value.lower() == other_value.lower()
+    try:
+        if op == "=":
+            return compare_value(value, other_op, other_value)
+        if op in (">", ">=") and other_op in (">", ">="):
+            return value > other_value or (value == other_value and (op == ">" or other_op == ">="))
+        if op in ("<", "<=") and other_op in ("<", "<="):
+            return value < other_value or (value == other_value and (op == "<" or other_op == "<="))
+    except TypeError:
+        pass
+    return False
+
+def implies(node, other):
+
+    """ Check whether every row satisfying predicate tree node also satisfies predicate tree other.
+
+    The check is conservative: it compares bounds of the same column, e.g. age > 40 implies
+    age >= 30 and (age > 30 OR name = 'bob'), and returns False when it cannot tell.
+
+    Args:
+        node (tuple): predicate tree
+        other (tuple): predicate tree
+
+    Returns:
+        bool: True if node implies other
+    """
+
+    if node == other:
+        return True
+    if not is_leaf(other) and other[0] == AND:
+        return all(implies(node, child) for child in other[1])
+    if not is_leaf(node):
+        connective, children = node
+        if connective == OR:
+            return all(implies(child, other) for child in children)
+        if any(implies(child, other) for child in children):
+            return True
+    if not is_leaf(other):
+        return any(implies(node, child) for child in other[1])
+    return is_leaf(node) and comparison_implies(node, other)
+
+def predicate_leaves(node):
+
+    """ Iterate the comparisons (col, op, value) of a predicate tree.
+
+    Args:
+        node (tuple): predicate tree
+
+    Yields:
+        tuple: (col, op, value) of every comparison in the tree
+    """
+
+    if is_leaf(node):
+        yield node
+    else:
+        for child in node[1]:
+            yield from predicate_leaves(child)
+
+def conjunction(nodes):
+
+    """ Combine a list of predicate trees with AND (a single tree is returned as is). """
+
+    nodes = list(nodes)
+    return nodes[0] if len(nodes) == 1 else (AND, nodes)
+
+def format_predicate(node) -> str:
+
+    """ Render a predicate tree as SQL text, e.g. "age > 30 AND (name = 'bob' OR id < 5)". """
+
+    if is_leaf(node):
+        col, op, value = node
+        return f"{col} {op} {value!r}" if isinstance(value, str) else f"{col} {op} {value}"
+    connective, children = node
+    parts = [format_predicate(child) if is_leaf(child) else f"({format_predicate(child)})" for child in children]
+    return f" {connective} ".join(parts)
+
+def bind_parameters(node, values):
+
+    """ Replace the Parameters of a predicate tree with their values.
+
+    Args:
+        node (tuple): predicate tree
+        values (list): typed value of each parameter, by index
+
+    Returns:
+        tuple: predicate tree without parameters (unchanged subtrees are shared)
+    """
+
+    if is_leaf(node):
+        col, op, value = node
+        return (col, op, values[value.index]) if isinstance(value, Parameter) else node
+    connective, children = node
+    return (connective, [bind_parameters(child, values) for child in children])
@@ -1,12 +1,13 @@
-import os
 import logging
 import re
-from pyarrow import parquet as pq
+import pyarrow as pa
 from collections import defaultdict
+from catalog import get_table
+from planner.predicate import AND, OR, is_leaf, Parameter
 
 def load_table_schema(data_dir, table):
 
-    """ Load schema of a table from a parquet file.
+    """ Load schema of a table from the table catalog.
 
     Args:
         data_dir (str): path to directory containing parquet files.
@@ -21,14 +22,8 @@ def load_table_schema(data_dir, table):
         RuntimeError: if schema cannot be read
     """
 
-    file_path = os.path.join(data_dir, f"{table}.parquet")
-    if not os.path.exists(file_path):
-        raise FileNotFoundError(f"Table {table} not found")
-    try:
-        schema = pq.read_schema(file_path)
-    except Exception as e:
-        raise RuntimeError(f"Failed to read schema for table {table}: {str(e)}")
-    return set([col.lower() for col in schema.names]), schema
+    entry = get_table(data_dir, table)
+    return entry.columns, entry.schema
 
 def order_by_validator(plan, data_dir) -> bool:
 
@@ -53,9 +48,7 @@ def order_by_validator(plan, data_dir) -> bool:
                 table_name, col_name = col.split('.', 1)
                 if table_name not in source:
                     raise ValueError(f"ORDER BY references unknown table {table_name}")
-                file_path = os.path.join(data_dir, f"{table_name}.parquet")
-                schema = pq.read_schema(file_path)
-                columns = set([c.lower() for c in schema.names])
+                columns, _ = load_table_schema(data_dir, table_name)
                 if col_name.lower() not in columns:
                     raise ValueError(f"ORDER BY column {col} not found in table {table_name}")
             else:
@@ -69,18 +62,302 @@ def order_by_validator(plan, data_dir) -> bool:
                 raise ValueError(f"Ambiguous order-by column: {oby_key} found in {oby_val}")
     return True
 
-def where_clause_validator(plan, data_dir) -> bool:
+def resolve_table_column(col, source, data_dir, clause):
+
+    """ Resolve a column reference (TABLE.COLUMN or unqualified COLUMN) to its source table.
+
+    Args:
+        col (str): column reference
+        source (list[str]): source tables of the query
+        data_dir (str): directory containing parquet tables
+        clause (str): clause of the reference, for error messages
+
+    Returns:
+        tuple[str, str]: (table, lowercased column)
+    Raises:
+        ValueError: if the column is unknown or ambiguous
+    """
+
+    if '.' in col:
+        table_name, col_name = col.split('.', 1)
+        if table_name not in source:
+            raise ValueError(f"{clause} references unknown table {table_name}")
+        columns, _ = load_table_schema(data_dir, table_name)
+        if col_name.lower() not in columns:
+            raise ValueError(f"{clause} column {col} not found in table {table_name}")
+        return (table_name, col_name.lower())
+
+    tables = [table for table in source if col.lower() in load_table_schema(data_dir, table)[0]]
+    if not tables:
+        raise ValueError(f"{clause} column {col} not found")
+    if len(tables) > 1:
+        raise ValueError(f"Ambiguous {clause} column: {col} found in {tables}")
+    return (tables[0], col.lower())
+
+def aggregate_validator(plan, data_dir) -> bool:
+
+    """ Validate GROUP BY, aggregate functions, HAVING, and ORDER BY of an aggregation.
+
+    Args:
+        plan (LogicalPlan): logical plan containing group_by, aggregates, and having info
+        data_dir (str): directory containing parquet tables
+
+    Modifies:
+        plan.group_by (list): (table, column) of each group by column
+        plan.aggregates (list): (function, table, column, name) of each aggregate in SELECT,
+            table and column are None and '*' for COUNT(*)
+        plan.having (list): (function, table, column, name, op, value) of each conjunctive
+            HAVING predicate, function is None for a group by column
+        plan.order_by: columns renamed to the names of the result columns
+
+    Returns:
+        bool: True if the aggregation is valid
+    Raises:
+        ValueError: if a column is unknown, ambiguous, or neither grouped nor aggregated
+    """
+
+    source = plan.source_tables
+    if plan.sel_all:
+        raise ValueError("SELECT * is not supported with GROUP BY or aggregate functions")
+
+    plan.group_by = [resolve_table_column(col, source, data_dir, "GROUP BY") for col in plan.group_by or []]
+    grouped = set(plan.group_by)
+
+    # plain SELECT columns have to be grouped
+    for table in source:
+        for col in plan.col_proj.get(table, []):
+            if (table, col.lower()) not in grouped:
+                raise ValueError(f"Column {col} must appear in GROUP BY or in an aggregate function")
+
+    def resolve_aggregate(func, arg):
+        func = func.upper()
+        name = f"{func.lower()}({arg})"
+        if func not in ("COUNT", "SUM", "MIN", "MAX", "AVG"):
+            raise ValueError(f"Unknown aggregate function {func}")
+        if arg == '*':
+            if func != "COUNT":
+                raise ValueError(f"{name} is not supported, only COUNT(*)")
+            return (func, None, '*', name)
+        table, col = resolve_table_column(arg, source, data_dir, func)
+        if func in ("SUM", "AVG"):
+            _, schema = load_table_schema(data_dir, table)
+            field = schema.field([field_name for field_name in schema.names if field_name.lower() == col][0])
+            if not (pa.types.is_integer(field.type) or pa.types.is_floating(field.type)
+                    or pa.types.is_decimal(field.type)):
+                raise ValueError(f"{func} needs a numeric column, {arg} is {field.type}")
+        return (func, table, col, name)
+
+    plan.aggregates = [resolve_aggregate(func, arg) for (func, arg) in plan.aggregates or []]
+    plan.aggregates = list({agg[3]: agg for agg in plan.aggregates}.values())
+
+    # HAVING: conjunctive predicates on aggregates or group by columns
+    having = []
+    if plan.having:
+        if re.search(r"\s+or\s+", plan.having, flags=re.IGNORECASE):
+            raise ValueError("OR in HAVING clause not supported yet")
+        for token in re.split(r"\s+and\s+", plan.having, flags=re.IGNORECASE):
+            pattern = r"^\s*(\w+\(\s*[\w\.\*]+\s*\)|[\w\.]+)\s*(=|<=|>=|<|>)\s*['\"]?(.*?)['\"]?\s*$"
+            match = re.match(pattern, token)
+            if not match:
+                raise ValueError(f"Invalid HAVING clause {token}")
+            left, op, value = match.groups()
+            agg = re.match(r"^(\w+)\(\s*([\w\.\*]+)\s*\)$", left)
+            if agg:
+                having.append(resolve_aggregate(agg.group(1), agg.group(2)) + (op, value))
+            else:
+                table, col = resolve_table_column(left, source, data_dir, "HAVING")
+                if (table, col) not in grouped:
+                    raise ValueError(f"HAVING column {left} must appear in GROUP BY")
+                having.append((None, table, col, col, op, value))
+    plan.having = having
+
+    # ORDER BY: result columns, i.e. grouped columns in SELECT or aggregates in SELECT
+    if plan.order_by:
+        output = {agg[3]: agg[3] for agg in plan.aggregates}
+        for table in source:
+            for col in plan.col_proj.get(table, []):
+                output[col.lower()] = col.lower()
+                output[f"{table}.{col.lower()}"] = col.lower()
+        for col in plan.order_by:
+            if col not in output:
+                raise ValueError(f"ORDER BY column {col} must be a grouped column or aggregate in SELECT")
+        plan.order_by = [output[col] for col in plan.order_by]
+
+    logging.debug(f"Group by: {plan.group_by}, aggregates: {plan.aggregates}, having: {plan.having}")
+    return True
+
+# tokens of a WHERE clause: parentheses, quoted strings, operators, and words / numbers / columns
+WHERE_TOKEN = re.compile(r"""\s*(\(|\)|'[^']*'|"[^"]*"|<=|>=|=|<|>|\?|[\w\.\-]+)""")
+NUMBER = re.compile(r"^-?\d+(\.\d*)?([eE][-+]?\d+)?$")
+FLIP_OP = {"=": "=", "<": ">", ">": "<", "<=": ">=", ">=": "<="}
+
+def tokenize_where(filter_clause):
 
-    """ Parse WHERE clause and separate between single-table filters and join filters.
-        "COLUMN < VALUE" vs "TABLE_1.COLUMN = TABLE_2.COLUMN"
+    """ Split a WHERE clause into tokens.
+
+    Args:
+        filter_clause (str): WHERE clause
+
+    Returns:
+        list[str]: tokens
+    Raises:
+        ValueError: on characters that cannot start a token
+    """
+
+    tokens, pos = [], 0
+    filter_clause = filter_clause.rstrip()
+    while pos < len(filter_clause):
+        match = WHERE_TOKEN.match(filter_clause, pos)
+        if not match:
+            raise ValueError(f"Invalid WHERE clause {filter_clause}")
+        tokens.append(match.group(1))
+        pos = match.end()
+    return tokens
+
+def parse_where(tokens):
+
+    """ Parse WHERE clause tokens into a tree of AND / OR over comparisons.
+
+    AND binds tighter than OR, parentheses group.
+
+    Args:
+        tokens (list[str]): tokens of the WHERE clause
+
+    Returns:
+        tuple: (AND | OR, [children]) or a comparison (left, op, right) of raw tokens
+    Raises:
+        ValueError: if the WHERE clause is malformed
+    """
+
+    pos = 0
+
+    def peek():
+        return tokens[pos].lower() if pos < len(tokens) else None
+
+    def expression():
+        nonlocal pos
+        children = [term()]
+        while peek() == "or":
+            pos += 1
+            children.append(term())
+        return conjunction_or_single(OR, children)
+
+    def term():
+        nonlocal pos
+        children = [factor()]
+        while peek() == "and":
+            pos += 1
+            children.append(factor())
+        return conjunction_or_single(AND, children)
+
+    def factor():
+        nonlocal pos
+        if peek() == "(":
+            pos += 1
+            node = expression()
+            if peek() != ")":
+                raise ValueError("Invalid WHERE clause, missing )")
+            pos += 1
+            return node
+        if pos + 3 > len(tokens) or tokens[pos + 1] not in FLIP_OP:
+            raise ValueError(f"Invalid WHERE clause {' '.join(tokens[pos:pos + 3])}")
+        node = (tokens[pos], tokens[pos + 1], tokens[pos + 2])
+        pos += 3
+        return node
+
+    def conjunction_or_single(connective, children):
+        # flatten nested connectives of the same kind: a AND (b AND c) -> AND [a, b, c]
+        flat = []
+        for child in children:
+            if not is_leaf(child) and child[0] == connective:
+                flat.extend(child[1])
+            else:
+                flat.append(child)
+        return flat[0] if len(flat) == 1 else (connective, flat)
+
+    tree = expression()
+    if pos != len(tokens):
+        raise ValueError(f"Invalid WHERE clause near {' '.join(tokens[pos:])}")
+    return tree
+
+def typed_literal(value, field, op):
+
+    """ Convert a WHERE literal to the type of the column it is compared with.
+
+    Args:
+        value (str): literal, without quotes
+        field (pyarrow.Field): column compared with the literal
+        op (str): comparison operator
+
+    Returns:
+        int | float | bool | str | date / datetime: literal of the column's type
+    Raises:
+        ValueError: if the literal does not fit the column, or the operator does not apply
+    """
+
+    dtype = field.type
+    try:
+        if pa.types.is_integer(dtype) or pa.types.is_floating(dtype) or pa.types.is_decimal(dtype):
+            if not NUMBER.match(value):
+                raise ValueError
+            # integers are parsed exactly, a float would round them above 2**53
+            if not pa.types.is_floating(dtype) and not any(ch in value for ch in ".eE"):
+                return int(value)
+            number = float(value)
+            return int(number) if number.is_integer() and not pa.types.is_floating(dtype) else number
+        if pa.types.is_boolean(dtype):
+            return {"true": True, "false": False}[value.lower()]
+        if pa.types.is_temporal(dtype):
+            return pa.scalar(value).cast(dtype).as_py()
+    except (ValueError, KeyError, pa.ArrowInvalid):
+        raise ValueError(f"Invalid literal {value} for column {field.name} of type {dtype}")
+
+    if op != "=":
+        raise ValueError(f"Operator {op} not supported with str column {field.name}")
+    return value
+
+def typed_parameter(index, field, op):
+
+    """ Placeholder ? of a prepared statement compared with a column, checked like a literal would be.
+
+    Args:
+        index (int): position of the placeholder in the WHERE clause, from 0
+        field (pyarrow.Field): column compared with the placeholder
+        op (str): comparison operator
+
+    Returns:
+        Parameter: placeholder taking the column's type when bound
+    Raises:
+        ValueError: if the operator does not apply to the column
+    """
+
+    dtype = field.type
+    ordered = pa.types.is_integer(dtype) or pa.types.is_floating(dtype) or pa.types.is_decimal(dtype) \
+        or pa.types.is_boolean(dtype) or pa.types.is_temporal(dtype)
+    if op != "=" and not ordered:
+        raise ValueError(f"Operator {op} not supported with str column {field.name}")
+    return Parameter(index, field, op)
+
+def where_clause_validator(plan, data_dir, allow_parameters=False) -> bool:
+
+    """ Parse WHERE clause into a typed predicate tree, and separate it into single-table filters,
+        join filters, and filters across tables.
+        "COLUMN < VALUE" vs "TABLE_1.COLUMN = TABLE_2.COLUMN" vs "T1.COL < V1 OR T2.COL = V2"
+
+    Conditions are combined with AND / OR (AND binds tighter) and grouped with parentheses.
+    Literals are converted to the type of their column once, here. In prepared statements,
+    a ? in place of a literal becomes a Parameter, bound to a typed value at execution.
 
     Args:
         plan (LogicalPlan): logical plan containing filter string
         data_dir (str): directory containing parquet tables
+        allow_parameters (bool): whether ? placeholders are allowed (prepared statements)
 
     Modifies:
-        plan.single_filters (defaultdict[list]): single-table filters
+        plan.single_filters (defaultdict[list]): conjunctive predicate trees on each table
         plan.join_filters (list): join conditions across tables
+        plan.residual_filters (list): conjunctive predicate trees on several tables, applied after the joins
+        plan.parameters (list[Parameter]): ? placeholders, in the order they appear
         plan.filter: set to None after processing (only valid during sql_parser, so invalidate here)
 
     Raises:
@@ -88,75 +365,114 @@ def where_clause_validator(plan, data_dir) -> bool:
     """
 
     if not plan.filter:
-        plan.single_filter = None
+        plan.single_filters = None
         plan.join_filters = None
+        plan.residual_filters = None
+        plan.parameters = []
         return
     
     single_filters = defaultdict(list)
     join_filters = []
+    residual_filters = []
+    parameters = []
 
     source = plan.source_tables
 
-    tokens = re.split(r"\s+(and|or)\s+", plan.filter, flags=re.IGNORECASE)
-    logical_ops = [] # TO DO: and / or precedence tree needed
+    def resolve_column(col):
+        if col[0] in "'\"" or NUMBER.match(col):
+            return (None, col.strip("'\""), False)
+        if '.' in col:
+            table_name, col = col.split('.', 1)
+            if table_name not in source:
+                raise ValueError(f"WHERE clause references unknown table {table_name}")
+            columns, _ = load_table_schema(data_dir, table_name)
+            if col.lower() not in columns:
+                raise ValueError(f"WHERE clause column {col} not found in table {table_name}")
+            return (table_name, col, True)
+        else:
+            found = False
+            pair = (None, col, False)
+            for table in source:
+                columns, _ = load_table_schema(data_dir, table)
+                if col.lower() in columns and not found:
+                    pair = (table, col, True)
+                    found = True
+                elif col.lower() in columns and found:
+                    raise ValueError(f"WHERE clause column {col} referenced in multiple tables")
+            return pair
 
-    for token in tokens:
-        token = token.strip()
-        if not token:
-            continue
-        
-        if token.lower() in ('and', 'or'):
-            logical_ops.append(token.lower())
-            continue
-        
-        pattern = r"^\s*([\w\.]+)\s*(=|<=|>=|<|>)\s*['\"]?(.*?)['\"]?\s*$"
-        match = re.match(pattern, token)
-        if not match:
-            raise ValueError(f"Invalid WHERE clause {token}")
+    def field_of(table, col):
+        _, schema = load_table_schema(data_dir, table)
+        return schema.field([name for name in schema.names if name.lower() == col.lower()][0])
 
-        left, op, right = match.groups()
+    def literal(token, field, op):
+        # typed literal, or the next parameter for a ? placeholder
+        if token != "?":
+            return typed_literal(token.strip("'\""), field, op)
+        if not allow_parameters:
+            raise ValueError("Placeholder ? is only allowed in prepared statements (PREPARE name AS ...)")
+        parameters.append(typed_parameter(len(parameters), field, op))
+        return parameters[-1]
 
-        def resolve_column(col): 
-            if '.' in col:
-                table_name, col = col.split('.', 1)
-                if table_name not in source:
-                    raise ValueError(f"WHERE clause references unknown table {table_name}")
-                columns, _ = load_table_schema(data_dir, table_name)
-                if col.lower() not in columns:
-                    raise ValueError(f"WHERE clause column {col} not found in table {table_name}")
-                return (table_name, col, True)
-            else:
-                found = False
-                pair = (None, col, False)
-                for table in source:
-                    columns, _ = load_table_schema(data_dir, table)
-                    if col.lower() in columns and not found:
-                        pair = (table, col, True)
-                        found = True
-                    elif col.lower() in columns and found:
-                        raise ValueError(f"WHERE clause column {col} referenced in multiple tables")
-                return pair
-        
+    def resolve(node):
+        # comparisons become ("col", table, (col, op, value)) or ("join", (t1, c1, op, t2, c2))
+        if not is_leaf(node):
+            return (node[0], [resolve(child) for child in node[1]])
+
+        left, op, right = node
         left_table, left_column, left_is_col = resolve_column(left)
         right_table, right_column, right_is_col = resolve_column(right)
+        token = f"{left} {op} {right}"
 
         if left_is_col and right_is_col and left_table != right_table:
-            join_filters.append((left_table, left_column, op, right_table, right_column))
+            return ("join", (left_table, left_column, op, right_table, right_column))
         elif left_is_col and not right_is_col:
-            single_filters[left_table].append((left_column, op, right_column))
+            value = literal(right, field_of(left_table, left_column), op)
+            return ("col", left_table, (left_column, op, value))
         elif not left_is_col and right_is_col:
-            single_filters[right_table].append((right_column, op, left_column))
+            # literal on the left: flip the comparison
+            value = literal(left, field_of(right_table, right_column), FLIP_OP[op])
+            return ("col", right_table, (right_column, FLIP_OP[op], value))
         else:
             raise ValueError(f"Invalid WHERE clause {token} (no table column found)")
+
+    def tables_of(node):
+        if node[0] == "col":
+            return {node[1]}
+        if node[0] == "join":
+            raise ValueError("Join conditions inside OR are not supported")
+        return set().union(*[tables_of(child) for child in node[1]])
+
+    def build(node, qualify):
+        # resolved node -> predicate tree, with "table.column" names when qualified
+        if node[0] == "col":
+            table, (col, op, value) = node[1], node[2]
+            return (f"{table}.{col}" if qualify else col, op, value)
+        return (node[0], [build(child, qualify) for child in node[1]])
+
+    tree = resolve(parse_where(tokenize_where(plan.filter)))
+    conjuncts = tree[1] if tree[0] == AND else [tree]
+    for conjunct in conjuncts:
+        if conjunct[0] == "join":
+            join_filters.append(conjunct[1])
+            continue
+        tables = tables_of(conjunct)
+        if len(tables) == 1:
+            single_filters[tables.pop()].append(build(conjunct, qualify=False))
+        else:
+            residual_filters.append(build(conjunct, qualify=True))
         
     plan.single_filters = single_filters
     plan.join_filters = join_filters
+    plan.residual_filters = residual_filters
+    plan.parameters = parameters
     plan.filter = None
     logging.debug(f"Single filters: {plan.single_filters}")
     logging.debug(f"Join filters: {plan.join_filters}")
+    logging.debug(f"Residual filters: {plan.residual_filters}")
     return
 
-def validate_logical_plan(plan, data_dir) -> bool:
+def validate_logical_plan(plan, data_dir, allow_parameters=False) -> bool:
 
     """ Validate a logical plan
     
@@ -167,9 +483,11 @@ def validate_logical_plan(plan, data_dir) -> bool:
             3. filter columns
             4. order by columns
             5. where predicates
+            6. group by columns, aggregate functions, and having predicates
 
     Args:
         plan (LogicalPlan): logical plan
+        allow_parameters (bool): whether the WHERE clause may hold ? placeholders (prepared statements)
     Returns:
         LogicalPlan: root of validated logical operator tree
     
@@ -243,8 +561,12 @@ def validate_logical_plan(plan, data_dir) -> bool:
     for table in plan.col_proj.keys():
         if table != None and table not in source_set:
             raise ValueError(f"Incorrect table name {table} specified")
+    aggregation = bool(plan.aggregates or plan.group_by or plan.having)
     for table in source:
-        if len(plan.col_proj[table]) == 0:
+        if len(plan.col_proj[table]) == 0 and aggregation:
+            # aggregated and grouped columns are not part of the column projection
+            continue
+        elif len(plan.col_proj[table]) == 0:
             logging.debug(f"Removing table {table} from column projection list and source tables")
             del plan.col_proj[table]
             plan.source_tables.remove(table)
@@ -252,10 +574,13 @@ def validate_logical_plan(plan, data_dir) -> bool:
             # remove duplicate columns
             plan.col_proj[table] = list(set(plan.col_proj[table]))
     
-    # validate order by clause
-    order_by_validator(plan, data_dir)
+    # validate order by clause, or the aggregation (with its order by)
+    if aggregation:
+        aggregate_validator(plan, data_dir)
+    else:
+        order_by_validator(plan, data_dir)
     
     # validate where clause
-    where_clause_validator(plan, data_dir)
+    where_clause_validator(plan, data_dir, allow_parameters)
 
     return plan
\ No newline at end of file
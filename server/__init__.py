@@ -0,0 +1,2 @@
+from .server import serve, QueryServer
+from .client import run_client, QueryClient
@@ -0,0 +1,83 @@
+# Client of the query server (see server.py): a REPL sending every statement as one line
+# and printing the server's answer up to its end line.
+import socket
+from server.server import parse_address, END_OF_ANSWER
+
+class QueryClient:
+
+    """ Connection to a query server.
+
+    Args:
+        address (str): "host:port" or a Unix socket path
+    """
+
+    def __init__(self, address):
+        path, host, port = parse_address(address)
+        if path is not None:
+            self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            self.sock.connect(path)
+        else:
+            self.sock = socket.create_connection((host, port))
+        self.file = self.sock.makefile("rwb")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def iter_answer(self, statement):
+
+        """ Send a statement and iterate the lines of its answer as they arrive.
+
+        Args:
+            statement (str): SQL statement or command, line breaks are sent as spaces
+
+        Yields:
+            str: lines of the answer
+        """
+
+        self.file.write((" ".join(statement.splitlines()) + "\n").encode())
+        self.file.flush()
+        for line in self.file:
+            line = line.decode().rstrip("\n")
+            if line == END_OF_ANSWER:
+                return
+            yield line[1:] if line.startswith(".") else line
+        raise ConnectionError("Server closed the connection")
+
+    def execute(self, statement) -> str:
+
+        """ Send a statement and return its whole answer as text. """
+
+        return "\n".join(self.iter_answer(statement))
+
+    def close(self):
+        try:
+            self.file.write(b"QUIT\n")
+            self.file.flush()
+        except OSError:
+            pass
+        self.file.close()
+        self.sock.close()
+
+def run_client(address):
+
+    """ Interactive REPL on a query server, until EXIT / QUIT or end of input.
+
+    Args:
+        address (str): "host:port" or a Unix socket path
+    """
+
+    with QueryClient(address) as client:
+        while True:
+            try:
+                query = input("SQL > ")
+            except EOFError:
+                return
+            if not query.strip():
+                continue
+            elif query.strip() in ("EXIT", "exit", "QUIT", "quit"):
+                return
+            for line in client.iter_answer(query):
+                print(line)
@@ -0,0 +1,272 @@
+# Query server
+# Serves the engine to several clients over a TCP or Unix socket, with a line protocol:
+# a client sends one statement per line, and the server answers every statement with the
+# lines the REPL would print, followed by a line holding a single "." (answer lines that
+# start with "." get another "." in front, as in SMTP).
+# Every connection has its own session settings and prepared statements (see session.new_session);
+# the results cache, plan cache, table catalog, buffer pool, and intermediate result cache are shared by all connections.
+# Statements run on a shared pool of session.SERVER_MAX_QUERIES threads. Up to
+# session.SERVER_MAX_QUEUED more statements wait for a free thread, further ones are rejected.
+import io
+import os
+import sys
+import asyncio
+import logging
+import contextvars
+import pyarrow as pa
+from concurrent.futures import ThreadPoolExecutor
+from session.cli import handle_session_command, handle_desc_command, handle_explain_command, handle_prepared_command, \
+    print_batches
+from parser.sql_parser import parse_query
+from semantic.validator import validate_logical_plan
+from planner.optimizer import optimize_plan
+from executor.executor import execute_plan_batches
+from cache.results_cache import iter_cached_batches, cache_batches, clear_query_cache
+from cache.plan_cache import lookup_plan, store_plan
+from session import session
+
+END_OF_ANSWER = "."
+
+_output = contextvars.ContextVar("statement_output", default=None) # output of the statement run in this context
+
+class ContextStdout(io.TextIOBase):
+
+    """ Replacement of sys.stdout sending what a statement prints to its client.
+
+    Outside of a statement (see _output), text goes to the server's own stdout.
+    """
+
+    def __init__(self, stdout):
+        self.stdout = stdout
+
+    def write(self, text):
+        output = _output.get()
+        if output is None:
+            return self.stdout.write(text)
+        output.write(text)
+        return len(text)
+
+    def flush(self):
+        self.stdout.flush()
+
+class StatementOutput:
+
+    """ Answer of one statement, sent to the client line by line while it is printed.
+
+    Runs in the worker thread of the statement; lines are handed to the event loop,
+    which writes them to the connection. The thread waits until they are sent, so a slow
+    client slows down its own statement instead of filling the server's memory.
+    When the client is gone, the statement fails on its next print and nothing more is sent.
+    """
+
+    def __init__(self, loop, writer):
+        self.loop = loop
+        self.writer = writer
+        self.pending = ""
+        self.closed = False
+
+    async def write_lines(self, data):
+        self.writer.write(data)
+        await self.writer.drain()
+
+    def send(self, lines, end=""):
+        if self.closed:
+            return
+        data = "".join(f".{line}\n" if line.startswith(".") else f"{line}\n" for line in lines) + end
+        try:
+            asyncio.run_coroutine_threadsafe(self.write_lines(data.encode()), self.loop).result()
+        except ConnectionError:
+            self.closed = True
+            raise
+
+    def write(self, text):
+        lines = (self.pending + text).split("\n")
+        self.pending = lines.pop()
+        if lines:
+            self.send(lines)
+
+    def close(self):
+        try:
+            self.send([self.pending] if self.pending else [], end=END_OF_ANSWER + "\n")
+        except ConnectionError:
+            pass
+
+def parse_address(address):
+
+    """ Split a server address into a Unix socket path or a (host, port) pair.
+
+    Args:
+        address (str): "host:port", ":port", or a Unix socket path (containing "/")
+
+    Returns:
+        tuple: (path, None, None) for a Unix socket, (None, host, port) for TCP
+    """
+
+    if "/" in address:
+        return address, None, None
+    host, _, port = address.rpartition(":")
+    if not port.isdigit():
+        raise ValueError(f"Invalid server address {address}, expected host:port or a socket path")
+    return None, host or "localhost", int(port)
+
+def run_statement(query, data_dir):
+
+    """ Run one statement of a client, printing its answer like the REPL.
+
+    Errors are printed to the client instead of ending the process.
+
+    Args:
+        query (str): SQL statement, or a SET / DESC / EXPLAIN / PREPARE / EXECUTE command
+        data_dir (str): directory containing parquet table files.
+    """
+
+    # session, describe, and explain commands
+    try:
+        if handle_session_command(query) or handle_desc_command(query, data_dir=data_dir) \
+                or handle_explain_command(query, data_dir=data_dir) \
+                or handle_prepared_command(query, data_dir=data_dir, interactive=False):
+            return
+    except (FileNotFoundError, ValueError) as error:
+        print(error)
+        return
+
+    # cached result
+    try:
+        reader = iter_cached_batches(query)
+        if reader is not None:
+            num_rows = print_batches(reader, session.FETCH_SIZE, interactive=False)
+            print(f"\n {num_rows} rows selected.\n" if num_rows else "\nno rows selected.\n")
+            return
+    except (KeyError, pa.ArrowInvalid) as error:
+        print(f"Cached result is no longer readable ({error}), run the query again.")
+        clear_query_cache(query)
+        return
+    except Exception as e:
+        print(f"Redis error: {e}")
+        return
+
+    # plan (or reuse the cached plan), execute, and stream the result back
+    try:
+        plan = lookup_plan(query, data_dir)
+        if plan is None:
+            plan = parse_query(query)
+            tables = list(plan.source_tables)
+            plan = validate_logical_plan(plan, data_dir)
+            plan = optimize_plan(plan, data_dir)
+            store_plan(query, plan, tables, data_dir)
+        batches = cache_batches(query, execute_plan_batches(plan, data_dir, session.FETCH_SIZE))
+        num_rows = print_batches(batches, session.FETCH_SIZE, interactive=False)
+    except (FileNotFoundError, NotImplementedError, ValueError, KeyError) as error:
+        print("Error:", error)
+        return
+    print(f"\n {num_rows} rows selected.\n" if num_rows else "\nno rows selected.\n")
+
+def answer_statement(output, query, data_dir):
+    # Helper function running a statement in a worker thread, with its prints sent to the client
+    _output.set(output)
+    try:
+        run_statement(query, data_dir)
+    except ConnectionError:
+        logging.debug(f"Client disconnected during: {query}")
+    except Exception as error:
+        logging.exception(f"Statement failed: {query}")
+        print(f"Error: {error}")
+    finally:
+        _output.set(None)
+        output.close()
+
+class QueryServer:
+
+    """ Asyncio server running the statements of its clients on a shared thread pool.
+
+    Args:
+        data_dir (str): directory containing parquet table files.
+        max_queries (int): statements running at the same time
+        max_queued (int): statements waiting for a free thread before new ones are rejected
+    """
+
+    def __init__(self, data_dir, max_queries, max_queued):
+        self.data_dir = data_dir
+        self.max_queries = max_queries
+        self.max_queued = max_queued
+        self.pool = ThreadPoolExecutor(max_workers=max_queries, thread_name_prefix="query")
+        self.admitted = 0 # statements running or waiting for a thread
+        self.connections = 0
+
+    async def handle_connection(self, reader, writer):
+
+        """ Serve one client until it disconnects or sends EXIT / QUIT. """
+
+        # the connection's task runs in its own context, so the session is the connection's own
+        session.new_session()
+        self.connections += 1
+        peer = writer.get_extra_info("peername") or "unix socket"
+        logging.debug(f"Client connected: {peer} ({self.connections} connections)")
+        loop = asyncio.get_running_loop()
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                query = line.decode().strip()
+                if not query:
+                    continue
+                if query.upper() in ("EXIT", "QUIT"):
+                    break
+
+                if self.admitted >= self.max_queries + self.max_queued:
+                    writer.write(f"Error: server busy, {self.admitted} statements running or queued, "
+                                 f"try again later\n{END_OF_ANSWER}\n".encode())
+                    await writer.drain()
+                    continue
+
+                self.admitted += 1
+                try:
+                    # the statement sees the connection's session (contexts share the settings dict)
+                    context = contextvars.copy_context()
+                    await loop.run_in_executor(self.pool, context.run, answer_statement,
+                                               StatementOutput(loop, writer), query, self.data_dir)
+                finally:
+                    self.admitted -= 1
+        except ConnectionError as error:
+            logging.debug(f"Client {peer} disconnected: {error}")
+        finally:
+            self.connections -= 1
+            writer.close()
+
+    async def serve(self, address):
+
+        """ Accept clients on address (see parse_address) until the server is stopped. """
+
+        path, host, port = parse_address(address)
+        if path is not None:
+            if os.path.exists(path):
+                os.unlink(path)
+            server = await asyncio.start_unix_server(self.handle_connection, path=path)
+        else:
+            server = await asyncio.start_server(self.handle_connection, host=host, port=port)
+        sys.stdout = ContextStdout(sys.stdout)
+        print(f"Serving on {address} ({self.max_queries} concurrent queries, {self.max_queued} queued)")
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            sys.stdout = sys.stdout.stdout
+            self.pool.shutdown(wait=False, cancel_futures=True)
+            if path is not None and os.path.exists(path):
+                os.unlink(path)
+
+def serve(address, data_dir):
+
+    """ Run a query server on address until interrupted, sized by the session's SERVER_* settings.
+
+    Args:
+        address (str): "host:port" or a Unix socket path
+        data_dir (str): directory containing parquet table files.
+    """
+
+    server = QueryServer(data_dir, session.SERVER_MAX_QUERIES, session.SERVER_MAX_QUEUED)
+    try:
+        asyncio.run(server.serve(address))
+    except KeyboardInterrupt:
+        print("Server stopped.")
@@ -1,8 +1,26 @@
 import logging
-from semantic.validator import load_table_schema
-from cache.results_cache import clear_all_cache
+import re
+import sys
+import itertools
+import pyarrow as pa
+from semantic.validator import load_table_schema, validate_logical_plan
+from parser.sql_parser import parse_query
+from planner.optimizer import optimize_plan, explain_plan
+from cache.results_cache import clear_all_cache, iter_cached_batches, cache_batches
+from cache.buffer_pool import clear_pool, resize_pool, pool_stats
+from cache.plan_cache import clear_plan_cache
+from cache.intermediate_cache import clear_intermediate_cache, resize_intermediate_cache, intermediate_stats
+from catalog import get_table
+from executor.executor import execute_plan_batches
+from executor.profile import QueryProfile, profile_stage
+from session.prepared import PreparedStatement
 from session import session
 
+PREPARE = re.compile(r"^PREPARE\s+(\w+)\s+AS\s+(.+?);?$", re.IGNORECASE | re.DOTALL)
+EXECUTE = re.compile(r"^EXECUTE\s+(\w+)\s*(?:\((.*)\))?;?$", re.IGNORECASE | re.DOTALL)
+DEALLOCATE = re.compile(r"^DEALLOCATE\s+(?:PREPARE\s+)?(\w+);?$", re.IGNORECASE)
+ARGUMENT = re.compile(r"""\s*('[^']*'|"[^"]*"|[^,'"]*?)\s*(?:,|$)""")
+
 def handle_session_command(cmd):
     if not cmd:
         return False
@@ -31,8 +49,60 @@ def handle_session_command(cmd):
         return True
     elif cmd.startswith("SET CACHE CLEAR"):
         clear_all_cache()
+        clear_plan_cache()
+        clear_pool()
+        clear_intermediate_cache()
         print("Cache cleared.")
         return True
+    elif cmd.startswith("SET BUFFER POOL"):
+        parts = cmd.split()
+        if len(parts) == 4:
+            try:
+                val = int(parts[3])
+                if val < 0:
+                    raise ValueError
+                session.BUFFER_POOL_SIZE = val
+                resize_pool()
+                print(f"Buffer pool size set to {val} MB")
+            except ValueError:
+                print("Invalid buffer pool size. Must be a non-negative integer (MB).")
+        else:
+            print("Usage: SET BUFFER POOL <MB>")
+        return True
+    elif cmd == "SHOW BUFFER POOL":
+        stats = pool_stats()
+        print(f"hits: {stats['hits']}, misses: {stats['misses']}, evictions: {stats['evictions']}, "
+              f"chunks: {stats['chunks']}, used: {stats['bytes']} / {stats['budget']} bytes")
+        return True
+    elif cmd.startswith("SET INTERMEDIATE CACHE"):
+        parts = cmd.split()
+        if len(parts) == 4:
+            try:
+                val = int(parts[3])
+                if val < 0:
+                    raise ValueError
+                session.INTERMEDIATE_CACHE_SIZE = val
+                resize_intermediate_cache()
+                print(f"Intermediate cache size set to {val} MB")
+            except ValueError:
+                print("Invalid intermediate cache size. Must be a non-negative integer (MB).")
+        else:
+            print("Usage: SET INTERMEDIATE CACHE <MB>")
+        return True
+    elif cmd == "SHOW INTERMEDIATE CACHE":
+        stats = intermediate_stats()
+        print(f"hits: {stats['hits']}, subsumed hits: {stats['subsumed']}, misses: {stats['misses']}, "
+              f"evictions: {stats['evictions']}, entries: {stats['entries']}, "
+              f"used: {stats['bytes']} / {stats['budget']} bytes")
+        return True
+    elif cmd.startswith("SET PARALLEL MODE"):
+        parts = cmd.split()
+        if len(parts) == 4 and parts[3] in ("THREAD", "PROCESS"):
+            session.PARALLEL_MODE = parts[3]
+            print(f"Parallel mode set to {parts[3]}")
+        else:
+            print("Usage: SET PARALLEL MODE [THREAD | PROCESS]")
+        return True
     elif cmd.startswith("SET PARALLEL"):
         parts = cmd.split()
         if len(parts) == 3:
@@ -51,6 +121,46 @@ def handle_session_command(cmd):
         else:
             print("Usage: SET PARALLEL <num>")
         return True
+    elif cmd.startswith("SET FETCH SIZE"):
+        parts = cmd.split()
+        if len(parts) == 4:
+            try:
+                val = int(parts[3])
+                if val < 1:
+                    raise ValueError
+                session.FETCH_SIZE = val
+                print(f"Fetch size set to {val}")
+            except ValueError:
+                print("Invalid fetch size. Must be a positive integer.")
+        else:
+            print("Usage: SET FETCH SIZE <rows>")
+        return True
+    elif cmd.startswith("SET MEMORY LIMIT"):
+        parts = cmd.split()
+        if len(parts) == 4:
+            try:
+                val = int(parts[3])
+                if val < 0:
+                    raise ValueError
+                session.MEMORY_LIMIT = val
+                print(f"Memory limit set to {val} MB" if val else "Memory limit disabled")
+            except ValueError:
+                if parts[3] == "OFF":
+                    session.MEMORY_LIMIT = 0
+                    print("Memory limit disabled")
+                    return True
+                print("Invalid memory limit. Must be a non-negative integer (MB).")
+        else:
+            print("Usage: SET MEMORY LIMIT <MB>")
+        return True
+    elif cmd.startswith("SET ENGINE"):
+        parts = cmd.split()
+        if len(parts) == 3 and parts[2] in ("PANDAS", "ARROW"):
+            session.ENGINE = parts[2]
+            print(f"Engine set to {parts[2]}")
+        else:
+            print("Usage: SET ENGINE [PANDAS | ARROW]")
+        return True
     return False
 
 def handle_desc_command(cmd, data_dir):
@@ -70,9 +180,154 @@ def handle_desc_command(cmd, data_dir):
         else:
             table = cmd.split()[-1]
             _, schema = load_table_schema(data_dir=data_dir, table=table)
-            # Get column types
+            partition_columns = get_table(data_dir, table).partition_columns
+            # Get column types, partition columns of a partitioned table are marked
             for name in schema.names:
                 field = schema.field(name)
-                print(f"{name}: {field.type}")
+                print(f"{name}: {field.type}" + (" (partition)" if name in partition_columns else ""))
             return True
-    return False
\ No newline at end of file
+    return False
+
+def handle_explain_command(cmd, data_dir):
+    if not cmd:
+        return False
+    if not cmd.strip().upper().startswith("EXPLAIN "):
+        return False
+
+    query = cmd.strip()[len("EXPLAIN "):].strip()
+    analyze = query.upper().startswith("ANALYZE ")
+    if analyze:
+        query = query[len("ANALYZE "):].strip()
+
+    # EXPLAIN ANALYZE runs the query like the REPL (cache lookup, plan, execution, cache store) under a profile
+    profile = QueryProfile()
+    token = profile.activate() if analyze else None
+    try:
+        if analyze:
+            with profile_stage("cache lookup") as stage:
+                try:
+                    stage.detail = "miss" if iter_cached_batches(query) is None else "hit (executed anyway)"
+                except Exception as error:
+                    stage.detail = f"unavailable ({error})"
+        with profile_stage("plan"):
+            plan = parse_query(query)
+            plan = validate_logical_plan(plan, data_dir)
+            plan = optimize_plan(plan, data_dir)
+        num_rows = None
+        if analyze:
+            num_rows = 0
+            for batch in cache_batches(query, execute_plan_batches(plan, data_dir, session.FETCH_SIZE)):
+                num_rows += batch.num_rows
+    finally:
+        if analyze:
+            profile.deactivate(token)
+
+    print("\n".join(explain_plan(plan)))
+    if analyze:
+        print(f"\nExecuted with {num_rows} result rows (stage times of several workers are summed, stages may nest):")
+        print("\n".join(profile.report()))
+    return True
+
+def parse_arguments(text):
+    # Helper function to split the arguments of EXECUTE name(1, 'a, b', 2.5) into their SQL text, unquoted
+    args, pos, text = [], 0, text.strip()
+    while pos < len(text):
+        match = ARGUMENT.match(text, pos)
+        if not match or match.end() == pos or not match.group(1):
+            raise ValueError(f"Invalid EXECUTE arguments ({text})")
+        args.append(match.group(1).strip("'\""))
+        pos = match.end()
+    return args
+
+def handle_prepared_command(cmd, data_dir, interactive=True):
+
+    """ Handle PREPARE name AS <query>, EXECUTE name(<values>), and DEALLOCATE name.
+
+    Prepared statements belong to the session (see session/prepared.py). EXECUTE prints its
+    result like a query, without going through the results cache.
+
+    Args:
+        cmd (str): command
+        data_dir (str): directory containing parquet table files.
+        interactive (bool): whether to page on a terminal, False when printing for a server client
+
+    Returns:
+        bool: whether cmd was a prepared statement command
+    Raises:
+        ValueError: if the statement or its values are invalid
+    """
+
+    if not cmd:
+        return False
+    cmd = cmd.strip()
+    statements = session.PREPARED_STATEMENTS
+
+    match = PREPARE.match(cmd)
+    if match:
+        name = match.group(1).upper()
+        statements[name] = PreparedStatement(match.group(2), data_dir)
+        print(f"Statement {name} prepared with {statements[name].num_parameters} parameters.")
+        return True
+
+    match = DEALLOCATE.match(cmd)
+    if match:
+        name = match.group(1).upper()
+        if statements.pop(name, None) is None:
+            raise ValueError(f"Prepared statement {name} not found")
+        print(f"Statement {name} deallocated.")
+        return True
+
+    match = EXECUTE.match(cmd)
+    if not match:
+        return False
+    name = match.group(1).upper()
+    if name not in statements:
+        raise ValueError(f"Prepared statement {name} not found")
+    try:
+        batches = statements[name].execute_batches(*parse_arguments(match.group(2) or ""))
+        num_rows = print_batches(batches, session.FETCH_SIZE, interactive)
+    except (NotImplementedError, KeyError) as error:
+        print("Error:", error)
+        return True
+    print(f"\n {num_rows} rows selected.\n" if num_rows else "\nno rows selected.\n")
+    return True
+
+def print_batches(batches, fetch_size, interactive=True):
+
+    """ Print a result as it arrives, one page of fetch_size rows at a time.
+
+    When the REPL is interactive, it waits after every page: Enter prints the next page,
+    A prints the rest without waiting, and Q stops fetching the result.
+
+    Args:
+        batches (iterator[pyarrow.RecordBatch]): result batches
+        fetch_size (int): rows per page
+        interactive (bool): whether to page on a terminal, False when printing for a server client
+
+    Returns:
+        int: number of rows printed
+    """
+
+    paging = interactive and sys.stdin.isatty()
+    pending, pending_rows, printed = [], 0, 0
+
+    # None marks the end of the result, flushing the last partial page
+    for batch in itertools.chain(batches, [None]):
+        if batch is not None:
+            pending.append(batch)
+            pending_rows += batch.num_rows
+        while pending_rows >= fetch_size or (batch is None and pending_rows):
+            rows = pa.Table.from_batches(pending)
+            page, rest = rows.slice(0, fetch_size), rows.slice(fetch_size)
+            pending, pending_rows = rest.to_batches(), rest.num_rows
+
+            # ask before every page after the first
+            if paging and printed:
+                answer = input("-- more (Enter: next page, A: all, Q: stop) -- ").strip().upper()
+                if answer == "Q":
+                    batches.close()
+                    return printed
+                paging = (answer != "A")
+            print("\n", page.to_pandas().to_string(index=False), "\n")
+            printed += page.num_rows
+    return printed
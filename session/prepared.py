@@ -0,0 +1,124 @@
+import copy
+import logging
+from collections import defaultdict
+from parser.sql_parser import parse_query
+from semantic.validator import validate_logical_plan, typed_literal
+from planner.optimizer import optimize_plan
+from planner.predicate import bind_parameters
+from executor.executor import execute_plan, execute_plan_batches
+from catalog import get_table
+from session import session
+
+# Prepared statements
+# A query with ? placeholders in place of WHERE literals, e.g. "SELECT name FROM emp WHERE id = ?",
+# is parsed and validated once. Every execution binds typed values into the compiled predicate trees
+# and re-orders the predicates and joins for them (see optimize_plan), reusing the resolved projection
+# and columns of the validated plan. Like the plan cache, a statement is validated again once one
+# of its tables' files has changed.
+# Executions skip the results cache: every binding would be a key of its own.
+
+class PreparedStatement:
+
+    """ A query parsed and validated once, executed with different parameter values.
+
+    Args:
+        sql_text (str): query string, with ? in place of WHERE literals
+        data_dir (str): directory containing parquet table files.
+    Raises:
+        ValueError: if the query is invalid
+        FileNotFoundError: if a table does not exist
+    """
+
+    def __init__(self, sql_text, data_dir):
+        self.sql_text = sql_text
+        self.data_dir = data_dir
+        self.prepare()
+
+    def prepare(self):
+        plan = parse_query(self.sql_text)
+        tables = list(plan.source_tables)
+        self.plan = validate_logical_plan(plan, self.data_dir, allow_parameters=True)
+        self.versions = {table: get_table(self.data_dir, table).version for table in tables}
+
+    @property
+    def num_parameters(self) -> int:
+        return len(self.plan.parameters)
+
+    def bind(self, *values):
+
+        """ Plan an execution of the statement with the given parameter values.
+
+        Values may be Python values (int, float, bool, str, date / datetime) or their SQL text,
+        and are converted to the type of the column their placeholder is compared with.
+
+        Args:
+            values: value of each ? placeholder, in order
+
+        Returns:
+            LogicalPlan: optimized plan without placeholders, sharing the statement's validated plan
+        Raises:
+            ValueError: if the number of values is wrong, or a value does not fit its column
+        """
+
+        if len(values) != self.num_parameters:
+            raise ValueError(f"Prepared statement expects {self.num_parameters} parameters, got {len(values)}")
+        current = {table: get_table(self.data_dir, table).version for table in self.versions}
+        if current != self.versions:
+            logging.debug("Prepared statement is stale, a table file changed")
+            self.prepare()
+
+        typed = []
+        for value, parameter in zip(values, self.plan.parameters):
+            if value is None:
+                raise ValueError(f"Parameter {parameter} is NULL, comparisons with NULL are not supported")
+            text = value if isinstance(value, str) else str(value)
+            typed.append(typed_literal(text, parameter.field, parameter.op))
+
+        # the validated plan is not changed, only the predicate trees are rebuilt with the values
+        plan = copy.copy(self.plan)
+        if self.plan.single_filters:
+            plan.single_filters = defaultdict(list, {table: [bind_parameters(node, typed) for node in nodes]
+                                                     for table, nodes in self.plan.single_filters.items()})
+        if self.plan.residual_filters:
+            plan.residual_filters = [bind_parameters(node, typed) for node in self.plan.residual_filters]
+        plan.parameters = []
+        return optimize_plan(plan, self.data_dir)
+
+    def execute(self, *values):
+
+        """ Execute the statement with the given parameter values (see bind).
+
+        Returns:
+            pandas.DataFrame: query result
+        """
+
+        return execute_plan(self.bind(*values), self.data_dir)
+
+    def execute_batches(self, *values, batch_size=None):
+
+        """ Execute the statement with the given parameter values (see bind), streaming the result.
+
+        Args:
+            values: value of each ? placeholder, in order
+            batch_size (int): maximum rows per batch, session.FETCH_SIZE if None
+
+        Returns:
+            iterator[pyarrow.RecordBatch]: batches of the query result
+        """
+
+        return execute_plan_batches(self.bind(*values), self.data_dir, batch_size or session.FETCH_SIZE)
+
+def prepare(sql_text, data_dir) -> PreparedStatement:
+
+    """ Prepare a query for repeated execution, e.g.
+        prepare("SELECT name FROM emp WHERE id = ?", data_dir).execute(42)
+
+    Args:
+        sql_text (str): query string, with ? in place of WHERE literals
+        data_dir (str): directory containing parquet table files.
+
+    Returns:
+        PreparedStatement: the validated statement
+    """
+
+    return PreparedStatement(sql_text, data_dir)
@@ -1,5 +1,69 @@
 # SESSION PARAMETER LIST
 PARALLEL_LEVEL: int = 1 # specifies the degree of parallelism for the table scan
 MAX_CHUNK_SIZE: int = 50000 # specifies the maximum chunk size given for a worker
+MIN_CHUNK_SIZE: int = 10000 # specifies the minimum chunk size given for a worker, smaller tables are split into fewer chunks
 NUM_CHUNKS_PER_WORKER: int = 10 # specifies the minimum number of chunks each worker should have
-CACHE_EXPIRY_TIME: int = 3600 # 1 hour expiry time in Redis Cache
\ No newline at end of file
+PARALLEL_MODE: str = "THREAD" # parallel scan workers [THREAD, PROCESS]
+CACHE_EXPIRY_TIME: int = 3600 # 1 hour expiry time in Redis Cache
+CACHE_COMPRESSION: str = "lz4" # compression of cached results [lz4, zstd]
+CACHE_CHUNK_SIZE: int = 1024 * 1024 # maximum bytes stored per Redis key, larger results are split across keys
+CACHE_MAX_RESULT_SIZE: int = 256 * 1024 * 1024 # results larger than this (bytes, compressed) are not cached
+ENGINE: str = "PANDAS" # execution engine [PANDAS, ARROW]
+BUFFER_POOL_SIZE: int = 256 # memory budget (MB) of decoded column chunks kept in the buffer pool, 0 disables it
+PLAN_CACHE_SIZE: int = 128 # number of validated query plans kept in the plan cache, 0 disables it
+INTERMEDIATE_CACHE_SIZE: int = 0 # memory budget (MB) of filtered table scans kept in the intermediate result cache, 0 (default) disables it
+FETCH_SIZE: int = 1000 # rows per result batch and per page printed by the REPL
+MEMORY_LIMIT: int = 0 # memory budget (MB) of each sort and join of a query, larger inputs spill to disk; 0 disables it
+SERVER_MAX_QUERIES: int = 4 # queries the query server runs at the same time
+SERVER_MAX_QUEUED: int = 16 # queries waiting for a free worker of the query server, further queries are rejected
+
+# SESSION STATE
+PREPARED_STATEMENTS: dict = {} # name -> PreparedStatement of PREPARE name AS ... (see session/prepared.py)
+
+# PER-CONNECTION SESSIONS
+# The values above are the process settings. A connection of the query server runs in its own
+# context with a copy of them (see new_session): session.X reads and writes that copy, except for
+# the settings of the caches shared by all connections, which stay process-wide.
+# Every session also starts with no prepared statements of its own.
+import sys
+import types
+import contextvars
+
+SHARED_SETTINGS = {"CACHE_EXPIRY_TIME", "CACHE_COMPRESSION", "CACHE_CHUNK_SIZE", "CACHE_MAX_RESULT_SIZE",
+                   "BUFFER_POOL_SIZE", "PLAN_CACHE_SIZE", "INTERMEDIATE_CACHE_SIZE",
+                   "SERVER_MAX_QUERIES", "SERVER_MAX_QUEUED"}
+
+_settings = contextvars.ContextVar("session_settings", default=None) # settings of the current connection
+
+class SessionModule(types.ModuleType):
+
+    """ Module type of the session module, resolving settings in the current connection's session first. """
+
+    def __getattribute__(self, name):
+        settings = _settings.get()
+        if settings is not None and name in settings:
+            return settings[name]
+        return super().__getattribute__(name)
+
+    def __setattr__(self, name, value):
+        settings = _settings.get()
+        if settings is not None and name in settings:
+            settings[name] = value
+        else:
+            super().__setattr__(name, value)
+
+def new_session():
+
+    """ Start a session in the current context, with a copy of the process settings.
+
+    Returns:
+        dict: settings of the session
+    """
+
+    settings = {name: value for name, value in globals().items()
+                if name.isupper() and isinstance(value, (int, str)) and name not in SHARED_SETTINGS}
+    settings["PREPARED_STATEMENTS"] = {}
+    _settings.set(settings)
+    return settings
+
+sys.modules[__name__].__class__ = SessionModule